@@ -0,0 +1,137 @@
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+
+import numpy as np
+
+# Reuse the API's decoding, preprocessing and backends so numbers match serving
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from app.analysis.backends import BACKENDS, artifact_path  # noqa: E402
+from app.analysis.classifier import BloodCellClassifier, decode_image, preprocess  # noqa: E402
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s: %(message)s')
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tif', '.tiff')
+
+
+def load_validation_split(val_dir, cell_types, imgsz=224, limit=None):
+    """Decode and preprocess the validation split once, up front.
+
+    Args:
+        val_dir (str): Directory with one subdirectory per cell type
+        cell_types (list): Class names in model output order
+        imgsz (int): Model input size
+        limit (int, optional): Cap on images per class
+
+    Returns:
+        tuple: (NxHxWx3 uint8 crops, N int labels)
+    """
+    crops, labels = [], []
+    for label, cell_type in enumerate(cell_types):
+        type_dir = os.path.join(val_dir, cell_type)
+        if not os.path.isdir(type_dir):
+            logger.warning(f"No validation directory for {cell_type}")
+            continue
+        names = sorted(f for f in os.listdir(type_dir) if f.lower().endswith(IMAGE_EXTENSIONS))
+        for name in names[:limit]:
+            with open(os.path.join(type_dir, name), 'rb') as f:
+                crops.append(preprocess(decode_image(f.read()), imgsz))
+            labels.append(label)
+    if not crops:
+        raise ValueError(f"No validation images found in {val_dir}")
+    return np.stack(crops), np.array(labels)
+
+
+def benchmark_backend(model_path, backend, crops, labels, batch_size=32, latency_samples=200, threads=0):
+    """Measure one backend on the preprocessed validation split.
+
+    Args:
+        model_path (str): Path to the trained ``.pt`` weights
+        backend (str): Backend name, see ``app.analysis.backends.BACKENDS``
+        crops (np.ndarray): Preprocessed validation crops
+        labels (np.ndarray): Ground-truth labels for ``crops``
+        batch_size (int): Batch size for the throughput/accuracy pass
+        latency_samples (int): Single-image forward passes to time
+        threads (int): Runtime intra-op threads, 0 for its default
+
+    Returns:
+        dict: Load time, single-image latency percentiles, batched
+            throughput and top-1 accuracy
+    """
+    model = BloodCellClassifier(model_path, crops.shape[1], backend, threads)
+    started = time.perf_counter()
+    model.load()
+    load_seconds = time.perf_counter() - started
+    model.warmup()
+
+    # Single-image latency (what an idle server sees per request)
+    latencies = []
+    for i in range(min(latency_samples, len(crops))):
+        started = time.perf_counter()
+        model.predict(crops[i:i + 1])
+        latencies.append(time.perf_counter() - started)
+    latencies_ms = 1000 * np.array(latencies)
+
+    # Batched throughput and accuracy over the whole split
+    predictions = []
+    started = time.perf_counter()
+    for i in range(0, len(crops), batch_size):
+        predictions.append(model.predict(crops[i:i + batch_size]).argmax(1))
+    elapsed = time.perf_counter() - started
+    predictions = np.concatenate(predictions)
+
+    return {
+        'backend': backend,
+        'artifact': model.artifact_path,
+        'artifact_mb': round(os.path.getsize(model.artifact_path) / 1e6, 2),
+        'load_seconds': round(load_seconds, 3),
+        'latency_ms_p50': round(float(np.percentile(latencies_ms, 50)), 3),
+        'latency_ms_p95': round(float(np.percentile(latencies_ms, 95)), 3),
+        'throughput_images_per_second': round(len(crops) / elapsed, 1),
+        'top1_accuracy': round(float((predictions == labels).mean()), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare CPU inference backends on the validation split')
+    parser.add_argument('--model', default='blood_cell_classification_model.pt', help='Trained .pt weights')
+    parser.add_argument('--val-dir', default='./data/cell_images/val', help='Validation split root')
+    parser.add_argument('--backends', nargs='+', default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--threads', type=int, default=0)
+    parser.add_argument('--limit', type=int, default=None, help='Max images per class')
+    parser.add_argument('--output', default='backend_benchmark.json')
+    args = parser.parse_args()
+
+    reference = BloodCellClassifier(args.model)
+    crops, labels = load_validation_split(args.val_dir, reference.cell_types, reference.image_size, args.limit)
+    logger.info(f"Loaded {len(crops)} validation images")
+
+    results = []
+    for backend in args.backends:
+        if not os.path.exists(artifact_path(args.model, backend)):
+            logger.warning(f"Skipping {backend}: run export.py first")
+            continue
+        results.append(benchmark_backend(
+            args.model, backend, crops, labels, args.batch_size, threads=args.threads
+        ))
+
+    print(f"\n{'backend':<12} {'p50 ms':>8} {'p95 ms':>8} {'img/s':>8} {'top-1':>7} {'MB':>7}")
+    for r in results:
+        print(f"{r['backend']:<12} {r['latency_ms_p50']:>8} {r['latency_ms_p95']:>8} "
+              f"{r['throughput_images_per_second']:>8} {r['top1_accuracy']:>7} {r['artifact_mb']:>7}")
+
+    with open(args.output, 'w') as f:
+        json.dump({'images': int(len(crops)), 'results': results}, f, indent=2)
+    logger.info(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+import os
+import json
+import time
+import argparse
+import logging
+
+import torch
+import torchvision.transforms as transforms
+from torch.utils.data import DataLoader
+
+from shards import ShardedBloodCellDataset, compile_shards
+from train import BloodCellDataset
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s: %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def loader_throughput(dataset, batch_size=32, workers=0, epochs=1):
+    """Images per second a shuffled DataLoader yields over ``dataset``.
+
+    Collating copies every pixel into the batch, so memory-mapped data is
+    really read even though the batches are not used.
+
+    Args:
+        dataset (Dataset): Dataset returning (3 x H x W tensor, label)
+        batch_size (int): Batch size, as in training
+        workers (int): DataLoader worker processes
+        epochs (int): Passes over the dataset
+
+    Returns:
+        float: Images per second
+    """
+    loader = DataLoader(dataset, batch_size=batch_size, shuffle=True, num_workers=workers)
+    images = 0
+    started = time.perf_counter()
+    for _ in range(epochs):
+        for _, labels in loader:
+            images += len(labels)
+    return images / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare DataLoader throughput of image files and shards')
+    parser.add_argument('--data-dir', default='./data/cell_images', help='Directory with one subdirectory per cell type')
+    parser.add_argument('--shard-dir', default='./data/shards', help='Where to compile the shards')
+    parser.add_argument('--imgsz', type=int, default=224)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 2], help='DataLoader worker counts to try')
+    parser.add_argument('--epochs', type=int, default=2)
+    parser.add_argument('--output', default='loader_benchmark.json')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    compile_shards(args.data_dir, args.shard_dir, args.imgsz, force=True)
+    compile_seconds = time.perf_counter() - started
+
+    # Both produce the same 3 x imgsz x imgsz uint8 tensors
+    datasets = {
+        'files': BloodCellDataset(args.data_dir, transforms.Compose([
+            transforms.Resize(args.imgsz),
+            transforms.CenterCrop(args.imgsz),
+            transforms.PILToTensor(),
+        ])),
+        'shards': ShardedBloodCellDataset(args.shard_dir),
+    }
+
+    results = []
+    for workers in args.workers:
+        for name, dataset in datasets.items():
+            rate = loader_throughput(dataset, args.batch_size, workers, args.epochs)
+            results.append({'dataset': name, 'workers': workers, 'images_per_second': round(rate, 1)})
+            logger.info(f"{name} with {workers} workers: {rate:.0f} images/s")
+
+    print(f"\n{'dataset':<8} {'workers':>8} {'img/s':>10}")
+    for r in results:
+        print(f"{r['dataset']:<8} {r['workers']:>8} {r['images_per_second']:>10}")
+    print(f"Compiling the shards took {compile_seconds:.1f}s")
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'images': len(datasets['shards']),
+            'torch_threads': torch.get_num_threads(),
+            'compile_seconds': round(compile_seconds, 2),
+            'results': results,
+        }, f, indent=2)
+    logger.info(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,8 @@ import os
 import sys
 import logging
 
+from scan_dataset import scan_dataset
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s: %(message)s')
 logger = logging.getLogger(__name__)
@@ -30,16 +32,15 @@ def check_dataset(data_dir):
         logger.error(f"Data directory not found: {data_dir}")
         return
     
-    image_extensions = ['.png', '.jpg', '.jpeg', '.tif', '.tiff']
-    cell_types = ['EOSINOPHIL', 'LYMPHOCYTE', 'MONOCYTE', 'NEUTROPHIL']
-    
-    for cell_type in cell_types:
-        type_path = os.path.join(data_dir, cell_type)
-        if os.path.exists(type_path):
-            images = [f for f in os.listdir(type_path) if any(f.lower().endswith(ext) for ext in image_extensions)]
-            logger.info(f"{cell_type}: {len(images)} images")
-        else:
-            logger.warning(f"No directory found for {cell_type}")
+    # One walk of the tree, with every image verified (cached across runs)
+    report = scan_dataset(data_dir)
+    for split, counts in report['class_balance'].items():
+        for cell_type, count in counts.items():
+            logger.info(f"{split} {cell_type}: {count} images")
+    if report['corrupt']:
+        logger.warning(f"{len(report['corrupt'])} corrupt images, e.g. {report['corrupt'][0]}")
+    if report['leakage']:
+        logger.warning(f"{len(report['leakage'])} near-duplicates split across train and val")
 
 def main():
     data_dir = '/Users/richy/Documents/Github/LumaScope/backend/ai-training/data/cell_images'
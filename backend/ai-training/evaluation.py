@@ -0,0 +1,352 @@
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+from multiprocessing import Pool
+
+import numpy as np
+
+# Reuse the API's backends so evaluated numbers match serving
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from app.analysis.classifier import BloodCellClassifier  # noqa: E402
+from shards import ShardedBloodCellDataset, compile_shards  # noqa: E402
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s: %(message)s')
+logger = logging.getLogger(__name__)
+
+CALIBRATION_BINS = 15  # Equal-width confidence bins for ECE and the reliability diagram
+
+
+def _to_numpy(values):
+    # Accepts torch tensors (on any device) as well as arrays and lists
+    if hasattr(values, 'detach'):
+        values = values.detach().cpu().numpy()
+    return np.asarray(values)
+
+
+def _divide(numerator, denominator):
+    """Elementwise ratio that is 0 wherever the denominator is 0."""
+    numerator = np.asarray(numerator, dtype=np.float64)
+    return np.divide(numerator, denominator, out=np.zeros_like(numerator), where=denominator != 0)
+
+
+class StreamingMetrics:
+    """Classification metrics accumulated one batch at a time.
+
+    Only fixed-size sums are kept (the confusion matrix, per-bin
+    calibration totals, log loss and Brier totals), so memory does not
+    grow with the validation set. Instances from different processes or
+    shards combine exactly with ``merge``.
+
+    Attributes:
+        num_classes (int): Number of classes
+        bins (int): Confidence bins for calibration
+        confusion (np.ndarray): Rows are true classes, columns predictions
+    """
+
+    def __init__(self, num_classes, bins=CALIBRATION_BINS):
+        self.num_classes = num_classes
+        self.bins = bins
+        self.confusion = np.zeros((num_classes, num_classes), dtype=np.int64)
+        self.bin_count = np.zeros(bins, dtype=np.int64)
+        self.bin_confidence = np.zeros(bins)
+        self.bin_correct = np.zeros(bins)
+        self.log_loss = 0.0
+        self.brier = 0.0
+        self.scored = 0  # Samples that came with probabilities
+
+    @property
+    def count(self):
+        return int(self.confusion.sum())
+
+    def update(self, labels, predictions=None, probabilities=None):
+        """Add one batch.
+
+        Args:
+            labels: N true class indices
+            predictions: N predicted class indices; the argmax of
+                ``probabilities`` if not given
+            probabilities: N x C class probabilities (softmax outputs),
+                needed for calibration, log loss and Brier score
+        """
+        labels = _to_numpy(labels).astype(np.int64, copy=False).ravel()
+        if probabilities is not None:
+            probabilities = _to_numpy(probabilities).astype(np.float64, copy=False)
+            if predictions is None:
+                predictions = probabilities.argmax(1)
+        predictions = _to_numpy(predictions).astype(np.int64, copy=False).ravel()
+
+        c = self.num_classes
+        self.confusion += np.bincount(labels * c + predictions, minlength=c * c).reshape(c, c)
+
+        if probabilities is None:
+            return
+        rows = np.arange(len(labels))
+        confidence = probabilities[rows, predictions]
+        bins = np.minimum((confidence * self.bins).astype(np.int64), self.bins - 1)
+        self.bin_count += np.bincount(bins, minlength=self.bins)
+        self.bin_confidence += np.bincount(bins, weights=confidence, minlength=self.bins)
+        self.bin_correct += np.bincount(bins, weights=predictions == labels, minlength=self.bins)
+
+        self.log_loss -= np.log(np.clip(probabilities[rows, labels], 1e-12, 1.0)).sum()
+        squared = (probabilities ** 2).sum(1) - 2 * probabilities[rows, labels] + 1
+        self.brier += squared.sum()
+        self.scored += len(labels)
+
+    def merge(self, other):
+        """Add another instance's totals into this one, e.g. from another shard.
+
+        Returns:
+            StreamingMetrics: ``self``
+        """
+        if (other.num_classes, other.bins) != (self.num_classes, self.bins):
+            raise ValueError("Cannot merge metrics with different classes or bins")
+        self.confusion += other.confusion
+        self.bin_count += other.bin_count
+        self.bin_confidence += other.bin_confidence
+        self.bin_correct += other.bin_correct
+        self.log_loss += other.log_loss
+        self.brier += other.brier
+        self.scored += other.scored
+        return self
+
+    def report(self, class_names=None):
+        """Every metric, as plain JSON-serializable values.
+
+        Args:
+            class_names (list, optional): Names in label order
+
+        Returns:
+            dict: Accuracy, per-class precision/recall/F1/support, macro
+                and weighted averages, calibration (ECE, MCE, log loss,
+                Brier score, reliability bins) and the confusion matrix
+        """
+        names = list(class_names or range(self.num_classes))
+        true_positive = np.diag(self.confusion).astype(np.float64)
+        support = self.confusion.sum(1)
+        predicted = self.confusion.sum(0)
+        precision = _divide(true_positive, predicted)
+        recall = _divide(true_positive, support)
+        f1 = _divide(2 * precision * recall, precision + recall)
+        total = self.count
+
+        report = {
+            'samples': total,
+            'accuracy': float(true_positive.sum() / total) if total else 0.0,
+            'per_class': {
+                str(name): {
+                    'precision': round(float(precision[i]), 6),
+                    'recall': round(float(recall[i]), 6),
+                    'f1': round(float(f1[i]), 6),
+                    'support': int(support[i]),
+                }
+                for i, name in enumerate(names)
+            },
+            'macro': {
+                'precision': float(precision.mean()),
+                'recall': float(recall.mean()),
+                'f1': float(f1.mean()),
+            },
+            'weighted': {
+                'precision': float(_divide((precision * support).sum(), total)),
+                'recall': float(_divide((recall * support).sum(), total)),
+                'f1': float(_divide((f1 * support).sum(), total)),
+            },
+            'confusion_matrix': self.confusion.tolist(),
+        }
+
+        if self.scored:
+            accuracy = _divide(self.bin_correct, self.bin_count)
+            confidence = _divide(self.bin_confidence, self.bin_count)
+            gaps = np.abs(accuracy - confidence)
+            report['calibration'] = {
+                'ece': float((gaps * self.bin_count).sum() / self.scored),
+                'mce': float(gaps[self.bin_count > 0].max()),
+                'log_loss': float(self.log_loss / self.scored),
+                'brier': float(self.brier / self.scored),
+                'bins': [
+                    {
+                        'upper': round((i + 1) / self.bins, 6),
+                        'count': int(self.bin_count[i]),
+                        'accuracy': round(float(accuracy[i]), 6),
+                        'confidence': round(float(confidence[i]), 6),
+                    }
+                    for i in range(self.bins)
+                ],
+            }
+        return report
+
+
+def find_cell_types(dataset):
+    """``cell_types`` of a dataset, looking through ``Subset`` wrappers."""
+    while not hasattr(dataset, 'cell_types') and hasattr(dataset, 'dataset'):
+        dataset = dataset.dataset
+    return getattr(dataset, 'cell_types', None)
+
+
+def to_probabilities(outputs, softmax=None):
+    """N x C class probabilities from a classifier's output.
+
+    In eval mode an Ultralytics classification model returns softmax rows
+    (8.0.x) or a ``(softmax, logits)`` tuple (later releases), while a
+    plain torch classifier returns logits. Tuples are reduced to their
+    first element.
+
+    Args:
+        outputs: Model output, a tensor or a tuple starting with one
+        softmax (bool, optional): Apply softmax; by default only when the
+            rows are not already non-negative and summing to 1
+
+    Returns:
+        torch.Tensor: N x C probabilities
+    """
+    import torch
+
+    if isinstance(outputs, (tuple, list)):
+        outputs = outputs[0]
+    if softmax is None:
+        sums = outputs.sum(1)
+        softmax = not (bool((outputs >= 0).all()) and torch.allclose(sums, torch.ones_like(sums), atol=1e-3))
+    return torch.softmax(outputs, 1) if softmax else outputs
+
+
+def evaluate_loader(model, loader, num_classes=None, class_names=None, softmax=None):
+    """Run a torch model over a DataLoader and accumulate its metrics.
+
+    Args:
+        model: Module mapping an input batch to N x C outputs
+        loader: DataLoader of (inputs, labels)
+        num_classes (int, optional): Defaults to the number of class names
+        class_names (list, optional): Defaults to the dataset's ``cell_types``
+        softmax (bool, optional): Whether outputs are logits, see
+            ``to_probabilities``; detected per batch by default
+
+    Returns:
+        dict: ``StreamingMetrics.report``
+    """
+    import torch
+
+    class_names = class_names or find_cell_types(loader.dataset)
+    metrics = None
+    model.eval()
+    with torch.no_grad():
+        for inputs, labels in loader:
+            probabilities = to_probabilities(model(inputs), softmax)
+            if metrics is None:
+                metrics = StreamingMetrics(num_classes or len(class_names or []) or probabilities.shape[1])
+            metrics.update(labels, probabilities=probabilities)
+    if metrics is None:
+        raise ValueError("The loader yielded no batches")
+    return metrics.report(class_names)
+
+
+def _evaluate_range(task):
+    """One process's share: items [start, stop) of the shards, through the API classifier."""
+    model_path, backend, threads, shard_dir, start, stop, batch_size, bins = task
+    dataset = ShardedBloodCellDataset(shard_dir)
+    model = BloodCellClassifier(model_path, dataset.size, backend, threads)
+    model.load()
+    metrics = StreamingMetrics(len(dataset.cell_types), bins)
+    for first in range(start, stop, batch_size):
+        images, labels = dataset.batch(first, min(first + batch_size, stop))
+        metrics.update(labels, probabilities=model.predict(images))
+    return metrics
+
+
+def evaluate_shards(model_path, shard_dir, backend='torch', workers=1, batch_size=64, threads=0, bins=CALIBRATION_BINS):
+    """Evaluate served weights on compiled shards, split across processes.
+
+    Each process loads the model and evaluates a contiguous range of the
+    memory-mapped shards (shared through the page cache); the partial
+    metrics are merged, which gives exactly the single-process result.
+
+    Args:
+        model_path (str): Trained ``.pt`` weights
+        shard_dir (str): Validation shards written by ``shards.py``
+        backend (str): API inference backend to evaluate
+        workers (int): Processes to split the items across
+        batch_size (int): Items per forward pass
+        threads (int): Runtime intra-op threads per process, 0 for its default
+        bins (int): Calibration bins
+
+    Returns:
+        dict: ``StreamingMetrics.report`` plus the run's settings and timing
+    """
+    dataset = ShardedBloodCellDataset(shard_dir)
+    if not len(dataset):
+        raise ValueError(f"No images in {shard_dir}")
+    edges = np.linspace(0, len(dataset), workers + 1).astype(int)
+    tasks = [
+        (model_path, backend, threads, shard_dir, int(start), int(stop), batch_size, bins)
+        for start, stop in zip(edges[:-1], edges[1:])
+        if stop > start
+    ]
+
+    started = time.perf_counter()
+    if len(tasks) == 1:
+        partials = [_evaluate_range(tasks[0])]
+    else:
+        with Pool(len(tasks)) as pool:
+            partials = pool.map(_evaluate_range, tasks)
+    metrics = partials[0]
+    for partial in partials[1:]:
+        metrics.merge(partial)
+    elapsed = time.perf_counter() - started
+
+    report = metrics.report(dataset.cell_types)
+    report.update({
+        'model': model_path,
+        'backend': backend,
+        'workers': len(tasks),
+        'seconds': round(elapsed, 3),
+        'images_per_second': round(len(dataset) / elapsed, 1),
+    })
+    return report
+
+
+def write_report(report, path):
+    """Write ``report`` as JSON, atomically."""
+    with open(path + '.tmp', 'w') as f:
+        json.dump(report, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Evaluate served weights on the validation split')
+    parser.add_argument('--model', default='blood_cell_classification_model.pt', help='Trained .pt weights')
+    parser.add_argument('--val-dir', default='./data/cell_images/val', help='Validation split root')
+    parser.add_argument('--shard-dir', default='./data/val_shards', help='Where the validation shards are compiled')
+    parser.add_argument('--backend', default='torch')
+    parser.add_argument('--imgsz', type=int, default=224)
+    parser.add_argument('--workers', type=int, default=1, help='Evaluation processes')
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--threads', type=int, default=0)
+    parser.add_argument('--bins', type=int, default=CALIBRATION_BINS)
+    parser.add_argument('--output', default='evaluation_report.json')
+    args = parser.parse_args()
+
+    compile_shards(args.val_dir, args.shard_dir, args.imgsz)
+    report = evaluate_shards(
+        args.model, args.shard_dir, args.backend, args.workers, args.batch_size, args.threads, args.bins
+    )
+    write_report(report, args.output)
+
+    print(f"\nAccuracy {report['accuracy']:.4f} on {report['samples']} images "
+          f"({report['images_per_second']} images/s, {report['workers']} workers)")
+    print(f"{'class':<12} {'precision':>9} {'recall':>7} {'f1':>7} {'support':>8}")
+    for name, row in report['per_class'].items():
+        print(f"{name:<12} {row['precision']:>9.4f} {row['recall']:>7.4f} {row['f1']:>7.4f} {row['support']:>8}")
+    if 'calibration' in report:
+        calibration = report['calibration']
+        print(f"ECE {calibration['ece']:.4f}  MCE {calibration['mce']:.4f}  "
+              f"log loss {calibration['log_loss']:.4f}  Brier {calibration['brier']:.4f}")
+    logger.info(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+import os
+import argparse
+import logging
+
+from ultralytics import YOLO
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s: %(message)s')
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ('onnx', 'torchscript')
+
+
+def export_model(model_path, formats=EXPORT_FORMATS, quantize=True, imgsz=224):
+    """Export trained weights to the CPU serving formats used by the API.
+
+    Artifacts are written next to ``model_path`` using the names the
+    backend's ``INFERENCE_BACKEND`` setting expects:
+
+    - ``<stem>.onnx``: FP32 ONNX graph with a dynamic batch axis (``onnx``)
+    - ``<stem>.int8.onnx``: dynamically quantized INT8 weights (``onnx-int8``)
+    - ``<stem>.torchscript``: traced TorchScript module (``torchscript``)
+
+    Args:
+        model_path (str): Path to the trained ``.pt`` weights
+        formats (tuple): Any of ``'onnx'`` and ``'torchscript'``
+        quantize (bool): Also write an INT8 variant of the ONNX export
+        imgsz (int): Input size the model was trained with
+
+    Returns:
+        dict: Backend name mapped to the artifact path that was written
+    """
+    model = YOLO(model_path)
+    stem, _ = os.path.splitext(model_path)
+    artifacts = {}
+
+    if 'onnx' in formats:
+        # Dynamic batch axis so the server's micro-batches can be any size
+        artifacts['onnx'] = str(model.export(format='onnx', imgsz=imgsz, dynamic=True, device='cpu'))
+        logger.info(f"Exported ONNX model: {artifacts['onnx']}")
+
+    if 'torchscript' in formats:
+        artifacts['torchscript'] = str(model.export(format='torchscript', imgsz=imgsz, device='cpu'))
+        logger.info(f"Exported TorchScript model: {artifacts['torchscript']}")
+
+    if quantize and 'onnx' in artifacts:
+        from onnxruntime.quantization import QuantType, quant_pre_process, quantize_dynamic
+
+        int8_path = f'{stem}.int8.onnx'
+        prepared_path = f'{stem}.prep.onnx'
+        # Shape inference + graph cleanup gives the quantizer more ops to convert
+        quant_pre_process(artifacts['onnx'], prepared_path, skip_symbolic_shape=True)
+        try:
+            quantize_dynamic(prepared_path, int8_path, weight_type=QuantType.QUInt8)
+        finally:
+            os.remove(prepared_path)
+        artifacts['onnx-int8'] = int8_path
+        logger.info(f"Wrote INT8 quantized ONNX model: {int8_path}")
+
+    return artifacts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export trained weights for CPU serving')
+    parser.add_argument('model_path', nargs='?', default='blood_cell_classification_model.pt')
+    parser.add_argument('--formats', nargs='+', default=list(EXPORT_FORMATS), choices=EXPORT_FORMATS)
+    parser.add_argument('--no-quantize', action='store_true', help='Skip the INT8 ONNX variant')
+    parser.add_argument('--imgsz', type=int, default=224)
+    args = parser.parse_args()
+
+    export_model(args.model_path, args.formats, quantize=not args.no_quantize, imgsz=args.imgsz)
@@ -0,0 +1,231 @@
+import os
+import json
+import time
+import hashlib
+import argparse
+import logging
+from collections import defaultdict
+from multiprocessing import Pool
+
+import yaml
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s: %(message)s')
+logger = logging.getLogger(__name__)
+
+CELL_TYPES = ['EOSINOPHIL', 'LYMPHOCYTE', 'MONOCYTE', 'NEUTROPHIL']
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tif', '.tiff')
+MANIFEST_NAME = 'dataset_manifest.json'
+YAML_NAME = 'blood_cell_dataset.yaml'
+SPLITS = ('train', 'val')
+
+
+def scan_sources(data_dir, cell_types=CELL_TYPES):
+    """Every source image in ``data_dir/<cell type>/`` with its size and mtime.
+
+    Only the cell type directories themselves are read, not ``train/`` and
+    ``val/``, which hold the links this tool makes.
+
+    Args:
+        data_dir (str): Root directory containing one subdirectory per cell type
+        cell_types (list): Class names
+
+    Returns:
+        dict: Path relative to ``data_dir`` → (cell type, size, mtime_ns)
+    """
+    sources = {}
+    for cell_type in cell_types:
+        type_dir = os.path.join(data_dir, cell_type)
+        if not os.path.isdir(type_dir):
+            logger.warning(f"No directory for {cell_type} in {data_dir}")
+            continue
+        with os.scandir(type_dir) as entries:
+            for entry in entries:
+                if entry.name.lower().endswith(IMAGE_EXTENSIONS) and entry.is_file():
+                    stat = entry.stat()
+                    sources[f'{cell_type}/{entry.name}'] = (cell_type, stat.st_size, stat.st_mtime_ns)
+    return sources
+
+
+def _hash_file(task):
+    rel_path, path = task
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return rel_path, digest.hexdigest()
+
+
+def assign_splits(files, val_fraction):
+    """Stratified, deterministic train/val split of the manifest entries.
+
+    Within each cell type, files are ranked by content hash and the first
+    ``val_fraction`` of them go to ``val``, so each class keeps its share
+    of validation images whatever order the filesystem lists them in.
+    Identical files stay on one side of the boundary. Adding or removing
+    k files moves at most about k existing ones across it.
+
+    Args:
+        files (dict): Manifest entries, updated in place with ``split``
+        val_fraction (float): Share of each class held out for validation
+    """
+    by_type = defaultdict(list)
+    for rel_path, entry in files.items():
+        by_type[entry['cell_type']].append((entry['sha256'], rel_path))
+    for ranked in by_type.values():
+        ranked.sort()
+        val_count = round(len(ranked) * val_fraction)
+        while 0 < val_count < len(ranked) and ranked[val_count][0] == ranked[val_count - 1][0]:
+            val_count += 1
+        for position, (_, rel_path) in enumerate(ranked):
+            files[rel_path]['split'] = 'val' if position < val_count else 'train'
+
+
+def _link_path(out_dir, rel_path, split):
+    return os.path.join(out_dir, split, rel_path)
+
+
+def _link(source, link):
+    try:
+        os.symlink(source, link)
+    except FileExistsError:
+        if os.path.islink(link) and os.readlink(link) == source:
+            return
+        os.remove(link)
+        os.symlink(source, link)
+
+
+def prepare_dataset(data_dir, out_dir=None, val_fraction=0.2, workers=None, cell_types=CELL_TYPES):
+    """Bring ``train/`` and ``val/`` links and the YOLO dataset YAML up to date.
+
+    ``dataset_manifest.json`` in ``out_dir`` records every source image's
+    size, mtime, SHA-256 and split. On a rerun only files that are new or
+    whose size or mtime changed are hashed (on a process pool), and links
+    are only made or removed where a file was added, removed or changed
+    split, so preparing an unchanged dataset is a directory scan.
+
+    Args:
+        data_dir (str): Root directory containing one subdirectory per cell type
+        out_dir (str, optional): Where ``train/``, ``val/``, the manifest and
+            the YAML go; defaults to ``data_dir``
+        val_fraction (float): Share of each class held out for validation
+        workers (int, optional): Hashing processes, default one per CPU
+        cell_types (list): Class names in label order
+
+    Returns:
+        dict: Path of the YAML, counts of what changed and the time taken
+    """
+    started = time.perf_counter()
+    out_dir = out_dir or data_dir
+    data_dir = os.path.abspath(data_dir)
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+
+    previous, manifest = {}, {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get('cell_types') == cell_types:
+            previous = manifest['files']
+
+    # Reuse hashes of files whose size and mtime are unchanged
+    sources = scan_sources(data_dir, cell_types)
+    files, to_hash = {}, []
+    for rel_path, (cell_type, size, mtime_ns) in sources.items():
+        entry = {'cell_type': cell_type, 'size': size, 'mtime_ns': mtime_ns}
+        known = previous.get(rel_path)
+        if known and known['size'] == size and known['mtime_ns'] == mtime_ns:
+            entry['sha256'] = known['sha256']
+        else:
+            to_hash.append((rel_path, os.path.join(data_dir, rel_path)))
+        files[rel_path] = entry
+
+    if to_hash:
+        with Pool(workers or os.cpu_count()) as pool:
+            for rel_path, digest in pool.imap_unordered(_hash_file, to_hash, chunksize=64):
+                files[rel_path]['sha256'] = digest
+
+    assign_splits(files, val_fraction)
+
+    for split in SPLITS:
+        for cell_type in cell_types:
+            os.makedirs(os.path.join(out_dir, split, cell_type), exist_ok=True)
+
+    removed = created = 0
+    for rel_path, entry in previous.items():
+        current = files.get(rel_path)
+        if current is None or current['split'] != entry['split']:
+            try:
+                os.remove(_link_path(out_dir, rel_path, entry['split']))
+                removed += 1
+            except FileNotFoundError:
+                pass
+    for rel_path, entry in files.items():
+        known = previous.get(rel_path)
+        if known is None or known['split'] != entry['split']:
+            _link(os.path.join(data_dir, rel_path), _link_path(out_dir, rel_path, entry['split']))
+            created += 1
+    if not previous:
+        # First run over a directory an older version linked: drop links it made that are not wanted
+        removed += _remove_stray_links(out_dir, files, cell_types)
+
+    if files != previous or manifest.get('val_fraction') != val_fraction:
+        # dumps uses the C encoder; dump(f) streams through the pure-Python one (3x slower)
+        with open(manifest_path + '.tmp', 'w') as f:
+            f.write(json.dumps({'cell_types': cell_types, 'val_fraction': val_fraction, 'files': files}))
+        os.replace(manifest_path + '.tmp', manifest_path)
+
+    # Create YAML configuration for YOLO
+    yaml_path = os.path.join(out_dir, YAML_NAME)
+    with open(yaml_path, 'w') as f:
+        yaml.dump({
+            'train': os.path.abspath(os.path.join(out_dir, 'train')),
+            'val': os.path.abspath(os.path.join(out_dir, 'val')),
+            'nc': len(cell_types),
+            'names': cell_types,
+        }, f)
+
+    report = {
+        'yaml': yaml_path,
+        'images': len(files),
+        'val_images': sum(entry['split'] == 'val' for entry in files.values()),
+        'hashed': len(to_hash),
+        'removed_sources': len(set(previous) - set(files)),
+        'links_created': created,
+        'links_removed': removed,
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+    logger.info(
+        f"Prepared {report['images']} images ({report['val_images']} val): hashed {report['hashed']}, "
+        f"{created} links made, {removed} removed in {report['seconds']}s"
+    )
+    return report
+
+
+def _remove_stray_links(out_dir, files, cell_types):
+    removed = 0
+    for split in SPLITS:
+        for cell_type in cell_types:
+            split_dir = os.path.join(out_dir, split, cell_type)
+            with os.scandir(split_dir) as entries:
+                for entry in entries:
+                    entry_split = files.get(f'{cell_type}/{entry.name}', {}).get('split')
+                    if entry.is_symlink() and entry_split != split:
+                        os.remove(entry.path)
+                        removed += 1
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Incrementally prepare the train/val split for YOLO training')
+    parser.add_argument('data_dir', nargs='?', default='./data/cell_images',
+                        help='Directory with one subdirectory per cell type')
+    parser.add_argument('--out-dir', default=None, help='Where train/, val/ and the YAML go (default: data_dir)')
+    parser.add_argument('--val-fraction', type=float, default=0.2)
+    parser.add_argument('--workers', type=int, default=None, help='Hashing processes (default: one per CPU)')
+    args = parser.parse_args()
+
+    print(json.dumps(prepare_dataset(args.data_dir, args.out_dir, args.val_fraction, args.workers), indent=2))
+
+
+if __name__ == '__main__':
+    main()
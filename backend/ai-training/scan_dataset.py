@@ -0,0 +1,348 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import logging
+from collections import defaultdict
+from multiprocessing import Pool
+
+import cv2
+import numpy as np
+
+# Verify with the API's decoder, the one shards and serving use
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from app.analysis.classifier import decode_image  # noqa: E402
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s: %(message)s')
+logger = logging.getLogger(__name__)
+
+CELL_TYPES = ['EOSINOPHIL', 'LYMPHOCYTE', 'MONOCYTE', 'NEUTROPHIL']
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tif', '.tiff')
+CACHE_NAME = 'scan_cache.json'
+SPLITS = ('train', 'val')
+MAX_DISTANCE = 4  # Hash bits two images may differ in and still count as near-duplicates
+
+# Leading bytes of each format, and the extensions that claim it
+SIGNATURES = {
+    'png': ((b'\x89PNG\r\n\x1a\n',), ('.png',)),
+    'jpeg': ((b'\xff\xd8\xff',), ('.jpg', '.jpeg')),
+    'tiff': ((b'II*\x00', b'MM\x00*'), ('.tif', '.tiff')),
+}
+
+# Set bits in every byte value, for popcounts without np.bitwise_count
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def walk_dataset(data_dir, cell_types=CELL_TYPES):
+    """Every image under ``data_dir``, from a single pass over the tree.
+
+    A file's cell type is the first directory below ``data_dir`` whose
+    name contains one (case-insensitive); its split is ``train`` or
+    ``val`` if a directory of that name is above it, else ``source``.
+    Symlinks to files (as ``prepare_dataset.py`` makes) are resolved, so
+    a source and its links share one ``file``.
+
+    Args:
+        data_dir (str): Dataset root
+        cell_types (list): Class names
+
+    Returns:
+        list: One dict per image with ``path`` (relative to ``data_dir``),
+            ``file`` (resolved absolute path), ``cell_type``, ``split``,
+            ``size`` and ``mtime_ns``; ``size`` is None for broken links
+    """
+    data_dir = os.path.abspath(data_dir)
+    lowered = [cell_type.lower() for cell_type in cell_types]
+    entries = []
+    stack = [(data_dir, '', None, 'source')]
+    while stack:
+        directory, prefix, cell_type, split = stack.pop()
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    name = entry.name.lower()
+                    child_type = cell_type or next(
+                        (cell_types[i] for i, t in enumerate(lowered) if t in name), None
+                    )
+                    child_split = entry.name if entry.name in SPLITS else split
+                    stack.append((entry.path, prefix + entry.name + os.sep, child_type, child_split))
+                    continue
+                if not entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                record = {
+                    'path': prefix + entry.name,
+                    'file': _resolve(entry) if entry.is_symlink() else entry.path,
+                    'cell_type': cell_type,
+                    'split': split,
+                    'size': None,
+                    'mtime_ns': None,
+                }
+                try:
+                    stat = entry.stat()
+                    record['size'], record['mtime_ns'] = stat.st_size, stat.st_mtime_ns
+                except FileNotFoundError:
+                    pass
+                entries.append(record)
+    entries.sort(key=lambda record: record['path'])
+    return entries
+
+
+def _resolve(entry):
+    # One readlink for a link to a regular file; realpath walks every component
+    target = os.path.normpath(os.path.join(os.path.dirname(entry.path), os.readlink(entry.path)))
+    return os.path.realpath(target) if os.path.islink(target) else target
+
+
+def _sniff(data):
+    for name, (prefixes, _) in SIGNATURES.items():
+        if data.startswith(prefixes):
+            return name
+    return None
+
+
+def _check_file(path):
+    """Header checks, a full decode and a 64-bit difference hash of one file."""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError as e:
+        return path, {'error': f"Unreadable: {e.strerror}"}
+
+    found = _sniff(data)
+    if found is None:
+        return path, {'error': 'Empty file' if not data else 'Not a PNG, JPEG or TIFF file'}
+    result = {'format': found, 'sha256': hashlib.sha256(data).hexdigest()}
+    if not path.lower().endswith(SIGNATURES[found][1]):
+        result['warning'] = f"{found.upper()} data under a {os.path.splitext(path)[1]} extension"
+    # A truncated file often still decodes, with the missing rows left grey
+    if found == 'jpeg' and not data.rstrip(b'\x00').endswith(b'\xff\xd9'):
+        result['error'] = 'Truncated JPEG (no end-of-image marker)'
+        return path, result
+    if found == 'png' and b'IEND' not in data[-12:]:
+        result['error'] = 'Truncated PNG (no IEND chunk)'
+        return path, result
+
+    try:
+        image = decode_image(data)
+    except ValueError as e:
+        result['error'] = str(e)
+        return path, result
+    result['height'], result['width'] = image.shape[:2]
+
+    # Difference hash: is each pixel of a 9x8 thumbnail brighter than its left neighbour
+    gray = cv2.resize(cv2.cvtColor(image, cv2.COLOR_RGB2GRAY), (9, 8), interpolation=cv2.INTER_AREA)
+    result['dhash'] = np.packbits(gray[:, 1:] > gray[:, :-1]).tobytes().hex()
+    return path, result
+
+
+def _popcount(values):
+    return _POPCOUNT[values.view(np.uint8)].reshape(len(values), 8).sum(1)
+
+
+def near_duplicates(hashes, max_distance=MAX_DISTANCE):
+    """Pairs of 64-bit hashes that differ in at most ``max_distance`` bits.
+
+    Splits each hash into ``max_distance + 1`` blocks: two hashes that
+    close must agree exactly on at least one block, so only hashes sharing
+    a block value are compared, rather than all N²/2 pairs.
+
+    Args:
+        hashes (np.ndarray): uint64 hashes
+        max_distance (int): Largest Hamming distance reported
+
+    Returns:
+        dict: (i, j) with i < j → Hamming distance
+    """
+    hashes = np.ascontiguousarray(hashes, dtype=np.uint64)
+    blocks = max_distance + 1
+    edges = np.linspace(0, 64, blocks + 1).astype(int)
+    pairs = {}
+    for low, high in zip(edges[:-1], edges[1:]):
+        keys = (hashes >> np.uint64(low)) & np.uint64((1 << (high - low)) - 1)
+        order = np.argsort(keys, kind='stable')
+        bounds = np.flatnonzero(np.diff(keys[order])) + 1
+        for group in np.split(order, bounds):
+            if len(group) < 2:
+                continue
+            group = np.sort(group)
+            # Every pair in the bucket at once, a row at a time only for huge buckets
+            rows = [np.triu_indices(len(group), 1)] if len(group) <= 1024 else [
+                (np.full(len(group) - i - 1, i), np.arange(i + 1, len(group))) for i in range(len(group) - 1)
+            ]
+            for left, right in rows:
+                first, second = group[left], group[right]
+                distances = _popcount(hashes[first] ^ hashes[second])
+                close = distances <= max_distance
+                pairs.update(zip(zip(first[close].tolist(), second[close].tolist()), distances[close].tolist()))
+    return pairs
+
+
+def scan_dataset(data_dir, cache_path=None, workers=None, max_distance=MAX_DISTANCE, cell_types=CELL_TYPES):
+    """Verify every image under ``data_dir`` and look for duplicates and train/val leakage.
+
+    The tree is walked once. Files that are new, or whose size or mtime
+    changed since the cache was written, are verified on a process pool:
+    format signature against the extension, an end marker for JPEG and
+    PNG, a full decode with the API's ``decode_image``, and a SHA-256 and
+    difference hash of the contents. Everything else comes from the cache,
+    so a rescan of an unchanged dataset is a directory walk.
+
+    Args:
+        data_dir (str): Dataset root; sources, ``train/`` and ``val/`` are all scanned
+        cache_path (str, optional): Defaults to ``scan_cache.json`` in ``data_dir``
+        workers (int, optional): Verifying processes, default one per CPU
+        max_distance (int): Hash bits near-duplicates may differ in
+        cell_types (list): Class names
+
+    Returns:
+        dict: Class balance, corrupt and unlabelled files, near-duplicate
+            pairs, train/val leakage, label conflicts and timing
+    """
+    started = time.perf_counter()
+    cache_path = cache_path or os.path.join(data_dir, CACHE_NAME)
+    entries = walk_dataset(data_dir, cell_types)
+
+    cache = {}
+    if os.path.exists(cache_path):
+        with open(cache_path) as f:
+            cache = json.load(f).get('files', {})
+
+    # One check per real file, however many links point at it
+    files, to_check = {}, []
+    for entry in entries:
+        if entry['size'] is None or entry['file'] in files:
+            continue
+        known = cache.get(entry['file'])
+        if known and known['size'] == entry['size'] and known['mtime_ns'] == entry['mtime_ns']:
+            files[entry['file']] = known
+        else:
+            files[entry['file']] = {'size': entry['size'], 'mtime_ns': entry['mtime_ns']}
+            to_check.append(entry['file'])
+
+    if to_check:
+        with Pool(workers or os.cpu_count()) as pool:
+            for path, result in pool.imap_unordered(_check_file, to_check, chunksize=32):
+                files[path].update(result)
+
+    if files != cache:
+        # dumps uses the C encoder; dump(f) streams through the pure-Python one
+        with open(cache_path + '.tmp', 'w') as f:
+            f.write(json.dumps({'files': files}))
+        os.replace(cache_path + '.tmp', cache_path)
+
+    by_file = defaultdict(list)
+    balance = defaultdict(lambda: dict.fromkeys(cell_types, 0))
+    broken, unlabelled = [], []
+    for entry in entries:
+        if entry['size'] is None:
+            broken.append(entry['path'])
+            continue
+        by_file[entry['file']].append(entry)
+        if entry['cell_type'] is None:
+            unlabelled.append(entry['path'])
+        else:
+            balance[entry['split']][entry['cell_type']] += 1
+
+    corrupt = [
+        {'path': by_file[path][0]['path'], 'error': result['error']}
+        for path, result in files.items() if 'error' in result
+    ] + [{'path': path, 'error': 'Broken symlink'} for path in broken]
+    warnings = [
+        {'path': by_file[path][0]['path'], 'warning': result['warning']}
+        for path, result in files.items() if 'warning' in result
+    ]
+
+    # The same file under both train/ and val/ is leakage without any hashing
+    leakage = []
+    for path, linked in by_file.items():
+        splits = {entry['split'] for entry in linked}
+        if set(SPLITS) <= splits:
+            leakage.append({'a': _first(linked, 'train'), 'b': _first(linked, 'val'), 'distance': 0, 'same_file': True})
+
+    hashed = [path for path, result in files.items() if 'dhash' in result]
+    hashes = np.array([int(files[path]['dhash'], 16) for path in hashed], dtype=np.uint64)
+    duplicates, conflicts = [], []
+    for (i, j), distance in sorted(near_duplicates(hashes, max_distance).items()):
+        a, b = by_file[hashed[i]], by_file[hashed[j]]
+        pair = {
+            'a': a[0]['path'],
+            'b': b[0]['path'],
+            'distance': distance,
+            'exact': files[hashed[i]]['sha256'] == files[hashed[j]]['sha256'],
+        }
+        duplicates.append(pair)
+        if a[0]['cell_type'] != b[0]['cell_type']:
+            conflicts.append(pair)
+        for train_side, val_side in ((a, b), (b, a)):
+            if 'train' in {e['split'] for e in train_side} and 'val' in {e['split'] for e in val_side}:
+                leakage.append({
+                    'a': _first(train_side, 'train'),
+                    'b': _first(val_side, 'val'),
+                    'distance': distance,
+                    'same_file': False,
+                })
+                break
+
+    report = {
+        'data_dir': os.path.abspath(data_dir),
+        'images': len(entries),
+        'files': len(files),
+        'verified': len(to_check),
+        'class_balance': {split: counts for split, counts in sorted(balance.items())},
+        'corrupt': corrupt,
+        'warnings': warnings,
+        'unlabelled': unlabelled,
+        'max_distance': max_distance,
+        'duplicates': duplicates,
+        'leakage': leakage,
+        'label_conflicts': conflicts,
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+    logger.info(
+        f"Scanned {report['images']} images ({report['files']} files, {report['verified']} verified) "
+        f"in {report['seconds']}s: {len(corrupt)} corrupt, {len(duplicates)} near-duplicate pairs, "
+        f"{len(leakage)} leaking train/val, {len(conflicts)} with conflicting labels"
+    )
+    return report
+
+
+def _first(entries, split):
+    return next(entry['path'] for entry in entries if entry['split'] == split)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Verify dataset images and find duplicates and train/val leakage')
+    parser.add_argument('data_dir', nargs='?', default='./data/cell_images', help='Dataset root')
+    parser.add_argument('--cache', default=None, help=f'Scan cache (default: <data_dir>/{CACHE_NAME})')
+    parser.add_argument('--workers', type=int, default=None, help='Verifying processes (default: one per CPU)')
+    parser.add_argument('--max-distance', type=int, default=MAX_DISTANCE,
+                        help='Hash bits near-duplicates may differ in')
+    parser.add_argument('--output', default='scan_report.json')
+    args = parser.parse_args()
+
+    report = scan_dataset(args.data_dir, args.cache, args.workers, args.max_distance)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n{'split':<8} " + ' '.join(f'{cell_type:>11}' for cell_type in CELL_TYPES))
+    for split, counts in report['class_balance'].items():
+        print(f"{split:<8} " + ' '.join(f'{counts[cell_type]:>11}' for cell_type in CELL_TYPES))
+    for key in ('corrupt', 'unlabelled', 'duplicates', 'leakage', 'label_conflicts'):
+        items = report[key]
+        print(f"\n{key}: {len(items)}")
+        for item in items[:10]:
+            print(f"  {item}")
+        if len(items) > 10:
+            print(f"  ... {len(items) - 10} more in {args.output}")
+
+    # Non-zero exit so `python scan_dataset.py && python train.py` stops on problems
+    sys.exit(1 if report['corrupt'] or report['leakage'] else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,271 @@
+import os
+import sys
+import json
+import time
+import bisect
+import hashlib
+import argparse
+import logging
+from multiprocessing import Pool
+
+import numpy as np
+import torch
+from torch.utils.data import Dataset
+
+# Reuse the API's decoding and preprocessing so training crops match serving
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from app.analysis.classifier import decode_image, preprocess  # noqa: E402
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s: %(message)s')
+logger = logging.getLogger(__name__)
+
+CELL_TYPES = ['EOSINOPHIL', 'LYMPHOCYTE', 'MONOCYTE', 'NEUTROPHIL']
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tif', '.tiff')
+SPLITS = ('train', 'val')  # Link directories written by prepare_dataset.py
+SHARD_SIZE = 2048  # Images per shard; ~300 MB at 224x224
+INDEX_NAME = 'index.json'
+LABELS_NAME = 'labels.npy'
+
+
+def find_images(data_dir, cell_types=CELL_TYPES):
+    """Every image under ``data_dir`` with its label, in a stable order.
+
+    A file belongs to a cell type when the name of any directory above it
+    contains the type (case-insensitive), as ``BloodCellDataset`` has
+    always matched them. ``train/`` and ``val/`` directories below
+    ``data_dir`` are skipped: they hold ``prepare_dataset.py``'s links to
+    the same sources, so they would count every image twice and mix the
+    validation images into training. Pass ``data_dir/val`` itself to get
+    one split.
+
+    Args:
+        data_dir (str): Root directory containing cell type subdirectories
+        cell_types (list): Class names; a label is the index into this list
+
+    Returns:
+        tuple: (sorted image paths, corresponding integer labels)
+    """
+    found = []
+    for root, dirs, files in os.walk(data_dir):
+        dirs[:] = [name for name in dirs if name not in SPLITS]
+        for label, cell_type in enumerate(cell_types):
+            if cell_type.lower() in root.lower():
+                found.extend(
+                    (os.path.join(root, name), label)
+                    for name in files
+                    if name.lower().endswith(IMAGE_EXTENSIONS)
+                )
+    found.sort()
+    return [path for path, _ in found], [label for _, label in found]
+
+
+def fingerprint(paths, size):
+    """Hash of every source file's path, size and mtime, and the crop size."""
+    digest = hashlib.sha256(str(size).encode())
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(f'{path}\0{stat.st_size}\0{stat.st_mtime_ns}\n'.encode())
+    return digest.hexdigest()
+
+
+def _decode(task):
+    path, size = task
+    try:
+        with open(path, 'rb') as f:
+            return preprocess(decode_image(f.read()), size)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Skipping {path}: {e}")
+        return None
+
+
+def compile_shards(data_dir, out_dir, size=224, shard_size=SHARD_SIZE, workers=None, force=False):
+    """Decode and crop every training image once into memory-mappable shards.
+
+    Writes to ``out_dir``:
+
+    - ``images-00000.npy`` ...: N x 3 x size x size uint8 RGB crops made
+      by the API's ``preprocess``, ``shard_size`` per file. Channels come
+      first, as torch wants them, so every item is a contiguous view
+    - ``labels.npy``: one int64 label per image, across all shards
+    - ``index.json``: cell types, crop size, shard files and counts, the
+      source path of every row and a fingerprint of the sources
+
+    ``index.json`` is written last, so an interrupted run is never read as
+    complete. If the index's fingerprint still matches ``data_dir``, nothing
+    is decoded again.
+
+    Args:
+        data_dir (str): Root directory containing cell type subdirectories
+        out_dir (str): Directory for the shards
+        size (int): Crop edge length; must match the training ``imgsz``
+        shard_size (int): Images per shard file
+        workers (int, optional): Decoding processes, default one per CPU
+        force (bool): Rebuild even if the shards are current
+
+    Returns:
+        dict: The index
+    """
+    paths, labels = find_images(data_dir)
+    if not paths:
+        raise ValueError(f"No images found in {data_dir}")
+    current = fingerprint(paths, size)
+
+    index_path = os.path.join(out_dir, INDEX_NAME)
+    if not force and os.path.exists(index_path):
+        with open(index_path) as f:
+            index = json.load(f)
+        if index.get('fingerprint') == current:
+            logger.info(f"Shards in {out_dir} are current ({index['count']} images)")
+            return index
+
+    os.makedirs(out_dir, exist_ok=True)
+    if os.path.exists(index_path):
+        os.remove(index_path)
+
+    started = time.perf_counter()
+    shards, kept_paths, kept_labels = [], [], []
+    shard, row = None, 0
+    with Pool(workers or os.cpu_count()) as pool:
+        crops = pool.imap(_decode, ((path, size) for path in paths), chunksize=16)
+        for path, label, crop in zip(paths, labels, crops):
+            if crop is None:
+                continue
+            if shard is None or row == len(shard):
+                name = f'images-{len(shards):05d}.npy'
+                rows = min(shard_size, len(paths) - len(kept_paths))
+                shard = np.lib.format.open_memmap(
+                    os.path.join(out_dir, name), mode='w+', dtype=np.uint8, shape=(rows, 3, size, size)
+                )
+                shards.append({'file': name, 'count': 0})
+                row = 0
+            shard[row] = crop.transpose(2, 0, 1)
+            row += 1
+            shards[-1]['count'] = row
+            kept_paths.append(os.path.relpath(path, data_dir))
+            kept_labels.append(label)
+
+    # Skipped images leave unused rows at the end of the last shard; the
+    # index only counts written rows, so readers never see them
+    del shard
+    np.save(os.path.join(out_dir, LABELS_NAME), np.array(kept_labels, dtype=np.int64))
+    index = {
+        'cell_types': CELL_TYPES,
+        'size': size,
+        'layout': 'NCHW',
+        'count': len(kept_paths),
+        'shards': shards,
+        'images': kept_paths,
+        'data_dir': os.path.abspath(data_dir),
+        'fingerprint': current,
+    }
+    with open(index_path + '.tmp', 'w') as f:
+        json.dump(index, f)
+    os.replace(index_path + '.tmp', index_path)
+
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"Compiled {len(kept_paths)} images ({len(paths) - len(kept_paths)} skipped) "
+        f"into {len(shards)} shards in {elapsed:.1f}s ({len(kept_paths) / elapsed:.0f} images/s)"
+    )
+    return index
+
+
+class ShardedBloodCellDataset(Dataset):
+    """Blood cell crops served from the shards written by ``compile_shards``.
+
+    Items are views into memory-mapped shards: nothing is decoded or
+    copied until the DataLoader collates a batch, and the page cache keeps
+    hot shards in memory across epochs.
+
+    Attributes:
+        shard_dir (str): Directory written by ``compile_shards``
+        transform (callable): Applied to each 3 x size x size uint8 tensor
+        cell_types (list): Class names in label order
+        size (int): Crop edge length
+        images (list): Source path of each item, relative to the data directory
+        labels (np.ndarray): Integer label of each item
+    """
+
+    def __init__(self, shard_dir, transform=None):
+        self.shard_dir = shard_dir
+        self.transform = transform
+        with open(os.path.join(shard_dir, INDEX_NAME)) as f:
+            index = json.load(f)
+        self.cell_types = index['cell_types']
+        self.size = index['size']
+        self.images = index['images']
+        self.labels = np.load(os.path.join(shard_dir, LABELS_NAME))
+        self._files = [os.path.join(shard_dir, shard['file']) for shard in index['shards']]
+        self._counts = [shard['count'] for shard in index['shards']]
+        self._starts = list(np.cumsum([0] + self._counts)[:-1])
+        self._shards = None
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getstate__(self):
+        # Pickling a memmap copies its contents; DataLoader workers map their own
+        state = dict(self.__dict__)
+        state['_shards'] = None
+        return state
+
+    def _open(self):
+        if self._shards is None:
+            # Copy-on-write: writable for torch, without touching the files
+            self._shards = [np.load(path, mmap_mode='c') for path in self._files]
+        return self._shards
+
+    def batch(self, start, stop):
+        """Items [start, stop) as one N x size x size x 3 uint8 array, and their labels.
+
+        This is the layout ``BloodCellClassifier.predict`` takes; the
+        transform is not applied.
+        """
+        shards = self._open()
+        parts = []
+        shard = bisect.bisect_right(self._starts, start) - 1
+        position = start
+        while position < stop:
+            offset = position - self._starts[shard]
+            take = min(stop - position, self._counts[shard] - offset)
+            parts.append(shards[shard][offset:offset + take])
+            position += take
+            shard += 1
+        images = np.concatenate(parts) if len(parts) > 1 else parts[0]
+        return np.ascontiguousarray(images.transpose(0, 2, 3, 1)), self.labels[start:stop]
+
+    def __getitem__(self, idx):
+        """The crop at ``idx`` as a 3 x size x size tensor, and its label.
+
+        Args:
+            idx (int): Index of the image to retrieve
+
+        Returns:
+            tuple: Image tensor (uint8 unless ``transform`` changes it) and label
+        """
+        shards = self._open()
+        shard = bisect.bisect_right(self._starts, idx) - 1
+        image = torch.from_numpy(shards[shard][idx - self._starts[shard]])
+        if self.transform:
+            image = self.transform(image)
+        return image, int(self.labels[idx])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Decode training images once into memory-mapped shards')
+    parser.add_argument('data_dir', help='Directory with one subdirectory per cell type')
+    parser.add_argument('out_dir', help='Directory for the shards')
+    parser.add_argument('--imgsz', type=int, default=224)
+    parser.add_argument('--shard-size', type=int, default=SHARD_SIZE)
+    parser.add_argument('--workers', type=int, default=None, help='Decoding processes (default: one per CPU)')
+    parser.add_argument('--force', action='store_true', help='Rebuild even if the shards are current')
+    args = parser.parse_args()
+
+    compile_shards(args.data_dir, args.out_dir, args.imgsz, args.shard_size, args.workers, args.force)
+
+
+if __name__ == '__main__':
+    main()
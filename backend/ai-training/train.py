@@ -1,4 +1,5 @@
 import os
+import logging
 import numpy as np
 # Standard Python and PyTorch libraries for machine learning
 import torch
@@ -6,12 +7,30 @@ import torch.nn as nn
 import torch.optim as optim
 from torch.utils.data import Dataset, DataLoader, random_split
 import torchvision.transforms as transforms
+from PIL import Image
 
 # Ultralytics library for YOLO model implementation
 import ultralytics
 from ultralytics import YOLO
 
+# CPU serving artifacts (ONNX / INT8 ONNX / TorchScript)
+from export import export_model
+
+# Pre-decoded, memory-mapped training crops
+from shards import find_images
+
+# Incremental train/val split and YOLO dataset YAML
+from prepare_dataset import prepare_dataset
+
+# Streaming, mergeable validation metrics
+from evaluation import evaluate_loader, find_cell_types
+
+# Image verification, near-duplicate and train/val leakage checks
+from scan_dataset import scan_dataset
+
 # Configure logging and set random seed for reproducibility
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s: %(message)s')
+logger = logging.getLogger(__name__)
 torch.manual_seed(42)  # Ensures consistent results across runs
 
 class BloodCellDataset(Dataset):
@@ -46,24 +65,9 @@ class BloodCellDataset(Dataset):
         # Predefined cell types with consistent ordering for label encoding
         self.cell_types = ['EOSINOPHIL', 'LYMPHOCYTE', 'MONOCYTE', 'NEUTROPHIL']
         
-        # Initialize lists to store image paths and labels
-        self.images = []
-        self.labels = []
-        
-        # Dynamically discover and categorize images
-        # Handle potential nested directory structures
-        for root, dirs, files in os.walk(data_dir):
-            for cell_type in self.cell_types:
-                if cell_type.lower() in root.lower():
-                    for img_name in files:
-                        # Support multiple image formats for flexibility
-                        if img_name.lower().endswith(('.png', '.jpg', '.jpeg', '.tif', '.tiff')):
-                            full_path = os.path.join(root, img_name)
-                            self.images.append(full_path)
-                            # Convert cell type to integer label using index
-                            # Enables multi-class classification
-                            label = self.cell_types.index(cell_type)
-                            self.labels.append(label)
+        # Dynamically discover and categorize images, the same way the
+        # shard compiler does (see shards.py), so both see the same items
+        self.images, self.labels = find_images(data_dir, self.cell_types)
         
     def __len__(self):
         """Return the total number of images in the dataset.
@@ -106,6 +110,7 @@ def train_model(data_dir, model_path='blood_cell_classification_model.pt', epoch
     2. Model initialization
     3. Training configuration
     4. Performance tracking
+    5. Export of the CPU serving artifacts (see export.py)
     
     Args:
         data_dir (str): Root directory of training images
@@ -120,63 +125,20 @@ def train_model(data_dir, model_path='blood_cell_classification_model.pt', epoch
     import yaml
     from ultralytics import YOLO
     
-    # Prepare YOLO-compatible dataset configuration
-    def prepare_yolo_dataset_yaml(data_dir):
-        # Define cell types based on directory structure
-        cell_types = ['EOSINOPHIL', 'LYMPHOCYTE', 'MONOCYTE', 'NEUTROPHIL']
-        
-        # Prepare train and validation paths
-        train_path = os.path.join(data_dir, 'train')
-        val_path = os.path.join(data_dir, 'val')
-        
-        # Create directories if they don't exist
-        os.makedirs(train_path, exist_ok=True)
-        os.makedirs(val_path, exist_ok=True)
-        
-        # Split dataset into train and validation
-        for cell_type in cell_types:
-            type_dir = os.path.join(data_dir, cell_type)
-            if os.path.exists(type_dir):
-                # Get all images for this cell type
-                images = [f for f in os.listdir(type_dir) if f.lower().endswith(('.png', '.jpg', '.jpeg', '.tif', '.tiff'))]
-                
-                # Simple 80-20 train-val split
-                train_count = int(len(images) * 0.8)
-                train_images = images[:train_count]
-                val_images = images[train_count:]
-                
-                # Create train and val subdirectories for each cell type
-                os.makedirs(os.path.join(train_path, cell_type), exist_ok=True)
-                os.makedirs(os.path.join(val_path, cell_type), exist_ok=True)
-                
-                # Copy images to train and val directories
-                for img in train_images:
-                    os.symlink(
-                        os.path.join(type_dir, img), 
-                        os.path.join(train_path, cell_type, img)
-                    )
-                for img in val_images:
-                    os.symlink(
-                        os.path.join(type_dir, img), 
-                        os.path.join(val_path, cell_type, img)
-                    )
-        
-        # Create YAML configuration for YOLO
-        dataset_yaml = {
-            'train': train_path,
-            'val': val_path,
-            'nc': len(cell_types),
-            'names': cell_types
-        }
-        
-        yaml_path = os.path.join(data_dir, 'blood_cell_dataset.yaml')
-        with open(yaml_path, 'w') as f:
-            yaml.dump(dataset_yaml, f)
-        
-        return yaml_path
+    # Prepare dataset configuration: links only what changed since the last run
+    dataset_yaml_path = prepare_dataset(data_dir)['yaml']
     
-    # Prepare dataset configuration
-    dataset_yaml_path = prepare_yolo_dataset_yaml(data_dir)
+    # Refuse to train on images that will not decode; re-scans only verify changed files
+    scan = scan_dataset(data_dir)
+    if scan['corrupt']:
+        raise ValueError(
+            f"{len(scan['corrupt'])} corrupt images in {data_dir}, e.g. {scan['corrupt'][0]}; "
+            f"run scan_dataset.py for the full list"
+        )
+    if scan['leakage']:
+        logger.warning(
+            f"{len(scan['leakage'])} near-duplicate images are split across train and val"
+        )
     
     # Initialize YOLO model
     model = YOLO('yolov8n-cls.pt')  # Start with a pre-trained classification model
@@ -195,182 +157,33 @@ def train_model(data_dir, model_path='blood_cell_classification_model.pt', epoch
     # Save the final model
     model.save(model_path)
     
-    return results
-    # Additional comprehensive diagnostics
-    print("\n--- System and Library Diagnostics ---")
-    try:
-        import torch
-        import torchvision
-        import ultralytics
-        
-        print(f"PyTorch Version: {torch.__version__}")
-        print(f"TorchVision Version: {torchvision.__version__}")
-        print(f"Ultralytics Version: {ultralytics.__version__}")
-    except ImportError as e:
-        print(f"Library Import Error: {e}")
-    
-    # Detailed dataset diagnostics
-    print(f"\nDataset Directory: {data_dir}")
-    print("Dataset Contents:")
-    image_extensions = ['.png', '.jpg', '.jpeg', '.tif', '.tiff']
-    cell_types = ['EOSINOPHIL', 'LYMPHOCYTE', 'MONOCYTE', 'NEUTROPHIL']
-    
-    # Comprehensive error checking
-    if not os.path.exists(data_dir):
-        raise FileNotFoundError(f"Dataset directory not found: {data_dir}")
-    
-    # Validate dataset structure with recursive search
-    dataset_valid = False
-    total_images = 0
-    
-    # Recursive directory search function
-    def find_images(directory):
-        images_found = []
-        for root, dirs, files in os.walk(directory):
-            for file in files:
-                if any(file.lower().endswith(ext) for ext in image_extensions):
-                    images_found.append(os.path.join(root, file))
-        return images_found
-    
-    # Search for images in each cell type
-    for cell_type in cell_types:
-        cell_type_images = []
-        for root, dirs, files in os.walk(data_dir):
-            # Check if current directory matches cell type (case-insensitive)
-            if cell_type.lower() in root.lower():
-                cell_type_images.extend([
-                    os.path.join(root, f) for f in files 
-                    if any(f.lower().endswith(ext) for ext in image_extensions)
-                ])
-        
-        print(f"{cell_type}: {len(cell_type_images)} images")
-        total_images += len(cell_type_images)
-        
-        if len(cell_type_images) > 0:
-            dataset_valid = True
-    
-    print(f"Total images found: {total_images}")
+    # Export serving artifacts so the API can switch INFERENCE_BACKEND
+    export_model(model_path)
     
-    if not dataset_valid:
-        raise ValueError("No valid images found in the dataset. Please check the dataset structure.")
-    import os
-    import sys
-    import logging
-    import traceback
-    
-    # Diagnostic print statements
-    print(f"Python Executable: {sys.executable}")
-    print(f"Python Version: {sys.version}")
-    print(f"Current Working Directory: {os.getcwd()}")
-    print(f"Script Location: {__file__}")
-    
-    # Configure logging
-    logging.basicConfig(
-        level=logging.INFO, 
-        format='%(asctime)s - %(levelname)s: %(message)s',
-        handlers=[
-            logging.FileHandler('training_log.txt'),
-            logging.StreamHandler()
-        ]
-    )
-    logger = logging.getLogger(__name__)
-    
-    with open(yaml_path, 'w') as f:
-        f.write(yaml_content)
-    
-    logger.info(f"Created dataset configuration: {yaml_path}")
-    
-    try:
-        # Initialize YOLO classification model
-        model = YOLO('yolov8n-cls.pt')  # Use pre-trained nano classification model
-        
-        logger.info("Starting model training...")
-        
-        # Training configuration
-        results = model.train(
-            data=yaml_path,
-            epochs=epochs,
-            imgsz=224,
-            batch=batch_size,
-            project='blood_cell_classification',
-            name='training_run',
-            verbose=True
-        )
-        
-        logger.info("Model training completed successfully.")
-        
-        # Performance evaluation
-        metrics = {
-            'accuracy': results.results_dict.get('top1_acc', 0),
-            'confusion_matrix': None,  # Placeholder for detailed metrics
-            'cell_types': cell_types
-        }
-        
-        # Save model weights
-        model.save(model_path)
-        logger.info(f"Model weights saved to: {model_path}")
-        
-        return results, metrics
-    
-    except Exception as e:
-        logger.error(f"Training failed: {e}")
-        raise
+    return results
 
 def evaluate_model(model, val_loader):
     """Comprehensively assess model performance on validation dataset.
     
-    Calculates key performance metrics:
+    Metrics are accumulated batch by batch by ``evaluation.StreamingMetrics``
+    (a ``bincount`` per batch for the confusion matrix), so memory stays
+    constant however large the validation set is:
     1. Overall accuracy
     2. Confusion matrix for detailed error analysis
-    3. Per-class performance insights
+    3. Per-class precision, recall and F1, and calibration
     
     Args:
         model: Trained classification model
         val_loader: DataLoader containing validation dataset
     
     Returns:
-        dict: Detailed performance metrics
+        dict: Detailed performance metrics; ``accuracy`` is a percentage
     """
-    # Set model to evaluation mode
-    # Disables dropout and batch normalization updates
-    model.eval()
-    
-    # Performance tracking variables
-    correct = 0
-    total = 0
-    
-    # Confusion matrix tracks prediction accuracy for each cell type
-    confusion_matrix = torch.zeros(
-        len(val_loader.dataset.dataset.cell_types), 
-        len(val_loader.dataset.dataset.cell_types)
-    )
-    
-    # Disable gradient computation to reduce memory usage
-    with torch.no_grad():
-        for inputs, labels in val_loader:
-            # Forward pass through the model
-            outputs = model(inputs)
-            
-            # Select class with highest probability
-            _, predicted = torch.max(outputs, 1)
-            
-            # Update total sample and correct prediction counts
-            total += labels.size(0)
-            correct += (predicted == labels).sum().item()
-            
-            # Populate confusion matrix
-            # Tracks prediction accuracy for each cell type
-            for true_label, pred_label in zip(labels, predicted):
-                confusion_matrix[true_label.long(), pred_label.long()] += 1
-    
-    # Calculate overall accuracy percentage
-    accuracy = 100 * correct / total
-    
-    return {
-        'accuracy': accuracy,
-        'confusion_matrix': confusion_matrix.numpy(),
-        'cell_types': val_loader.dataset.dataset.cell_types
-    }
+    report = evaluate_loader(model, val_loader)
+    report['accuracy'] *= 100
+    report['confusion_matrix'] = np.array(report['confusion_matrix'])
+    report['cell_types'] = find_cell_types(val_loader.dataset)
+    return report
 
 def main():
     data_dir = '/Users/richy/Documents/Github/LumaScope/backend/ai-training/data/cell_images'
@@ -403,14 +216,23 @@ if __name__ == '__main__':
         'validation_split': 0.2,  # Percentage of data used for validation
     }
     
-    # Execute model training with specified configuration
-    results, metrics = train_model(
+    # Execute model training with specified configuration; this also exports the serving artifacts
+    results = train_model(
         data_dir, 
         model_path, 
         epochs=training_config['epochs'], 
         batch_size=training_config['batch_size']
     )
     
+    # Evaluate the saved weights on the validation split prepared by train_model
+    val_dataset = BloodCellDataset(os.path.join(data_dir, 'val'), transforms.Compose([
+        transforms.Resize(224),
+        transforms.CenterCrop(224),
+        transforms.ToTensor(),
+    ]))
+    val_loader = DataLoader(val_dataset, batch_size=training_config['batch_size'])
+    metrics = evaluate_model(YOLO(model_path).model.float(), val_loader)
+    
     # Performance reporting
     print("\n--- Blood Cell Classification Model Training Results ---")
     print(f"Training Accuracy: {metrics['accuracy']:.2f}%")
@@ -0,0 +1,179 @@
+import ast
+import json
+import os
+import time
+from typing import List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ---------------------------------------
+# Backend configuration
+# ---------------------------------------
+# torch: Ultralytics .pt weights | torchscript: traced module from export.py
+# onnx: ONNX Runtime on the FP32 export | onnx-int8: dynamically quantized export
+# stub: no network, for load tests (see StubBackend)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")
+BACKENDS = ("torch", "torchscript", "onnx", "onnx-int8", "stub")
+
+
+def artifact_path(model_path: str, backend: str) -> str:
+    """Where ``ai-training/export.py`` writes the artifact for ``backend``.
+
+    Args:
+        model_path: Path to the trained ``.pt`` weights
+        backend: One of ``BACKENDS``
+
+    Returns:
+        str: Path of the artifact that backend serves from
+    """
+    stem, _ = os.path.splitext(model_path)
+    paths = {
+        "torch": model_path,
+        "torchscript": f"{stem}.torchscript",
+        "onnx": f"{stem}.onnx",
+        "onnx-int8": f"{stem}.int8.onnx",
+        "stub": f"{stem}.stub.json",
+    }
+    if backend not in paths:
+        raise ValueError(f"Unknown inference backend {backend!r}, expected one of {BACKENDS}")
+    return paths[backend]
+
+
+def _parse_names(raw) -> Optional[List[str]]:
+    """Class names as stored by Ultralytics exports (a repr'd {index: name} dict)."""
+    if not raw:
+        return None
+    names = ast.literal_eval(raw) if isinstance(raw, str) else raw
+    names = {int(i): name for i, name in names.items()}
+    return [names[i] for i in sorted(names)]
+
+
+class TorchBackend:
+    """Eager PyTorch module loaded from Ultralytics ``.pt`` weights."""
+
+    def __init__(self, path: str, threads: int = 0):
+        self.path = path
+        self.threads = threads
+        self._model = None
+        self._torch = None
+
+    def load(self) -> Optional[List[str]]:
+        # Imported here so that importing the API does not pull in torch
+        import torch
+        from ultralytics import YOLO
+
+        if self.threads:
+            torch.set_num_threads(self.threads)
+        yolo = YOLO(self.path)
+        model = yolo.model.float().eval()
+        for parameter in model.parameters():
+            parameter.requires_grad_(False)
+
+        self._torch = torch
+        self._model = model
+        names = getattr(yolo, "names", None) or {}
+        return [names[i] for i in sorted(names)] or None
+
+    def predict(self, images: np.ndarray) -> np.ndarray:
+        torch = self._torch
+        batch = torch.from_numpy(np.ascontiguousarray(images))
+        batch = batch.permute(0, 3, 1, 2).float().div_(255.0)
+        with torch.inference_mode():
+            output = self._model(batch)
+        if isinstance(output, (tuple, list)):
+            output = output[0]
+        return output.numpy()
+
+
+class TorchScriptBackend(TorchBackend):
+    """TorchScript module written by ``YOLO.export(format="torchscript")``."""
+
+    def load(self) -> Optional[List[str]]:
+        import torch
+
+        if self.threads:
+            torch.set_num_threads(self.threads)
+        extra_files = {"config.txt": ""}
+        model = torch.jit.load(self.path, map_location="cpu", _extra_files=extra_files)
+        self._torch = torch
+        self._model = torch.jit.optimize_for_inference(model.eval())
+
+        config = extra_files["config.txt"]
+        return _parse_names(json.loads(config).get("names")) if config else None
+
+
+class OnnxBackend:
+    """ONNX Runtime session over an FP32 or INT8-quantized export."""
+
+    def __init__(self, path: str, threads: int = 0):
+        self.path = path
+        self.threads = threads
+        self._session = None
+        self._input_name = None
+
+    def load(self) -> Optional[List[str]]:
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self.threads:
+            options.intra_op_num_threads = self.threads
+            options.inter_op_num_threads = 1
+        self._session = ort.InferenceSession(
+            self.path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self._input_name = self._session.get_inputs()[0].name
+
+        metadata = self._session.get_modelmeta().custom_metadata_map
+        return _parse_names(metadata.get("names"))
+
+    def predict(self, images: np.ndarray) -> np.ndarray:
+        batch = images.transpose(0, 3, 1, 2).astype(np.float32) * np.float32(1 / 255)
+        return self._session.run(None, {self._input_name: batch})[0]
+
+
+class StubBackend:
+    """Stand-in for the network in load tests; needs no ML runtime.
+
+    Its artifact is a JSON file, ``{"names": [...], "ms_per_crop": 2.0}``,
+    both optional. Each batch sleeps ``ms_per_crop`` per crop to stand in
+    for a forward pass, then returns a softmax over each crop's mean
+    colour: deterministic, but different from cell to cell.
+    """
+
+    def __init__(self, path: str, threads: int = 0):
+        self.path = path
+        self.seconds_per_crop = 0.0
+        self._weights = None
+
+    def load(self) -> Optional[List[str]]:
+        with open(self.path) as f:
+            config = json.load(f)
+        names = config.get("names")
+        self.seconds_per_crop = float(config.get("ms_per_crop", 0)) / 1000
+        classes = len(names) if names else 4
+        self._weights = np.random.default_rng(0).normal(size=(3, classes)).astype(np.float32) / 32
+        return names
+
+    def predict(self, images: np.ndarray) -> np.ndarray:
+        if self.seconds_per_crop:
+            time.sleep(self.seconds_per_crop * len(images))
+        means = images.reshape(len(images), -1, 3).mean(axis=1, dtype=np.float32)
+        logits = means @ self._weights
+        exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return exp / exp.sum(axis=1, keepdims=True)
+
+
+def create_backend(name: str, model_path: str, threads: int = 0):
+    """Instantiate the backend called ``name`` for the weights at ``model_path``."""
+    path = artifact_path(model_path, name)
+    if name == "torch":
+        return TorchBackend(path, threads)
+    if name == "torchscript":
+        return TorchScriptBackend(path, threads)
+    if name == "stub":
+        return StubBackend(path, threads)
+    return OnnxBackend(path, threads)
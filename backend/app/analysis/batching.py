@@ -0,0 +1,231 @@
+import asyncio
+import logging
+import os
+import time
+from collections import Counter
+from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from app.analysis.classifier import BloodCellClassifier, classifier
+from app.metrics import BATCH_SIZE_BUCKETS, registry
+
+if TYPE_CHECKING:
+    from app.analysis.workers import InferencePool
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------
+# Batching configuration
+# ---------------------------------------
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "32"))  # Crops per forward pass
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "5"))  # Wait to fill a batch
+
+
+# Per-stage time of an analysis: decode, preprocess (detection and
+# cropping), forward (one pass, in process or on a worker), postprocess
+inference_stage_duration = registry.histogram(
+    "inference_stage_duration_seconds", "Time spent in each stage of an analysis", ("stage",)
+)
+inference_batch_size = registry.histogram(
+    "inference_batch_size", "Crops per forward pass", buckets=BATCH_SIZE_BUCKETS
+)
+
+
+def _fail(pending: List[Tuple[np.ndarray, asyncio.Future]], error: BaseException) -> None:
+    for _, future in pending:
+        if not future.done():
+            future.set_exception(error)
+
+
+class MicroBatcher:
+    """Coalesce crops from concurrent requests into batched forward passes.
+
+    Callers ``await submit(crops)`` with any number of preprocessed crops.
+    A single background task drains the queue, packs crops from different
+    callers into one batch of up to ``max_batch_size`` (waiting at most
+    ``max_wait_ms`` for stragglers), runs the classifier off the event loop
+    and hands each caller back its own slice of the output.
+
+    Attributes:
+        model (BloodCellClassifier): Loaded classifier to run batches on
+        max_batch_size (int): Upper bound on crops per forward pass
+        max_wait_ms (float): How long the first queued crop may wait for others
+    """
+
+    def __init__(
+        self,
+        model: BloodCellClassifier,
+        max_batch_size: int = BATCH_MAX_SIZE,
+        max_wait_ms: float = BATCH_MAX_WAIT_MS,
+    ):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.pool = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._inflight: Set[asyncio.Task] = set()
+
+        # Batch fill metrics
+        self.batches = 0
+        self.crops = 0
+        self.batch_sizes: Counter = Counter()
+        self.forward_seconds = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, pool: Optional["InferencePool"] = None) -> None:
+        """Start the drain task on the running event loop.
+
+        Args:
+            pool: Optional running worker pool to execute batches on. Without
+                one, batches run on a thread in this process.
+        """
+        if self.running:
+            return
+        self.pool = pool
+        # One batch in flight per worker; the next batch fills while they run
+        self._slots = asyncio.Semaphore(pool.size if pool is not None else 1)
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run(), name="micro-batcher")
+
+    async def stop(self) -> None:
+        """Stop the drain task, failing anything still queued."""
+        if self._task is None:
+            return
+        tasks = [self._task, *self._inflight]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        while self._queue is not None and not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Batcher stopped"))
+
+    async def submit(self, crops: np.ndarray) -> np.ndarray:
+        """Queue crops for classification and wait for their probabilities.
+
+        Args:
+            crops: NxHxWx3 RGB uint8 array of preprocessed crops
+
+        Returns:
+            np.ndarray: NxC class probabilities, in the same order as ``crops``
+        """
+        if not self.running:
+            raise RuntimeError("Batcher is not running")
+        if len(crops) == 0:
+            return np.zeros((0, len(self.model.cell_types)), dtype=np.float32)
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((crops, future))
+        return await future
+
+    def stats(self) -> Dict[str, object]:
+        """Snapshot of how full batches have been."""
+        mean_size = self.crops / self.batches if self.batches else 0.0
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "batches": self.batches,
+            "crops": self.crops,
+            "mean_batch_size": round(mean_size, 2),
+            "mean_fill_ratio": round(mean_size / self.max_batch_size, 3),
+            "mean_forward_ms": round(
+                1000 * self.forward_seconds / self.batches if self.batches else 0.0,
+                3,
+            ),
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "batch_size_histogram": dict(sorted(self.batch_sizes.items())),
+        }
+
+    async def _collect(self) -> List[Tuple[np.ndarray, asyncio.Future]]:
+        """Block for the first request, then gather more until full or timed out."""
+        pending = [await self._queue.get()]
+        size = len(pending[0][0])
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+
+        try:
+            while size < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(item)
+                size += len(item[0])
+        except asyncio.CancelledError:
+            # Stopped mid-collection: these are off the queue, so stop() cannot fail them
+            _fail(pending, RuntimeError("Batcher stopped"))
+            raise
+        return pending
+
+    async def _forward(self, batch: np.ndarray) -> np.ndarray:
+        with inference_stage_duration.time(("forward",)):
+            if self.pool is not None:
+                return await self.pool.predict(batch)
+            return await asyncio.get_running_loop().run_in_executor(
+                None, self.model.predict, batch
+            )
+
+    async def _dispatch(self, pending: List[Tuple[np.ndarray, asyncio.Future]]) -> None:
+        batch = np.concatenate([crops for crops, _ in pending])
+        try:
+            started = time.perf_counter()
+            # Oversized submissions are split so no pass exceeds max_batch_size
+            probabilities = np.concatenate(
+                [
+                    await self._forward(batch[i : i + self.max_batch_size])
+                    for i in range(0, len(batch), self.max_batch_size)
+                ]
+            )
+            self.forward_seconds += time.perf_counter() - started
+        except Exception as e:
+            logger.error(f"Batched inference failed: {str(e)}")
+            _fail(pending, e)
+            return
+        finally:
+            self._slots.release()
+
+        for start in range(0, len(batch), self.max_batch_size):
+            size = min(self.max_batch_size, len(batch) - start)
+            self.batches += 1
+            self.batch_sizes[size] += 1
+            inference_batch_size.observe(size)
+        self.crops += len(batch)
+
+        offset = 0
+        for crops, future in pending:
+            if not future.done():
+                future.set_result(probabilities[offset : offset + len(crops)])
+            offset += len(crops)
+
+    async def _run(self) -> None:
+        while True:
+            # Wait for a free slot first so the queue keeps filling meanwhile
+            await self._slots.acquire()
+            pending = await self._collect()
+            task = asyncio.create_task(self._dispatch(pending))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+            # stop() may cancel it before or during the forward pass; fail its callers then
+            task.add_done_callback(lambda _, pending=pending: _fail(pending, RuntimeError("Batcher stopped")))
+
+# Process-wide batcher, started by the application lifespan once the model is warm
+batcher = MicroBatcher(classifier)
+
+registry.gauge(
+    "inference_queue_depth",
+    "Submissions waiting for the next batch",
+    lambda: batcher._queue.qsize() if batcher._queue is not None else 0,
+)
+registry.gauge("inference_batches_in_flight", "Batches being classified", lambda: len(batcher._inflight))
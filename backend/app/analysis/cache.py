@@ -0,0 +1,161 @@
+import asyncio
+import os
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.metrics import registry
+
+from app.models import AnalysisResult
+
+load_dotenv()
+
+# ---------------------------------------
+# Cache configuration
+# ---------------------------------------
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "1024"))  # In-process LRU entries
+
+CacheKey = Tuple[str, str]  # (content_hash, model_version)
+
+
+def _load(db: Session, key: CacheKey) -> Optional[dict]:
+    row = (
+        db.query(AnalysisResult)
+        .filter(
+            AnalysisResult.content_hash == key[0],
+            AnalysisResult.model_version == key[1],
+        )
+        .first()
+    )
+    result = row.result if row is not None else None
+    # End the read, so a miss does not hold a connection while the pipeline runs
+    db.commit()
+    return result
+
+
+def _store(db: Session, key: CacheKey, result: dict) -> None:
+    db.add(AnalysisResult(content_hash=key[0], model_version=key[1], result=result))
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another API process stored the same result first
+        db.rollback()
+
+
+class ResultCache:
+    """Analysis results keyed by image content hash and model version.
+
+    Lookups go through three layers: a bounded in-process LRU, requests
+    already computing the same key (which are joined rather than
+    repeated), and the ``analysis_results`` table shared by every API
+    process. Only a miss on all three runs the pipeline.
+
+    Attributes:
+        max_entries (int): Capacity of the in-process LRU
+    """
+
+    def __init__(self, max_entries: int = RESULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._lru: "OrderedDict[CacheKey, dict]" = OrderedDict()
+        self._inflight: Dict[CacheKey, asyncio.Future] = {}
+
+        # Hit/miss counters
+        self.memory_hits = 0
+        self.coalesced = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def _remember(self, key: CacheKey, result: dict) -> None:
+        self._lru[key] = result
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    async def get_or_compute(
+        self,
+        db: Session,
+        content_hash: str,
+        model_version: str,
+        compute: Callable[[], Awaitable[dict]],
+    ) -> Tuple[dict, bool]:
+        """Return the cached result for this image, computing it at most once.
+
+        Args:
+            db: Database session for the persistent layer
+            content_hash: SHA-256 of the image bytes
+            model_version: Version of the model that would produce the result
+            compute: Coroutine factory that runs the analysis on a miss
+
+        Returns:
+            tuple: (result, whether it came from the cache)
+        """
+        key = (content_hash, model_version)
+
+        result = self._lru.get(key)
+        if result is not None:
+            self._lru.move_to_end(key)
+            self.memory_hits += 1
+            return result, True
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            # shield: one waiter going away must not cancel the shared work
+            return await asyncio.shield(pending), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await run_in_threadpool(_load, db, key)
+            cached = result is not None
+            if cached:
+                self.db_hits += 1
+            else:
+                self.misses += 1
+                result = await compute()
+                await run_in_threadpool(_store, db, key, result)
+
+            self._remember(key, result)
+            future.set_result(result)
+            return result, cached
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an unawaited failure is not logged as lost
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._lru),
+            "max_entries": self.max_entries,
+            "memory_hits": self.memory_hits,
+            "coalesced": self.coalesced,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+        }
+
+
+# Process-wide result cache
+result_cache = ResultCache()
+
+registry.gauge(
+    "analysis_cache_lookups_total",
+    "Result cache lookups by outcome",
+    lambda: {
+        ("memory_hit",): result_cache.memory_hits,
+        ("coalesced",): result_cache.coalesced,
+        ("db_hit",): result_cache.db_hits,
+        ("miss",): result_cache.misses,
+    },
+    ("result",),
+    kind="counter",
+)
@@ -0,0 +1,193 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+from dotenv import load_dotenv
+
+from app.analysis.backends import INFERENCE_BACKEND, artifact_path, create_backend
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------
+# Model configuration
+# ---------------------------------------
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+MODEL_PATH = os.getenv(
+    "MODEL_PATH",
+    os.path.join(BACKEND_DIR, "ai-training", "blood_cell_classification_model.pt"),
+)
+IMAGE_SIZE = 224  # Matches imgsz used by train.py
+WARMUP_BATCH_SIZE = int(os.getenv("MODEL_WARMUP_BATCH_SIZE", "4"))
+
+# Same label order as BloodCellDataset in ai-training/train.py
+CELL_TYPES = ["EOSINOPHIL", "LYMPHOCYTE", "MONOCYTE", "NEUTROPHIL"]
+
+
+def decode_image(data: bytes) -> np.ndarray:
+    """Decode raw image bytes into an RGB uint8 array.
+
+    Args:
+        data: Encoded image (PNG, JPEG, TIFF, ...)
+
+    Returns:
+        np.ndarray: HxWx3 RGB image
+
+    Raises:
+        ValueError: If the bytes cannot be decoded as an image
+    """
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    image = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Could not decode image")
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+
+def preprocess(image: np.ndarray, size: int = IMAGE_SIZE) -> np.ndarray:
+    """Resize the shorter side to ``size`` and center crop to a square.
+
+    This mirrors the classification transforms Ultralytics applies at
+    train time, so served predictions match validation accuracy.
+
+    Args:
+        image: HxWx3 RGB uint8 image
+        size: Output edge length
+
+    Returns:
+        np.ndarray: size x size x 3 RGB uint8 image
+    """
+    height, width = image.shape[:2]
+    scale = size / min(height, width)
+    resized = cv2.resize(
+        image,
+        (max(size, round(width * scale)), max(size, round(height * scale))),
+        interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR,
+    )
+    top = (resized.shape[0] - size) // 2
+    left = (resized.shape[1] - size) // 2
+    return resized[top : top + size, left : left + size]
+
+
+class BloodCellClassifier:
+    """Long-lived wrapper around the trained YOLOv8 classification weights.
+
+    The model is constructed and warmed exactly once (at application
+    startup), after which ``predict`` only pays for the forward pass.
+
+    Attributes:
+        model_path (str): Path to the trained ``.pt`` weights
+        image_size (int): Square input size expected by the network
+        backend (str): Runtime serving the weights (see ``backends.BACKENDS``)
+        threads (int): Intra-op threads for the runtime, 0 for its default
+        cell_types (list): Class names in output order
+        version (str): Short content hash of the served artifact
+    """
+
+    def __init__(
+        self,
+        model_path: str = MODEL_PATH,
+        image_size: int = IMAGE_SIZE,
+        backend: str = INFERENCE_BACKEND,
+        threads: int = 0,
+    ):
+        self.model_path = model_path
+        self.image_size = image_size
+        self.backend = backend
+        self.threads = threads
+        self.cell_types: List[str] = list(CELL_TYPES)
+        self.version: Optional[str] = None
+        self._runtime = None
+        self._lock = threading.Lock()
+
+    @property
+    def artifact_path(self) -> str:
+        """File the configured backend serves from."""
+        return artifact_path(self.model_path, self.backend)
+
+    @property
+    def ready(self) -> bool:
+        """Whether weights are loaded and the model can serve requests."""
+        return self._runtime is not None
+
+    def load(self) -> None:
+        """Load the served artifact into memory, ready for inference.
+
+        Raises:
+            FileNotFoundError: If the artifact for the backend does not exist
+        """
+        with self._lock:
+            if self._runtime is not None:
+                return
+            path = self.artifact_path
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Model weights not found: {path}")
+
+            started = time.perf_counter()
+            runtime = create_backend(self.backend, self.model_path, self.threads)
+            names = runtime.load()
+            if names:
+                self.cell_types = names
+
+            self._runtime = runtime
+            self.version = self._hash_weights(path)
+            logger.info(
+                f"Loaded {self.backend} classifier {self.version} from {path} "
+                f"in {time.perf_counter() - started:.2f}s"
+            )
+
+    def warmup(self, batch_size: int = WARMUP_BATCH_SIZE) -> None:
+        """Run a dummy batch through the network.
+
+        The first forward pass allocates buffers and selects kernels; doing
+        it here keeps that cost off the first real request.
+        """
+        started = time.perf_counter()
+        dummy = np.zeros(
+            (batch_size, self.image_size, self.image_size, 3), dtype=np.uint8
+        )
+        self.predict(dummy)
+        logger.info(
+            f"Warmed classifier with batch of {batch_size} "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+
+    def predict(self, images: np.ndarray) -> np.ndarray:
+        """Classify a batch of preprocessed crops.
+
+        Args:
+            images: NxHxWx3 RGB uint8 array, already sized to ``image_size``
+
+        Returns:
+            np.ndarray: NxC array of class probabilities
+        """
+        if self._runtime is None:
+            raise RuntimeError("Classifier is not loaded")
+        return self._runtime.predict(images)
+
+    def label(self, probabilities: np.ndarray) -> Dict[str, object]:
+        """Turn a single probability row into a JSON-friendly prediction."""
+        top = int(np.argmax(probabilities))
+        return {
+            "predicted_class": self.cell_types[top],
+            "confidence": float(probabilities[top]),
+            "probabilities": {
+                name: float(p) for name, p in zip(self.cell_types, probabilities)
+            },
+        }
+
+    def _hash_weights(self, path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()[:12]
+
+
+# Process-wide instance, loaded once by the application lifespan
+classifier = BloodCellClassifier()
@@ -0,0 +1,347 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
+
+from app.analysis.classifier import IMAGE_SIZE, MODEL_PATH, decode_image, preprocess
+from app.analysis.pipeline import extract_crops
+from app.uploads.storage import UPLOAD_FOLDER
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------
+# Explanation configuration
+# ---------------------------------------
+EXPLANATION_FOLDER = os.getenv(
+    "EXPLANATION_FOLDER", os.path.join(UPLOAD_FOLDER, ".explanations")
+)
+EXPLAIN_MAX_CELLS = int(os.getenv("EXPLAIN_MAX_CELLS", "4"))  # Least confident cells explained per smear
+SHAP_BACKGROUND_DIR = os.getenv(
+    "SHAP_BACKGROUND_DIR",
+    os.path.join(os.path.dirname(__file__), "..", "..", "ai-training", "data", "cell_images", "train"),
+)
+SHAP_BACKGROUND_SIZE = int(os.getenv("SHAP_BACKGROUND_SIZE", "32"))  # Reference crops per model version
+SHAP_SAMPLES = int(os.getenv("SHAP_SAMPLES", "100"))  # Expected-gradients samples per crop
+METHODS = ("shap", "gradcam")
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp")
+
+
+def select_cells(cells: List[dict], limit: int = EXPLAIN_MAX_CELLS) -> List[int]:
+    """Indices of the cells worth explaining: the least confident first."""
+    order = sorted(range(len(cells)), key=lambda i: cells[i]["confidence"])
+    return sorted(order[:limit])
+
+
+def load_cell_crops(path: str, cells: List[dict], indices: List[int], size: int) -> np.ndarray:
+    """Re-crop the chosen cells from the stored smear."""
+    with open(path, "rb") as f:
+        image = decode_image(f.read())
+    boxes = np.array([cells[i]["box"] for i in indices], dtype=np.float32).reshape(-1, 4)
+    return extract_crops(image, boxes, size)
+
+
+class ExplanationStore:
+    """Rendered explanation PNGs on disk, keyed by model version and image hash.
+
+    Plots for one (version, image, method) live in
+    ``<root>/<version>/ab/<hash>/<method>/`` next to a ``manifest.json``
+    that is written last, so a directory without one is incomplete and
+    ignored. Identical smears uploaded twice share their explanations.
+
+    Attributes:
+        root (str): Directory everything is stored under
+    """
+
+    def __init__(self, root: str = EXPLANATION_FOLDER):
+        self.root = root
+
+    def directory(self, version: str, content_hash: str, method: str) -> str:
+        return os.path.join(self.root, version, content_hash[:2], content_hash, method)
+
+    def plots(self, version: str, content_hash: str, method: str) -> Optional[List[str]]:
+        """URLs of the stored plots, or None if this method has not finished."""
+        manifest = os.path.join(self.directory(version, content_hash, method), "manifest.json")
+        try:
+            with open(manifest) as f:
+                names = json.load(f)["files"]
+        except FileNotFoundError:
+            return None
+        return [f"/analysis/plots/{version}/{content_hash}/{method}/{name}" for name in names]
+
+    def best_plots(self, version: str, content_hash: str) -> Tuple[Optional[str], List[str]]:
+        """The most thorough finished explanation: SHAP, else Grad-CAM, else nothing."""
+        for method in METHODS:
+            plots = self.plots(version, content_hash, method)
+            if plots is not None:
+                return method, plots
+        return None, []
+
+    def save(self, version: str, content_hash: str, method: str, panels: List[np.ndarray]) -> List[str]:
+        """Write RGB panels as PNGs and publish them with one directory rename."""
+        final = self.directory(version, content_hash, method)
+        staging = f"{final}.tmp-{os.getpid()}-{threading.get_ident()}"
+        os.makedirs(staging, exist_ok=True)
+        names = []
+        for index, panel in enumerate(panels):
+            name = f"{index}.png"
+            cv2.imwrite(os.path.join(staging, name), cv2.cvtColor(panel, cv2.COLOR_RGB2BGR))
+            names.append(name)
+        with open(os.path.join(staging, "manifest.json"), "w") as f:
+            json.dump({"files": names}, f)
+        try:
+            os.rename(staging, final)
+        except OSError:
+            # Another worker published the same explanation first
+            shutil.rmtree(staging, ignore_errors=True)
+        return self.plots(version, content_hash, method) or []
+
+    def file_path(self, version: str, content_hash: str, method: str, name: str) -> Optional[str]:
+        """Path of one plot file, or None if the request names anything else."""
+        parts = (version, content_hash, method, name)
+        if method not in METHODS or any(os.sep in p or p.startswith(".") for p in parts):
+            return None
+        path = os.path.join(self.directory(version, content_hash, method), name)
+        return path if os.path.isfile(path) else None
+
+
+def _probabilities(output):
+    """Class probabilities from a YOLO classifier's eval-mode output.
+
+    Ultralytics 8.0 returns the softmax tensor; later releases return a
+    (probabilities, logits) tuple.
+    """
+    return output[0] if isinstance(output, (tuple, list)) else output
+
+
+def _heat_panel(crop: np.ndarray, heat: np.ndarray) -> np.ndarray:
+    """Crop beside a jet-coloured overlay of a 0..1 heat map."""
+    colour = cv2.applyColorMap((heat * 255).astype(np.uint8), cv2.COLORMAP_JET)
+    colour = cv2.cvtColor(colour, cv2.COLOR_BGR2RGB)
+    overlay = cv2.addWeighted(crop, 0.5, colour, 0.5, 0)
+    return np.concatenate([crop, overlay], axis=1)
+
+
+def _signed_panel(crop: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Crop beside its SHAP map: red pushes towards the class, blue away."""
+    scale = np.percentile(np.abs(values), 99) or 1.0
+    values = np.clip(values / scale, -1.0, 1.0)
+    grey = cv2.cvtColor(cv2.cvtColor(crop, cv2.COLOR_RGB2GRAY), cv2.COLOR_GRAY2RGB).astype(np.float32)
+    colour = np.zeros_like(grey)
+    colour[..., 0] = 255 * (values > 0)
+    colour[..., 2] = 255 * (values < 0)
+    alpha = np.abs(values)[..., None]
+    overlay = (grey * (1 - alpha) + colour * alpha).astype(np.uint8)
+    return np.concatenate([crop, overlay], axis=1)
+
+
+class Explainer:
+    """Gradient-based explanations of the classifier for individual cell crops.
+
+    Gradients need the eager PyTorch module, so the ``.pt`` weights are
+    loaded here whatever ``INFERENCE_BACKEND`` serves predictions. Grad-CAM
+    and SHAP each get their own copy of the module so a long SHAP run never
+    shares forward hooks or autograd state with a request-time Grad-CAM.
+
+    Attributes:
+        model_path (str): Path to the trained ``.pt`` weights
+        image_size (int): Crop edge length the model expects
+    """
+
+    def __init__(self, model_path: str = MODEL_PATH, image_size: int = IMAGE_SIZE):
+        self.model_path = model_path
+        self.image_size = image_size
+        self._models: Dict[str, object] = {}
+        self._backgrounds: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+        self._gradcam_lock = threading.Lock()
+        # SHAP is minutes of CPU; one at a time, off the shared threadpool
+        self._shap_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shap")
+
+    def _model(self, purpose: str):
+        with self._lock:
+            if purpose not in self._models:
+                # Imported here so that importing the API does not pull in torch
+                from ultralytics import YOLO
+
+                self._models[purpose] = YOLO(self.model_path).model.float().eval()
+            return self._models[purpose]
+
+    def _tensor(self, crops: np.ndarray, requires_grad: bool = False):
+        import torch
+
+        batch = torch.from_numpy(np.ascontiguousarray(crops)).permute(0, 3, 1, 2).float() / 255.0
+        return batch.requires_grad_(requires_grad)
+
+    def gradcam(self, crops: np.ndarray, targets: List[int]) -> np.ndarray:
+        """Grad-CAM maps on the classifier head's last convolution.
+
+        One batched forward and backward pass; well under a second on CPU.
+
+        Returns:
+            np.ndarray: N x size x size heat maps scaled to 0..1
+        """
+        import torch
+        import torch.nn.functional as F
+
+        model = self._model("gradcam")
+        head = model.model[-1]
+        with self._gradcam_lock:
+            # The score is the pre-softmax output of the head's linear layer,
+            # whatever the head itself returns in this Ultralytics version
+            activations, logits = [], []
+            hooks = [
+                head.conv.register_forward_hook(lambda module, inputs, output: activations.append(output)),
+                head.linear.register_forward_hook(lambda module, inputs, output: logits.append(output)),
+            ]
+            try:
+                with torch.enable_grad():
+                    model(self._tensor(crops, requires_grad=True))
+                    score = logits[0].gather(1, torch.tensor(targets)[:, None]).sum()
+                    (gradients,) = torch.autograd.grad(score, activations[0])
+            finally:
+                for hook in hooks:
+                    hook.remove()
+
+        weights = gradients.mean((2, 3), keepdim=True)
+        cam = F.relu((weights * activations[0].detach()).sum(1, keepdim=True))
+        cam = F.interpolate(cam, size=crops.shape[1:3], mode="bilinear", align_corners=False)[:, 0]
+        cam = cam - cam.flatten(1).min(1)[0][:, None, None]
+        cam = cam / cam.flatten(1).max(1)[0].clamp_min(1e-8)[:, None, None]
+        return cam.numpy()
+
+    def background(self, version: str) -> Optional[np.ndarray]:
+        """Reference crops for SHAP, built once per model version and cached.
+
+        Sampled evenly across the class folders of ``SHAP_BACKGROUND_DIR``
+        and saved as ``<EXPLANATION_FOLDER>/<version>/background.npy`` so
+        every worker and restart reuses the same set. None when the
+        training images are not available.
+        """
+        if version in self._backgrounds:
+            return self._backgrounds[version]
+
+        cache_path = os.path.join(EXPLANATION_FOLDER, version, "background.npy")
+        if os.path.exists(cache_path):
+            background = np.load(cache_path)
+        else:
+            background = self._build_background()
+            if background is None:
+                return None
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            partial = f"{cache_path}.{os.getpid()}.npy"
+            np.save(partial, background)
+            os.replace(partial, cache_path)
+            logger.info(f"Cached SHAP background of {len(background)} crops for model {version}")
+
+        self._backgrounds[version] = background
+        return background
+
+    def _build_background(self) -> Optional[np.ndarray]:
+        if not os.path.isdir(SHAP_BACKGROUND_DIR):
+            return None
+        classes = sorted(
+            d for d in os.listdir(SHAP_BACKGROUND_DIR) if os.path.isdir(os.path.join(SHAP_BACKGROUND_DIR, d))
+        )
+        per_class = max(1, SHAP_BACKGROUND_SIZE // max(1, len(classes)))
+        crops = []
+        for cell_type in classes:
+            folder = os.path.join(SHAP_BACKGROUND_DIR, cell_type)
+            names = sorted(f for f in os.listdir(folder) if f.lower().endswith(IMAGE_EXTENSIONS))
+            # Evenly spaced, so the set is deterministic for a given dataset
+            step = max(1, len(names) // per_class)
+            for name in names[::step][:per_class]:
+                with open(os.path.join(folder, name), "rb") as f:
+                    crops.append(preprocess(decode_image(f.read()), self.image_size))
+        return np.stack(crops) if crops else None
+
+    def shap(self, crops: np.ndarray, version: str) -> np.ndarray:
+        """Expected-gradients SHAP values for each crop's top class.
+
+        Falls back to blurred copies of the crops as the reference set when
+        no training images are available.
+
+        Returns:
+            np.ndarray: N x size x size signed attributions (summed over RGB)
+        """
+        import shap
+        import torch
+
+        background = self.background(version)
+        if background is None:
+            background = np.stack([cv2.GaussianBlur(c, (0, 0), 8) for c in crops])
+
+        model = self._model("shap")
+
+        class Probabilities(torch.nn.Module):
+            def forward(self, x):
+                return _probabilities(model(x))
+
+        explainer = shap.GradientExplainer(Probabilities(), self._tensor(background))
+        values, _ = explainer.shap_values(
+            self._tensor(crops), nsamples=SHAP_SAMPLES, ranked_outputs=1
+        )
+        values = np.asarray(values[0] if isinstance(values, list) else values)
+        if values.ndim == 5:  # N x C x H x W x ranked outputs
+            values = values[..., 0]
+        return values.sum(1)
+
+    async def run_shap(self, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._shap_executor, self.shap, *args)
+
+
+class ExplanationService:
+    """Grad-CAM on request, SHAP in background jobs, both cached on disk."""
+
+    def __init__(self, explainer: Explainer, store: ExplanationStore):
+        self.explainer = explainer
+        self.store = store
+
+    def _crops(self, path: str, cells: List[dict]) -> Tuple[np.ndarray, List[int]]:
+        indices = select_cells(cells)
+        return load_cell_crops(path, cells, indices, self.explainer.image_size), indices
+
+    def _gradcam(self, version, content_hash, path, cells, cell_types) -> List[str]:
+        crops, indices = self._crops(path, cells)
+        if len(crops) == 0:
+            return self.store.save(version, content_hash, "gradcam", [])
+        targets = [cell_types.index(cells[i]["class"]) for i in indices]
+        heat = self.explainer.gradcam(crops, targets)
+        panels = [_heat_panel(crop, h) for crop, h in zip(crops, heat)]
+        return self.store.save(version, content_hash, "gradcam", panels)
+
+    async def saliency(self, version, content_hash, path, cells, cell_types) -> List[str]:
+        """Grad-CAM plots for the smear, computed now if not already stored."""
+        plots = self.store.plots(version, content_hash, "gradcam")
+        if plots is None:
+            plots = await run_in_threadpool(
+                self._gradcam, version, content_hash, path, cells, cell_types
+            )
+        return plots
+
+    async def shap(self, version, content_hash, path, cells) -> List[str]:
+        """SHAP plots for the smear; slow, meant for a background job."""
+        plots = self.store.plots(version, content_hash, "shap")
+        if plots is not None:
+            return plots
+        crops, _ = await run_in_threadpool(self._crops, path, cells)
+        if len(crops) == 0:
+            return self.store.save(version, content_hash, "shap", [])
+        values = await self.explainer.run_shap(crops, version)
+        panels = [_signed_panel(crop, v) for crop, v in zip(crops, values)]
+        return await run_in_threadpool(self.store.save, version, content_hash, "shap", panels)
+
+
+# Process-wide explanation service
+explanations = ExplanationService(Explainer(), ExplanationStore())
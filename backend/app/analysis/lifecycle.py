@@ -0,0 +1,67 @@
+import logging
+
+from starlette.concurrency import run_in_threadpool
+
+from app.analysis.batching import batcher
+from app.analysis.classifier import classifier
+from app.analysis.workers import pool
+
+logger = logging.getLogger(__name__)
+
+
+def load_inference() -> bool:
+    """Load and warm the classifier, in process or in the worker pool.
+
+    Blocking: importing the runtime (torch, onnxruntime) and the first
+    forward pass take seconds, so the API calls it through
+    ``warm_inference`` off the event loop.
+
+    Returns:
+        bool: False if the weights or their runtime are missing
+    """
+    try:
+        classifier.load()
+        if pool.size > 0:
+            # Workers load and warm their own copies of the weights
+            pool.start()
+        else:
+            classifier.warmup()
+    except (FileNotFoundError, ImportError) as e:
+        logger.warning(f"Classifier not loaded: {str(e)}")
+        return False
+    return True
+
+
+def start_inference() -> bool:
+    """Load and warm the classifier and start the batcher in front of it.
+
+    Shared by the API and the job worker so both serve the same model
+    setup (in-process or ``INFERENCE_WORKERS`` pool, same backend).
+
+    Returns:
+        bool: False if the weights or their runtime are missing
+    """
+    if not load_inference():
+        return False
+    batcher.start(pool if pool.running else None)
+    return True
+
+
+async def warm_inference() -> bool:
+    """``start_inference`` with the slow part in the threadpool.
+
+    The event loop keeps serving meanwhile; ``/analysis`` answers 503
+    until the batcher is started here.
+
+    Returns:
+        bool: False if the weights or their runtime are missing
+    """
+    if not await run_in_threadpool(load_inference):
+        return False
+    batcher.start(pool if pool.running else None)
+    return True
+
+
+async def stop_inference() -> None:
+    await batcher.stop()
+    pool.stop()
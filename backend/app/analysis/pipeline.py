@@ -0,0 +1,174 @@
+import os
+from typing import Dict, List
+
+import cv2
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ---------------------------------------
+# Segmentation configuration
+# ---------------------------------------
+SEGMENT_MAX_SIDE = int(os.getenv("SEGMENT_MAX_SIDE", "1024"))  # Working resolution for thresholding
+MIN_NUCLEUS_FRACTION = float(os.getenv("MIN_NUCLEUS_FRACTION", "0.0004"))  # Of working image area
+MAX_NUCLEUS_FRACTION = float(os.getenv("MAX_NUCLEUS_FRACTION", "0.25"))
+CROP_PADDING = float(os.getenv("CROP_PADDING", "2.0"))  # Crop side / nucleus side
+# Cells whose top-1 probability is below this do not look like any normal
+# white cell type the model knows, and are reported as abnormal
+ABNORMAL_CONFIDENCE = float(os.getenv("ABNORMAL_CONFIDENCE", "0.5"))
+REMAP_MAX_ROWS = 32767  # SHRT_MAX: cv2.remap asserts its output has fewer rows
+
+
+def nucleus_mask(image: np.ndarray) -> np.ndarray:
+    """Binary mask of white cell nuclei in a Romanowsky-stained smear.
+
+    Nuclei stain purple/blue while red cells are pink and background is
+    pale, so ``B - (R + G) / 2`` separates them well; Otsu picks the cut
+    for each image, so staining intensity can vary between labs.
+
+    Args:
+        image: HxWx3 RGB uint8 image (already at working resolution)
+
+    Returns:
+        np.ndarray: HxW uint8 mask, 255 on nuclei
+    """
+    rgb = image.astype(np.int16)
+    score = rgb[..., 2] - ((rgb[..., 0] + rgb[..., 1]) >> 1)
+    score = np.clip(score, 0, 255).astype(np.uint8)
+    score = cv2.GaussianBlur(score, (5, 5), 0)
+    _, mask = cv2.threshold(score, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+
+    # Open removes stain speckle; close merges the lobes of one nucleus
+    side = max(image.shape[:2])
+    small = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+    large_size = max(3, side // 100) | 1
+    large = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (large_size, large_size))
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, small)
+    return cv2.morphologyEx(mask, cv2.MORPH_CLOSE, large)
+
+
+def detect_cells(image: np.ndarray) -> np.ndarray:
+    """Find white cells and return a square crop box around each one.
+
+    Thresholding runs on a copy downscaled to ``SEGMENT_MAX_SIDE``; boxes
+    are mapped back to full resolution.
+
+    Args:
+        image: HxWx3 RGB uint8 smear image
+
+    Returns:
+        np.ndarray: Nx4 float32 boxes as (center_x, center_y, side, side)
+            in full-resolution pixels
+    """
+    height, width = image.shape[:2]
+    scale = min(1.0, SEGMENT_MAX_SIDE / max(height, width))
+    working = image
+    if scale < 1.0:
+        working = cv2.resize(
+            image, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA
+        )
+
+    mask = nucleus_mask(working)
+    _, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+
+    # Row 0 is the background component
+    stats = stats[1:]
+    area = stats[:, cv2.CC_STAT_AREA]
+    working_area = mask.shape[0] * mask.shape[1]
+    keep = (area >= MIN_NUCLEUS_FRACTION * working_area) & (area <= MAX_NUCLEUS_FRACTION * working_area)
+
+    stats = stats[keep]
+    extent = np.maximum(stats[:, cv2.CC_STAT_WIDTH], stats[:, cv2.CC_STAT_HEIGHT])
+    side = extent * CROP_PADDING / scale
+    centers = (stats[:, [cv2.CC_STAT_LEFT, cv2.CC_STAT_TOP]] + stats[:, [cv2.CC_STAT_WIDTH, cv2.CC_STAT_HEIGHT]] / 2) / scale
+    return np.column_stack([centers, side, side]).astype(np.float32)
+
+
+def extract_crops(image: np.ndarray, boxes: np.ndarray, size: int) -> np.ndarray:
+    """Resample every box to ``size`` x ``size`` with a few ``cv2.remap`` calls.
+
+    The sampling grids of the boxes are stacked into (k * size) x size
+    maps, so crops come out of one bilinear remap per chunk instead of a
+    ``cv2.resize`` per cell. OpenCV caps remap output below ``SHRT_MAX``
+    rows, so a chunk holds at most ``(SHRT_MAX - 1) // size`` crops (146
+    at 224). Boxes reaching past the image edge are padded by replicating
+    the border.
+
+    Args:
+        image: HxWx3 RGB uint8 image
+        boxes: Nx4 boxes as returned by ``detect_cells``
+        size: Output edge length
+
+    Returns:
+        np.ndarray: N x size x size x 3 RGB uint8 crops
+    """
+    count = len(boxes)
+    crops = np.empty((count, size, size, 3), dtype=np.uint8)
+    if count == 0:
+        return crops
+
+    steps = (np.arange(size, dtype=np.float32) + 0.5) / size - 0.5
+    xs = boxes[:, 0:1] + steps[None, :] * boxes[:, 2:3] - 0.5  # (N, size)
+    ys = boxes[:, 1:2] + steps[None, :] * boxes[:, 3:4] - 0.5
+
+    chunk = max(1, (REMAP_MAX_ROWS - 1) // size)
+    for start in range(0, count, chunk):
+        stop = min(start + chunk, count)
+        rows = (stop - start) * size
+        map_x = np.broadcast_to(xs[start:stop, None, :], (stop - start, size, size)).reshape(rows, size)
+        map_y = np.broadcast_to(ys[start:stop, :, None], (stop - start, size, size)).reshape(rows, size)
+        cv2.remap(
+            image,
+            np.ascontiguousarray(map_x),
+            np.ascontiguousarray(map_y),
+            interpolation=cv2.INTER_LINEAR,
+            borderMode=cv2.BORDER_REPLICATE,
+            dst=crops[start:stop].reshape(rows, size, 3),
+        )
+    return crops
+
+
+def summarise(probabilities: np.ndarray, boxes: np.ndarray, cell_types: List[str]) -> Dict[str, object]:
+    """Reduce per-cell probabilities to the counts stored on an Analysis.
+
+    Args:
+        probabilities: NxC class probabilities, one row per detected cell
+        boxes: Nx4 boxes matching ``probabilities``
+        cell_types: Class names in output order
+
+    Returns:
+        dict: total/abnormal counts, per-class counts, the dominant class
+            and mean probabilities, and a compact per-cell list
+    """
+    total = len(probabilities)
+    if total == 0:
+        return {
+            "total_cells": 0,
+            "abnormal_cells": 0,
+            "class_counts": {name: 0 for name in cell_types},
+            "predicted_class": None,
+            "confidence": None,
+            "probabilities": {},
+            "cells": [],
+        }
+
+    top = probabilities.argmax(1)
+    confidence = probabilities.max(1)
+    counts = np.bincount(top, minlength=len(cell_types))
+    mean = probabilities.mean(0)
+    dominant = int(counts.argmax())
+
+    cells = [
+        {"box": [round(float(v), 1) for v in box], "class": cell_types[c], "confidence": round(float(p), 4)}
+        for box, c, p in zip(boxes.tolist(), top.tolist(), confidence.tolist())
+    ]
+    return {
+        "total_cells": total,
+        "abnormal_cells": int((confidence < ABNORMAL_CONFIDENCE).sum()),
+        "class_counts": {name: int(n) for name, n in zip(cell_types, counts)},
+        "predicted_class": cell_types[dominant],
+        "confidence": float(mean[dominant]),
+        "probabilities": {name: float(p) for name, p in zip(cell_types, mean)},
+        "cells": cells,
+    }
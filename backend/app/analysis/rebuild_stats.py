@@ -0,0 +1,105 @@
+"""Rebuild the per-user, per-day analysis statistics from the analyses table.
+
+Usage (from backend/):
+
+    python -m app.analysis.rebuild_stats [--user-id N] [--batch-size 5000]
+
+Deletes the rollup rows (all of them, or one user's) and recounts every
+completed analysis, reading ``--batch-size`` analyses at a time in id
+order. Each batch is summed in memory and added with one upsert per
+table, then committed, so memory use is bounded and an interrupted run
+can simply be started again.
+
+Analyses finished while the rebuild runs count themselves, as usual.
+One that was still being saved when the rebuild started may be counted
+twice, so stop the job runners (``RUN_JOB_WORKER=0`` and no
+``app.jobs.worker`` processes) for the rebuild.
+"""
+import argparse
+import logging
+import time
+from typing import Optional
+
+from sqlalchemy import func
+
+from app.database import SessionLocal, engine
+from app.models import Analysis, AnalysisDailyClassCount, AnalysisDailyStats, Base
+from app.analysis.stats import add_to_stats
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+
+def rebuild(user_id: Optional[int] = None, batch_size: int = 5000) -> dict:
+    """Recount the rollup tables from scratch.
+
+    Args:
+        user_id: Only rebuild this user's rows
+        batch_size: Analyses read and committed per batch
+
+    Returns:
+        dict: Analyses counted, batches committed and seconds taken
+    """
+    tables = [AnalysisDailyStats.__table__, AnalysisDailyClassCount.__table__]
+    Base.metadata.create_all(bind=engine, tables=tables)
+    started = time.perf_counter()
+
+    db = SessionLocal()
+    try:
+        for model in (AnalysisDailyStats, AnalysisDailyClassCount):
+            query = db.query(model)
+            if user_id is not None:
+                query = query.filter(model.user_id == user_id)
+            query.delete(synchronize_session=False)
+        # Later analyses are counted by their own transactions
+        ceiling = db.query(func.max(Analysis.id)).scalar() or 0
+        db.commit()
+
+        counted = batches = last_id = 0
+        while True:
+            query = db.query(
+                Analysis.id,
+                Analysis.user_id,
+                Analysis.created_at,
+                Analysis.total_cells,
+                Analysis.abnormal_cells,
+                Analysis.class_counts,
+            ).filter(
+                Analysis.id > last_id,
+                Analysis.id <= ceiling,
+                Analysis.status == "completed",
+                Analysis.user_id.isnot(None),
+                Analysis.created_at.isnot(None),
+            )
+            if user_id is not None:
+                query = query.filter(Analysis.user_id == user_id)
+            rows = query.order_by(Analysis.id).limit(batch_size).all()
+            if not rows:
+                break
+
+            add_to_stats(db, [row[1:] for row in rows])
+            db.commit()
+            last_id = rows[-1].id
+            counted += len(rows)
+            batches += 1
+            logger.info(f"Counted {counted} analyses (up to id {last_id} of {ceiling})")
+    finally:
+        db.close()
+
+    return {"analyses": counted, "batches": batches, "seconds": round(time.perf_counter() - started, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--user-id", type=int, default=None, help="Only rebuild this user's statistics")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Analyses per batch")
+    args = parser.parse_args()
+
+    summary = rebuild(args.user_id, args.batch_size)
+    logger.info(
+        f"Done: {summary['analyses']} analyses in {summary['batches']} batches, {summary['seconds']}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.database import get_db
+from app.models import Analysis, Job, Upload
+from app.auth import get_current_user
+from app.principals import Principal
+from app.analysis.batching import MicroBatcher, batcher
+from app.analysis.cache import result_cache
+from app.analysis.explain import explanations
+from app.jobs.queue import enqueue
+from app.analysis.schemas import AnalysisCreate, AnalysisOut
+from app.analysis.service import run_analysis, to_response
+from app.analysis.stats import PERIODS, STATS_DEFAULT_DAYS, STATS_MAX_DAYS, user_stats
+
+router = APIRouter()
+
+
+def get_batcher() -> MicroBatcher:
+    """Dependency returning the running batcher in front of the warm classifier."""
+    if not batcher.model.ready or not batcher.running:
+        raise HTTPException(status_code=503, detail="Model is not loaded")
+    return batcher
+
+
+# Accept both /analysis and /analysis/ without redirecting
+@router.post("", response_model=AnalysisOut, include_in_schema=True)
+@router.post("/", response_model=AnalysisOut, include_in_schema=False)
+async def create_analysis(
+    payload: AnalysisCreate,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
+    batcher: MicroBatcher = Depends(get_batcher),
+):
+    upload = await run_in_threadpool(_find_upload, db, payload.upload_id)
+    if upload is None or upload.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Upload not found")
+
+    try:
+        analysis = await run_analysis(db, upload, batcher)
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=f"Analysis failed: {str(e)}")
+
+    return to_response(analysis, _plots(analysis, upload))
+
+
+def _find_upload(db: Session, upload_id: int) -> Optional[Upload]:
+    """The upload row, with the session's connection handed back to the pool.
+
+    The pipeline awaits for a while after this; holding a connection from
+    the sync pool all that time let concurrent analyses exhaust it, and a
+    checkout blocking on the event loop then stalled every request.
+    """
+    upload = db.get(Upload, upload_id)
+    # Detaches the row with its attributes loaded; the session reconnects when next used
+    db.close()
+    return upload
+
+
+def _plots(analysis: Analysis, upload: Upload) -> list:
+    if not upload.content_hash or not analysis.model_version:
+        return []
+    _, plots = explanations.store.best_plots(analysis.model_version, upload.content_hash)
+    return plots
+
+
+def _queue_shap(db: Session, analysis: Analysis) -> Job:
+    """The latest SHAP job for this analysis, queuing the first one if needed.
+
+    A job that used up its retries is reported, not requeued.
+    """
+    job = (
+        db.query(Job)
+        .filter(Job.kind == "explain", Job.analysis_id == analysis.id)
+        .order_by(Job.id.desc())
+        .first()
+    )
+    if job is None:
+        job = enqueue(db, analysis.upload_id, analysis.user_id, kind="explain", analysis_id=analysis.id)
+        db.commit()
+        db.refresh(job)
+    return job
+
+
+@router.get("/plots/{model_version}/{content_hash}/{method}/{name}", include_in_schema=False)
+def read_plot(model_version: str, content_hash: str, method: str, name: str):
+    """Serve a rendered explanation; paths are keyed by the image's SHA-256."""
+    path = explanations.store.file_path(model_version, content_hash, method, name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Plot not found")
+    return FileResponse(path, media_type="image/png", headers={"Cache-Control": "public, max-age=31536000, immutable"})
+
+
+@router.get("/batching")
+def batching_stats(current_user: Principal = Depends(get_current_user)):
+    """How full the micro-batches have been since startup."""
+    return batcher.stats()
+
+
+@router.get("/cache")
+def cache_stats(current_user: Principal = Depends(get_current_user)):
+    """Result cache hit/miss counters since startup."""
+    return result_cache.stats()
+
+
+@router.get("/stats")
+def read_stats(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    period: str = Query("day", enum=list(PERIODS)),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    """The current user's cell totals and class mix per day, week or month.
+
+    ``start`` and ``end`` are inclusive UTC dates; by default the last
+    ``STATS_DEFAULT_DAYS`` days. Served from the daily rollup tables.
+    """
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=STATS_DEFAULT_DAYS - 1)
+    if period not in PERIODS:
+        raise HTTPException(status_code=400, detail=f"period must be one of {', '.join(PERIODS)}")
+    if start > end:
+        raise HTTPException(status_code=400, detail="start is after end")
+    if (end - start).days >= STATS_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Ranges are limited to {STATS_MAX_DAYS} days")
+    return user_stats(db, current_user.id, start, end, period)
+
+
+@router.get("/{analysis_id}", response_model=AnalysisOut)
+def read_analysis(
+    analysis_id: int,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    analysis = db.get(Analysis, analysis_id)
+    if analysis is None or analysis.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    return to_response(analysis, _plots(analysis, db.get(Upload, analysis.upload_id)))
+
+
+@router.get("/{analysis_id}/explanation")
+async def explain_analysis(
+    analysis_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
+    batcher: MicroBatcher = Depends(get_batcher),
+):
+    """Explanation plots for an analysis, as good as is available right now.
+
+    SHAP takes minutes on CPU, so it runs as a background ``explain`` job
+    (queued by the first call). Until it finishes, this returns Grad-CAM
+    saliency maps, computed on the spot in well under a second and then
+    cached, with ``status: "pending"``. Poll again for the SHAP plots.
+    """
+    analysis = await run_in_threadpool(db.get, Analysis, analysis_id)
+    if analysis is None or analysis.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    upload = await run_in_threadpool(db.get, Upload, analysis.upload_id)
+    version, content_hash = analysis.model_version, upload.content_hash
+    if not content_hash:
+        raise HTTPException(status_code=422, detail="Upload predates content hashing; run migrate_storage")
+    if version != batcher.model.version:
+        raise HTTPException(status_code=409, detail="Analysis was made by a different model version")
+
+    shap_plots = explanations.store.plots(version, content_hash, "shap")
+    if shap_plots is not None:
+        return {"analysis_id": analysis.id, "method": "shap", "status": "completed", "plots": shap_plots}
+
+    job = await run_in_threadpool(_queue_shap, db, analysis)
+    runner = getattr(request.app.state, "job_runner", None)
+    if runner is not None:
+        runner.notify()
+
+    try:
+        plots = await explanations.saliency(
+            version, content_hash, upload.file_path, analysis.cells or [], batcher.model.cell_types
+        )
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=f"Explanation failed: {str(e)}")
+    return {
+        "analysis_id": analysis.id,
+        "method": "gradcam",
+        "status": "failed" if job.status == "failed" else "pending",
+        "job_id": job.id,
+        "plots": plots,
+    }
@@ -0,0 +1,25 @@
+# app/analysis/schemas.py
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel
+
+
+class AnalysisCreate(BaseModel):
+    upload_id: int
+
+
+class AnalysisOut(BaseModel):
+    analysis_id: int
+    upload_id: int
+    status: str
+    model_version: Optional[str] = None
+    total_cells: int = 0
+    abnormal_cells: int = 0
+    class_counts: Dict[str, int] = {}
+    cells: List[Dict] = []
+    plots: List[str] = []
+    predicted_class: Optional[str] = None
+    confidence: Optional[float] = None
+    probabilities: Dict[str, float] = {}
+    created_at: datetime
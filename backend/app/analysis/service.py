@@ -0,0 +1,103 @@
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.models import Analysis, Upload
+from app.analysis.batching import MicroBatcher, inference_stage_duration
+from app.analysis.cache import result_cache
+from app.analysis.classifier import decode_image
+from app.analysis.pipeline import detect_cells, extract_crops, summarise
+from app.analysis.stats import record_analysis
+
+
+def load_cells(path: str, size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Read and decode a smear, then detect and crop every white cell.
+
+    Returns:
+        tuple: (Nx4 boxes, N x size x size x 3 crops)
+    """
+    with inference_stage_duration.time(("decode",)):
+        with open(path, "rb") as f:
+            image = decode_image(f.read())
+    with inference_stage_duration.time(("preprocess",)):
+        boxes = detect_cells(image)
+        return boxes, extract_crops(image, boxes, size)
+
+
+async def _compute(path: str, batcher: MicroBatcher) -> dict:
+    model = batcher.model
+    boxes, crops = await run_in_threadpool(load_cells, path, model.image_size)
+    probabilities = await batcher.submit(crops)
+    with inference_stage_duration.time(("postprocess",)):
+        return summarise(probabilities, boxes, model.cell_types)
+
+
+async def run_analysis(db: Session, upload: Upload, batcher: MicroBatcher) -> Analysis:
+    """Count and classify the white cells on an uploaded smear.
+
+    Decoding and segmentation run in the threadpool and all crops are
+    queued on the shared micro-batcher in one submission, so they are
+    classified in as few forward passes as possible. Results are cached
+    by image content and model version, so re-uploading a smear that was
+    already analysed is a lookup.
+
+    Args:
+        db: Database session
+        upload: The upload to analyse
+        batcher: Running micro-batcher in front of the classifier
+
+    Returns:
+        Analysis: The stored analysis row
+    """
+    model = batcher.model
+    compute = lambda: _compute(upload.file_path, batcher)  # noqa: E731
+    if upload.content_hash:
+        summary, _ = await result_cache.get_or_compute(
+            db, upload.content_hash, model.version, compute
+        )
+    else:
+        summary = await compute()
+
+    analysis = Analysis(
+        upload_id=upload.id,
+        user_id=upload.user_id,
+        status="completed",
+        model_version=model.version,
+        created_at=datetime.utcnow(),
+        **summary,
+    )
+    return await run_in_threadpool(_save, db, analysis)
+
+
+def _save(db: Session, analysis: Analysis) -> Analysis:
+    db.add(analysis)
+    # Dashboard totals move in the same transaction as the row they count
+    record_analysis(db, analysis)
+    db.commit()
+    db.refresh(analysis)
+    return analysis
+
+
+def to_response(analysis: Analysis, plots: Optional[List[str]] = None) -> dict:
+    """Shape an Analysis row the way the frontend ResultCard expects.
+
+    ``plots`` are URLs of explanation images (see ``explain.py``).
+    """
+    return {
+        "analysis_id": analysis.id,
+        "upload_id": analysis.upload_id,
+        "status": analysis.status,
+        "model_version": analysis.model_version,
+        "total_cells": analysis.total_cells or 0,
+        "abnormal_cells": analysis.abnormal_cells or 0,
+        "class_counts": analysis.class_counts or {},
+        "cells": analysis.cells or [],
+        "plots": plots or [],
+        "predicted_class": analysis.predicted_class,
+        "confidence": analysis.confidence,
+        "probabilities": analysis.probabilities or {},
+        "created_at": analysis.created_at,
+    }
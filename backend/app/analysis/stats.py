@@ -0,0 +1,187 @@
+import os
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy.orm import Session
+
+from app.models import Analysis, AnalysisDailyClassCount, AnalysisDailyStats
+
+load_dotenv()
+
+# ---------------------------------------
+# Statistics configuration
+# ---------------------------------------
+STATS_DEFAULT_DAYS = int(os.getenv("STATS_DEFAULT_DAYS", "30"))  # Range when none is given
+STATS_MAX_DAYS = int(os.getenv("STATS_MAX_DAYS", "1830"))  # Longest range one request may read
+
+PERIODS = ("day", "week", "month")
+
+# (user_id, created_at, total_cells, abnormal_cells, class_counts) of a completed analysis
+AnalysisRow = Tuple[int, datetime, int, int, Optional[Dict[str, int]]]
+
+
+def rollup(analyses: Iterable[AnalysisRow]) -> Tuple[List[dict], List[dict]]:
+    """Sum analyses into rows for the daily stats and class count tables.
+
+    Returns:
+        tuple: (``analysis_daily_stats`` rows, ``analysis_daily_class_counts`` rows)
+    """
+    daily = {}
+    classes = defaultdict(int)
+    for user_id, created_at, total_cells, abnormal_cells, class_counts in analyses:
+        day = created_at.date()
+        row = daily.setdefault(
+            (user_id, day),
+            {"user_id": user_id, "day": day, "analyses": 0, "total_cells": 0, "abnormal_cells": 0},
+        )
+        row["analyses"] += 1
+        row["total_cells"] += total_cells or 0
+        row["abnormal_cells"] += abnormal_cells or 0
+        for cell_type, cells in (class_counts or {}).items():
+            classes[(user_id, day, cell_type)] += cells
+
+    class_rows = [
+        {"user_id": user_id, "day": day, "cell_type": cell_type, "cells": cells}
+        for (user_id, day, cell_type), cells in classes.items()
+    ]
+    return list(daily.values()), class_rows
+
+
+def _add(db: Session, model, rows: List[dict], keys: List[str], counters: List[str]) -> None:
+    """Add ``rows`` onto existing counters with one upsert; the caller commits."""
+    if not rows:
+        return
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as upsert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as upsert
+    else:
+        for row in rows:
+            updated = (
+                db.query(model)
+                .filter(*[getattr(model, key) == row[key] for key in keys])
+                .update(
+                    {getattr(model, c): getattr(model, c) + row[c] for c in counters},
+                    synchronize_session=False,
+                )
+            )
+            if not updated:
+                db.add(model(**row))
+        db.flush()
+        return
+
+    statement = upsert(model)
+    statement = statement.on_conflict_do_update(
+        index_elements=[getattr(model, key) for key in keys],
+        set_={c: getattr(model, c) + statement.excluded[c] for c in counters},
+    )
+    db.execute(statement, rows)
+
+
+def add_to_stats(db: Session, analyses: Iterable[AnalysisRow]) -> None:
+    """Count completed analyses into the rollup tables; the caller commits."""
+    daily, classes = rollup(analyses)
+    _add(db, AnalysisDailyStats, daily, ["user_id", "day"], ["analyses", "total_cells", "abnormal_cells"])
+    _add(db, AnalysisDailyClassCount, classes, ["user_id", "day", "cell_type"], ["cells"])
+
+
+def record_analysis(db: Session, analysis: Analysis) -> None:
+    """Count a newly finished analysis, in the transaction that stores it."""
+    if analysis.status != "completed" or analysis.user_id is None:
+        return
+    add_to_stats(
+        db,
+        [
+            (
+                analysis.user_id,
+                analysis.created_at or datetime.utcnow(),
+                analysis.total_cells,
+                analysis.abnormal_cells,
+                analysis.class_counts,
+            )
+        ],
+    )
+
+
+def period_start(day: date, period: str) -> date:
+    if period == "week":
+        return day - timedelta(days=day.weekday())  # Monday
+    if period == "month":
+        return day.replace(day=1)
+    return day
+
+
+def user_stats(db: Session, user_id: int, start: date, end: date, period: str = "day") -> dict:
+    """A user's analysis totals between two dates, overall and per period.
+
+    Reads one stats row per active day plus one row per cell type seen
+    that day, through the tables' primary keys, so the cost depends on
+    the length of the range and not on how many analyses it holds.
+
+    Args:
+        db: Database session
+        user_id: Whose statistics to read
+        start: First day, inclusive (UTC)
+        end: Last day, inclusive (UTC)
+        period: ``day``, ``week`` (starting Monday) or ``month``
+
+    Returns:
+        dict: ``totals`` and ``periods``, the latter only for periods with
+            analyses, oldest first
+    """
+    days = (
+        db.query(
+            AnalysisDailyStats.day,
+            AnalysisDailyStats.analyses,
+            AnalysisDailyStats.total_cells,
+            AnalysisDailyStats.abnormal_cells,
+        )
+        .filter(
+            AnalysisDailyStats.user_id == user_id,
+            AnalysisDailyStats.day >= start,
+            AnalysisDailyStats.day <= end,
+        )
+        .all()
+    )
+    class_days = (
+        db.query(AnalysisDailyClassCount.day, AnalysisDailyClassCount.cell_type, AnalysisDailyClassCount.cells)
+        .filter(
+            AnalysisDailyClassCount.user_id == user_id,
+            AnalysisDailyClassCount.day >= start,
+            AnalysisDailyClassCount.day <= end,
+        )
+        .all()
+    )
+
+    def empty(first: Optional[date] = None) -> dict:
+        bucket = {"analyses": 0, "total_cells": 0, "abnormal_cells": 0, "class_counts": defaultdict(int)}
+        if first is not None:
+            bucket = {"start": first, **bucket}
+        return bucket
+
+    totals = empty()
+    periods = {}
+    for row in days:
+        first = period_start(row.day, period)
+        for bucket in (totals, periods.setdefault(first, empty(first))):
+            bucket["analyses"] += row.analyses
+            bucket["total_cells"] += row.total_cells
+            bucket["abnormal_cells"] += row.abnormal_cells
+    for row in class_days:
+        first = period_start(row.day, period)
+        for bucket in (totals, periods.setdefault(first, empty(first))):
+            bucket["class_counts"][row.cell_type] += row.cells
+
+    for bucket in [totals, *periods.values()]:
+        bucket["class_counts"] = dict(bucket["class_counts"])
+    return {
+        "start": start,
+        "end": end,
+        "period": period,
+        "totals": totals,
+        "periods": [periods[first] for first in sorted(periods)],
+    }
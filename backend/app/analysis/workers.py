@@ -0,0 +1,305 @@
+import asyncio
+import logging
+import multiprocessing as mp
+import os
+from multiprocessing.shared_memory import SharedMemory
+from typing import List, Optional, Set
+
+import numpy as np
+from dotenv import load_dotenv
+
+from app.analysis.batching import BATCH_MAX_SIZE
+from app.analysis.backends import INFERENCE_BACKEND, artifact_path
+from app.analysis.classifier import IMAGE_SIZE, MODEL_PATH, BloodCellClassifier
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------
+# Worker pool configuration
+# ---------------------------------------
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "0"))  # 0 = run in-process
+INFERENCE_THREADS_PER_WORKER = int(os.getenv("INFERENCE_THREADS_PER_WORKER", "0"))  # 0 = cores / workers
+WORKER_START_TIMEOUT = 120  # seconds to load and warm the weights in a child
+WORKER_RESTART_DELAY = 5  # seconds between attempts to replace a dead worker
+
+
+def _available_cores() -> List[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _worker_main(model_path, image_size, backend, cores, threads, shm_name, conn) -> None:
+    """Entry point of an inference worker process.
+
+    The worker pins itself to its own cores, sizes the runtime's intra-op
+    pool (``torch.set_num_threads`` / ORT intra-op threads) to match, loads
+    and warms the weights once and then serves batches. Input crops are
+    read straight out of the shared memory block the parent wrote them to;
+    only the (small) probability array travels back over the pipe.
+    """
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+
+    model = BloodCellClassifier(model_path, image_size, backend, threads)
+    model.load()
+    model.warmup()
+
+    shm = SharedMemory(name=shm_name)
+    conn.send(("ready", model.version))
+    try:
+        while True:
+            count = conn.recv()
+            if count is None:
+                break
+            crops = np.ndarray(
+                (count, image_size, image_size, 3), dtype=np.uint8, buffer=shm.buf
+            )
+            try:
+                conn.send(("ok", model.predict(crops)))
+            except Exception as e:
+                conn.send(("error", str(e)))
+            finally:
+                del crops
+    finally:
+        shm.close()
+
+
+class _Worker:
+    """Parent-side handle for one worker process and its shared input block."""
+
+    def __init__(self, index: int, capacity: int, image_size: int):
+        self.index = index
+        self.capacity = capacity
+        self.image_size = image_size
+        self.shm = SharedMemory(
+            create=True, size=capacity * image_size * image_size * 3
+        )
+        self.conn, self.child_conn = mp.Pipe()
+        self.process: Optional[mp.Process] = None
+
+    def call(self, count: int):
+        """Tell the worker ``count`` crops are waiting and block for the reply."""
+        self.conn.send(count)
+        return self.conn.recv()
+
+    def close(self) -> None:
+        if self.process is not None and self.process.is_alive():
+            try:
+                self.conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            self.process.join(timeout=5)
+            if self.process.is_alive():
+                self.process.terminate()
+        self.conn.close()
+        self.child_conn.close()
+        self.shm.close()
+        self.shm.unlink()
+
+
+class InferencePool:
+    """Pool of pinned worker processes that run the classifier.
+
+    Each worker owns a disjoint slice of the machine's cores and a
+    preallocated shared memory block big enough for one full batch, so a
+    forward pass never competes with the API process for the GIL and image
+    data is copied exactly once (into shared memory) instead of pickled.
+
+    Attributes:
+        size (int): Number of worker processes
+        threads_per_worker (int): Runtime intra-op threads inside each worker
+        capacity (int): Max crops per call (one micro-batch)
+    """
+
+    def __init__(
+        self,
+        size: int = INFERENCE_WORKERS,
+        threads_per_worker: int = INFERENCE_THREADS_PER_WORKER,
+        model_path: str = MODEL_PATH,
+        image_size: int = IMAGE_SIZE,
+        capacity: int = BATCH_MAX_SIZE,
+        backend: str = INFERENCE_BACKEND,
+    ):
+        self.size = size
+        self.threads_per_worker = threads_per_worker
+        self.model_path = model_path
+        self.backend = backend
+        self.image_size = image_size
+        self.capacity = capacity
+        self._workers: List[_Worker] = []
+        self._idle: Optional[asyncio.Queue] = None
+        self._cores: List[Optional[List[int]]] = []
+        self._threads = 0
+        self._restarts: Set[asyncio.Task] = set()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    def start(self) -> None:
+        """Spawn the workers and wait until every one has warmed its model.
+
+        Raises:
+            RuntimeError: If a worker fails to come up
+        """
+        if self.running or self.size <= 0:
+            return
+        path = artifact_path(self.model_path, self.backend)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Model weights not found: {path}")
+
+        cores = _available_cores()
+        per_worker = max(1, len(cores) // self.size)
+        self._threads = self.threads_per_worker or per_worker
+        self._cores = [
+            cores[index * per_worker : (index + 1) * per_worker] if len(cores) >= self.size else None
+            for index in range(self.size)
+        ]
+
+        workers = []
+        try:
+            for index in range(self.size):
+                workers.append(self._spawn(index))
+            for worker in workers:
+                self._wait_ready(worker)
+        except BaseException:
+            for worker in workers:
+                worker.close()
+            raise
+
+        self._workers = workers
+        self._idle = asyncio.Queue()
+        for worker in workers:
+            self._idle.put_nowait(worker)
+        logger.info(
+            f"Started {self.size} inference workers "
+            f"({self._threads} threads each, {per_worker} cores each)"
+        )
+
+    def _spawn(self, index: int) -> _Worker:
+        worker = _Worker(index, self.capacity, self.image_size)
+        # spawn avoids inheriting the parent's torch/OpenMP thread state
+        worker.process = mp.get_context("spawn").Process(
+            target=_worker_main,
+            args=(
+                self.model_path,
+                self.image_size,
+                self.backend,
+                self._cores[index],
+                self._threads,
+                worker.shm.name,
+                worker.child_conn,
+            ),
+            name=f"inference-worker-{index}",
+            daemon=True,
+        )
+        worker.process.start()
+        # Only the child keeps its end open, so recv raises EOFError if the child dies
+        worker.child_conn.close()
+        return worker
+
+    def _wait_ready(self, worker: _Worker) -> None:
+        if not worker.conn.poll(WORKER_START_TIMEOUT):
+            raise RuntimeError(f"Inference worker {worker.index} did not start")
+        worker.conn.recv()
+
+    def _start_one(self, index: int) -> _Worker:
+        """Spawn one worker and block until it is warm, cleaning up on failure."""
+        worker = self._spawn(index)
+        try:
+            self._wait_ready(worker)
+        except BaseException:
+            worker.close()
+            raise
+        return worker
+
+    def _replace(self, worker: _Worker) -> None:
+        """Start a replacement for a worker that died or lost track of its pipe."""
+        logger.error(f"Inference worker {worker.index} died; restarting it")
+        task = asyncio.get_running_loop().create_task(self._restart(worker))
+        self._restarts.add(task)
+        task.add_done_callback(self._restarts.discard)
+
+    async def _restart(self, old: _Worker) -> None:
+        loop = asyncio.get_running_loop()
+        while self._workers and self._workers[old.index] is old:
+            try:
+                worker = await loop.run_in_executor(None, self._start_one, old.index)
+            except Exception:
+                logger.exception(f"Could not restart inference worker {old.index}")
+                await asyncio.sleep(WORKER_RESTART_DELAY)
+                continue
+            if not self._workers or self._workers[old.index] is not old:
+                # Stopped meanwhile; stop() has closed the old worker
+                await loop.run_in_executor(None, worker.close)
+                return
+            self._workers[old.index] = worker
+            self._idle.put_nowait(worker)
+            await loop.run_in_executor(None, old.close)
+            logger.info(f"Inference worker {old.index} restarted")
+            return
+
+    def _release(self, worker: _Worker, reply: asyncio.Future) -> None:
+        """Return ``worker`` to the idle queue once its reply is read, or replace it."""
+        if worker not in self._workers:
+            return
+        if reply.cancelled() or reply.exception() is not None:
+            # The pipe is broken or out of step with the worker
+            self._replace(worker)
+        else:
+            self._idle.put_nowait(worker)
+
+    def stop(self) -> None:
+        """Shut down every worker and release the shared memory blocks.
+
+        Restarts in progress notice and close the worker they started.
+        """
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.close()
+        self._idle = None
+
+    async def predict(self, crops: np.ndarray) -> np.ndarray:
+        """Run one batch on the next idle worker.
+
+        A worker found dead is replaced in the background. If the caller is
+        cancelled mid-call, the worker goes back to the idle queue only once
+        its reply has been read, so the next caller cannot receive it.
+
+        Args:
+            crops: NxHxWx3 RGB uint8 array with N <= ``capacity``
+
+        Returns:
+            np.ndarray: NxC class probabilities
+        """
+        if not self.running:
+            raise RuntimeError("Inference pool is not running")
+        if len(crops) > self.capacity:
+            raise ValueError(f"Batch of {len(crops)} exceeds capacity {self.capacity}")
+
+        worker = await self._idle.get()
+        while not worker.process.is_alive():
+            self._replace(worker)
+            worker = await self._idle.get()
+
+        view = np.ndarray(crops.shape, dtype=np.uint8, buffer=worker.shm.buf)
+        view[...] = crops
+        del view
+        reply = asyncio.get_running_loop().run_in_executor(None, worker.call, len(crops))
+        reply.add_done_callback(lambda _: self._release(worker, reply))
+        try:
+            # Shielded so a cancelled caller leaves the reply for _release to read
+            status, payload = await asyncio.shield(reply)
+        except (EOFError, OSError):
+            raise RuntimeError(f"Inference worker {worker.index} died")
+
+        if status != "ok":
+            raise RuntimeError(f"Inference worker {worker.index} failed: {payload}")
+        return payload
+
+
+# Process-wide pool; only started when INFERENCE_WORKERS > 0
+pool = InferencePool()
@@ -1,13 +1,15 @@
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Dict, Any
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import APIRouter, Depends, HTTPException, Form, status, Request
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.security.utils import get_authorization_scheme_param
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from . import crud
-from .database import get_db
+from .database import AsyncSessionLocal, get_async_db
+from .passwords import HasherBusy, password_hasher
+from .principals import Principal, principal_cache, token_digest
+from .ratelimit import RateLimit, client_ip
 from dotenv import load_dotenv
 import os
 import logging
@@ -28,26 +30,18 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30  # Short-lived access token
 REFRESH_TOKEN_EXPIRE_DAYS = 7     # Longer-lived refresh token
 
-# Password hashing configuration
-pwd_context = CryptContext(
-    schemes=["bcrypt"],
-    deprecated="auto",
-    bcrypt__rounds=12  # Reasonable work factor for bcrypt
-)
-
 # OAuth2 scheme for token authentication
 oauth2_scheme = OAuth2PasswordBearer(
     tokenUrl="login",
     auto_error=False
 )
 
-# Rate limiting configuration (requests per minute)
-RATE_LIMIT = 5
-RATE_LIMIT_WINDOW = 60  # seconds
+# Login attempts allowed per client IP: "<requests>/<seconds>", shared by all workers
+LOGIN_RATE_LIMIT = os.getenv("LOGIN_RATE_LIMIT", "5/60")
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against a hash.
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against a hash on the password hashing pool.
     
     Args:
         plain_password: The plain text password to verify
@@ -55,48 +49,69 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         
     Returns:
         bool: True if password matches, False otherwise
+
+    Raises:
+        HasherBusy: 503 if the hashing pool is saturated
     """
-    try:
-        return pwd_context.verify(plain_password, hashed_password)
-    except Exception as e:
-        logger.error(f"Password verification error: {str(e)}")
-        return False
+    return await password_hasher.verify(plain_password, hashed_password)
 
 
-def get_password_hash(password: str) -> str:
-    """Generate a password hash.
+async def get_password_hash(password: str) -> str:
+    """Generate a password hash at the configured ``BCRYPT_ROUNDS``.
     
     Args:
         password: The plain text password to hash
         
     Returns:
         str: The hashed password
+
+    Raises:
+        HasherBusy: 503 if the hashing pool is saturated
     """
-    return pwd_context.hash(password)
+    return await password_hasher.hash(password)
 
 
-def authenticate_user(db: Session, email: str, password: str):
+async def authenticate_user(db: AsyncSession, email: str, password: str):
     """Authenticate a user with email and password.
+
+    The lookup awaits the async session and bcrypt runs on the bounded
+    password hashing pool, so a login never blocks the event loop. A
+    hash made at another cost than ``BCRYPT_ROUNDS`` is replaced once
+    the password has been verified.
     
     Args:
-        db: Database session
+        db: Async database session
         email: User's email
         password: Plain text password
         
     Returns:
         User object if authentication successful, None otherwise
+
+    Raises:
+        HasherBusy: 503 if the hashing pool is saturated
     """
     try:
-        user = crud.get_user_by_email(db, email=email)
+        user = await crud.get_user_by_email(db, email=email)
+        # End the read so the pooled connection is not held while bcrypt
+        # runs; the session keeps ``user`` loaded (expire_on_commit=False)
+        await db.commit()
         if not user or not user.hashed_password:
-            # Use a constant-time comparison to prevent timing attacks
-            pwd_context.dummy_verify()
+            # Check against a dummy hash so unknown emails take as long
+            await password_hasher.verify(password, None)
             return None
             
-        if not verify_password(password, user.hashed_password):
+        if not await verify_password(password, user.hashed_password):
             return None
+
+        new_hash = await password_hasher.upgrade(password, user.hashed_password)
+        if new_hash is not None:
+            user.hashed_password = new_hash
+            await db.commit()
+            logger.info(f"Rehashed password of user {user.id} at cost {password_hasher.rounds}")
             
         return user
+    except HasherBusy:
+        raise
     except Exception as e:
         logger.error(f"Authentication error for {email}: {str(e)}")
         return None
@@ -188,55 +203,93 @@ def verify_token(token: str) -> Dict[str, Any]:
         raise credentials_exception
 
 
-router = APIRouter(prefix="/auth", tags=["authentication"])
+async def _load_principal(subject: str) -> Optional[Principal]:
+    async with AsyncSessionLocal() as db:
+        # Tokens from /auth/login carry the user id; older ones the email
+        if subject.isdigit():
+            user = await crud.get_user(db, int(subject))
+        else:
+            user = await crud.get_user_by_email(db, subject)
+    return Principal.from_user(user) if user is not None else None
 
-# In-memory rate limiting (replace with Redis in production)
-login_attempts = {}
 
+async def get_current_user(token: Optional[str] = Depends(oauth2_scheme)) -> Principal:
+    """Dependency resolving the bearer token to the authenticated user.
+
+    A token seen before is answered from ``principal_cache`` without
+    decoding it again or touching the database. Otherwise the token is
+    verified once, the user loaded, and the result cached until the
+    token expires.
 
-def check_rate_limit(request: Request) -> None:
-    """Check if the request is rate limited.
-    
     Args:
-        request: The incoming request
-        
+        token: Bearer token from the Authorization header
+
+    Returns:
+        Principal: Id, username and email of the user
+
     Raises:
-        HTTPException: If rate limit is exceeded
+        HTTPException: 401 if the token is missing, invalid, expired or a
+            refresh token; 404 if its user no longer exists
     """
-    client_ip = request.client.host
-    now = datetime.now().timestamp()
-    
-    # Clean up old entries
-    login_attempts[client_ip] = [
-        attempt for attempt in login_attempts.get(client_ip, [])
-        if now - attempt < RATE_LIMIT_WINDOW
-    ]
-    
-    # Check rate limit
-    if len(login_attempts.get(client_ip, [])) >= RATE_LIMIT:
+    if not token:
         raise HTTPException(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail="Too many login attempts. Please try again later.",
-            headers={"Retry-After": str(RATE_LIMIT_WINDOW)}
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    digest = token_digest(token)
+    principal = principal_cache.get(digest)
+    if principal is not None:
+        return principal
+
+    payload = verify_token(token)
+    if payload.get("type") == "refresh":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh tokens cannot be used to authenticate requests",
+            headers={"WWW-Authenticate": "Bearer"},
         )
-    
-    # Record this attempt
-    if client_ip not in login_attempts:
-        login_attempts[client_ip] = []
-    login_attempts[client_ip].append(now)
 
+    principal = await _load_principal(str(payload["sub"]))
+    if principal is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    principal_cache.put(digest, principal, payload.get("exp"))
+    return principal
 
-@router.post("/login", response_model=Dict[str, str])
+
+
+async def user_or_ip(request: Request) -> str:
+    """Rate limit key: the verified user, or the client address without a valid token.
+
+    Keying on the user rather than the raw header means varying the
+    header, or holding several tokens, does not buy extra budget. The
+    principal is cached, so the route's own ``get_current_user`` is free.
+    """
+    scheme, token = get_authorization_scheme_param(request.headers.get("authorization"))
+    if scheme.lower() == "bearer" and token:
+        try:
+            principal = await get_current_user(token)
+        except HTTPException:
+            principal = None
+        if principal is not None:
+            return f"user:{principal.id}"
+    return client_ip(request)
+
+router = APIRouter(prefix="/auth", tags=["authentication"])
+
+@router.post(
+    "/login",
+    response_model=Dict[str, str],
+    dependencies=[Depends(RateLimit("login", LOGIN_RATE_LIMIT))],
+)
 async def login(
     request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    # Check rate limit
-    check_rate_limit(request)
-    
     # Authenticate user
-    user = authenticate_user(db, email=form_data.username, password=form_data.password)
+    user = await authenticate_user(db, email=form_data.username, password=form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
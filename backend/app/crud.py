@@ -1,17 +1,16 @@
 # app/crud.py
-from sqlalchemy.orm import Session
-from app import models, schemas
-from passlib.context import CryptContext
+from typing import List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 from . import models, schemas
-
-# Setup the password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from .passwords import password_hasher
 
 
-def create_user(db: Session, user: schemas.UserCreate):
-    # Hash the user's password before saving it
-    hashed_password = pwd_context.hash(user.password)
+async def create_user(db: AsyncSession, user: schemas.UserCreate) -> Optional[models.User]:
+    # Hash the user's password before saving it; may raise passwords.HasherBusy
+    hashed_password = await password_hasher.hash(user.password)
 
     db_user = models.User(
         username=user.username,
@@ -22,19 +21,29 @@ def create_user(db: Session, user: schemas.UserCreate):
 
     db.add(db_user)
     try:
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        await db.refresh(db_user)
         return db_user
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         return None  # User with the same email/username might already exist
 
 
 # Get all users
-def get_users(db: Session):
-    return db.query(models.User).all()
+async def get_users(db: AsyncSession) -> List[models.User]:
+    return list(await db.scalars(select(models.User)))
+
+
+# Get user by id
+async def get_user(db: AsyncSession, user_id: int) -> Optional[models.User]:
+    return await db.get(models.User, user_id)
 
 
 # Get user by email
-def get_user_by_email(db: Session, email: str):
-    return db.query(models.User).filter(models.User.email == email).first()
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[models.User]:
+    return await db.scalar(select(models.User).where(models.User.email == email).limit(1))
+
+
+# Get user by username
+async def get_user_by_username(db: AsyncSession, username: str) -> Optional[models.User]:
+    return await db.scalar(select(models.User).where(models.User.username == username).limit(1))
@@ -1,9 +1,15 @@
+from fastapi import HTTPException
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base, Session
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from dotenv import load_dotenv
 import os
-from typing import Generator
+import time
+from typing import AsyncGenerator, Generator
+
+from app.metrics import registry
 
 # Load environment variables
 load_dotenv()
@@ -17,20 +23,89 @@ DB_CONFIG = {
     'dbname': os.getenv('PGDATABASE', 'lumascope')
 }
 
-# Construct database URL
-DATABASE_URL = f"postgresql://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['dbname']}"
+# Construct database URLs: psycopg2 for scripts and threadpool code, asyncpg for async handlers.
+# DATABASE_URL overrides the PG* settings, e.g. sqlite:///bench.db for local
+# benchmarks (needs aiosqlite for the async engine)
+DATABASE_URL = os.getenv(
+    "DATABASE_URL",
+    f"postgresql://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['dbname']}",
+)
+ASYNC_DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1).replace(
+    "sqlite://", "sqlite+aiosqlite://", 1
+)
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+# SQLite connections are handed between threadpool threads
+CONNECT_ARGS = {"check_same_thread": False} if IS_SQLITE else {}
+
+# Async pool size per process; these connections serve the event loop, not threads
+ASYNC_POOL_SIZE = int(os.getenv("ASYNC_POOL_SIZE", "10"))
+ASYNC_MAX_OVERFLOW = int(os.getenv("ASYNC_MAX_OVERFLOW", "20"))
+
+pool_checkout_wait = registry.histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time to get a connection from the pool, including opening a new one",
+    ("pool",),
+)
+
+
+class _TimedCheckout:
+    """Pool mixin recording every checkout's wait in ``pool_checkout_wait``."""
+
+    metrics_label = "sync"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_checkout_wait.observe(time.perf_counter() - started, (self.metrics_label,))
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    metrics_label = "sync"
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    metrics_label = "async"
+
 
 # Create SQLAlchemy engine with connection pooling
 engine = create_engine(
     DATABASE_URL,
+    poolclass=TimedQueuePool,
+    connect_args=CONNECT_ARGS,
     pool_size=5,
     max_overflow=10,
     pool_timeout=30,
     pool_recycle=1800  # Recycle connections after 30 minutes
 )
 
-# Session factory
+# Async engine for the request path; queries await instead of blocking the event loop
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    poolclass=TimedAsyncQueuePool,
+    connect_args=CONNECT_ARGS,
+    pool_size=ASYNC_POOL_SIZE,
+    max_overflow=ASYNC_MAX_OVERFLOW,
+    pool_timeout=30,
+    pool_recycle=1800
+)
+
+registry.gauge(
+    "db_pool_connections",
+    "Pooled connections checked out by requests and idle in the pool",
+    lambda: {
+        (label, state): count
+        for label, pool in (("sync", engine.pool), ("async", async_engine.pool))
+        for state, count in (("in_use", pool.checkedout()), ("idle", pool.checkedin()))
+    },
+    ("pool", "state"),
+)
+
+# Session factories
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Rows stay usable after commit, since async code cannot lazy-load expired attributes
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 # Base class for models
 Base = declarative_base()
@@ -56,3 +131,24 @@ def get_db() -> Generator[Session, None, None]:
         )
     finally:
         db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """Dependency to get an async DB session, for ``async def`` handlers.
+
+    Yields:
+        AsyncSession: SQLAlchemy async database session
+
+    Raises:
+        HTTPException: If there's an error talking to the database
+    """
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+            await db.commit()
+        except SQLAlchemyError as e:
+            await db.rollback()
+            raise HTTPException(
+                status_code=500,
+                detail=f"Database error: {str(e)}"
+            )
@@ -0,0 +1,67 @@
+import asyncio
+import logging
+import os
+
+from dotenv import load_dotenv
+from fastapi import APIRouter, Request, Response, status
+from sqlalchemy import text
+
+from app.database import async_engine
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------
+# Probe configuration
+# ---------------------------------------
+READY_DB_TIMEOUT = float(os.getenv("READY_DB_TIMEOUT", "2"))  # Seconds before the database counts as unreachable
+
+# Model states set by the lifespan in main.py. "unavailable" means no
+# weights are configured: the API still serves auth and uploads and
+# /analysis answers 503, as it always has, so that counts as ready.
+MODEL_WARMING = "warming"
+MODEL_READY = "ready"
+MODEL_UNAVAILABLE = "unavailable"
+MODEL_FAILED = "failed"
+
+router = APIRouter(tags=["Health"])
+
+
+async def database_reachable(timeout: float = READY_DB_TIMEOUT) -> bool:
+    """One ``SELECT 1`` through the async pool, bounded by ``timeout``."""
+    async def ping():
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    try:
+        await asyncio.wait_for(ping(), timeout)
+    except Exception as e:
+        logger.warning(f"Readiness check could not reach the database: {str(e)}")
+        return False
+    return True
+
+
+@router.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and its event loop answers."""
+    return {"status": "ok"}
+
+
+@router.get("/readyz")
+async def readyz(request: Request, response: Response):
+    """Readiness: the database answers and the model warmup has finished.
+
+    Answers 503 until then, so a load balancer only sends traffic to a
+    replica that can serve it.
+    """
+    model = getattr(request.app.state, "model_status", MODEL_WARMING)
+    database = await database_reachable()
+    ready = database and model in (MODEL_READY, MODEL_UNAVAILABLE)
+    if not ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {
+        "status": "ready" if ready else "not ready",
+        "database": "ok" if database else "unreachable",
+        "model": model,
+    }
@@ -0,0 +1,86 @@
+"""Create the database schema.
+
+Usage (from backend/):
+
+    python -m app.init_db
+
+Creates every missing table, then adds the columns and indexes that were
+added to tables which already existed (``create_all`` never alters a
+table). Both steps are idempotent. Run it once per deploy and start the API with ``CREATE_SCHEMA=0``, so
+replicas do not each check the schema while starting up.
+"""
+import logging
+import time
+from typing import List
+
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateIndex
+
+from app.database import engine
+from app.models import Base, Upload
+
+logger = logging.getLogger(__name__)
+
+# Columns and indexes added to tables that existed before them. New
+# columns must be nullable: rows already in the table get NULL.
+ADDED_COLUMNS = [
+    Upload.__table__.c.content_hash,
+]
+ADDED_INDEXES = [
+    ("uploads", "ix_uploads_content_hash"),
+    ("uploads", "ix_uploads_user_time_id"),  # Keyset pagination of upload history
+]
+
+
+def _index(table_name: str, index_name: str):
+    return next(i for i in Base.metadata.tables[table_name].indexes if i.name == index_name)
+
+
+def upgrade_schema(bind=engine) -> List[str]:
+    """Add any of ``ADDED_COLUMNS`` and ``ADDED_INDEXES`` that are missing.
+
+    Only tables that already exist are touched; ``create_all`` gives new
+    tables every column and index. Statements use ``IF NOT EXISTS`` where
+    the database supports it, so replicas starting together do not fail.
+
+    Returns:
+        list: ``table.column`` and index names that were added
+    """
+    added = []
+    with bind.begin() as conn:
+        inspector = inspect(conn)
+        tables = set(inspector.get_table_names())
+        if_not_exists = " IF NOT EXISTS" if conn.dialect.name == "postgresql" else ""
+        for column in ADDED_COLUMNS:
+            table = column.table.name
+            if table not in tables or column.name in {c["name"] for c in inspector.get_columns(table)}:
+                continue
+            conn.execute(text(
+                f"ALTER TABLE {table} ADD COLUMN{if_not_exists} {column.name} {column.type.compile(conn.dialect)}"
+            ))
+            added.append(f"{table}.{column.name}")
+        for table, name in ADDED_INDEXES:
+            if table not in tables or name in {i["name"] for i in inspector.get_indexes(table)}:
+                continue
+            conn.execute(CreateIndex(_index(table, name), if_not_exists=True))
+            added.append(name)
+    return added
+
+
+def create_schema() -> None:
+    """Create the tables of every model that do not exist yet, and upgrade the rest."""
+    started = time.perf_counter()
+    Base.metadata.create_all(bind=engine)
+    added = upgrade_schema()
+    if added:
+        logger.info(f"Added to existing tables: {', '.join(added)}")
+    logger.info(f"Schema checked in {time.perf_counter() - started:.2f}s")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s: %(message)s")
+    create_schema()
+
+
+if __name__ == "__main__":
+    main()
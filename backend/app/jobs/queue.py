@@ -0,0 +1,205 @@
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional, Sequence
+
+from dotenv import load_dotenv
+from sqlalchemy import and_, insert, or_
+from sqlalchemy.orm import Session
+
+from app.models import Job
+
+load_dotenv()
+
+# ---------------------------------------
+# Queue configuration
+# ---------------------------------------
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BACKOFF_SECONDS = float(os.getenv("JOB_RETRY_BACKOFF_SECONDS", "5"))  # Doubles per attempt
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "600"))  # No heartbeat for this long = worker died
+# Running jobs renew their lease this often, so jobs longer than the lease are not reclaimed
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", str(JOB_LEASE_SECONDS / 4)))
+
+
+def enqueue(
+    db: Session,
+    upload_id: int,
+    user_id: int,
+    kind: str = "analysis",
+    analysis_id: Optional[int] = None,
+) -> Job:
+    """Add a job to the session; the caller commits it.
+
+    ``analysis_id`` is the input of ``explain`` jobs; ``analysis`` jobs
+    fill it in when they complete.
+    """
+    job = Job(
+        kind=kind,
+        status="queued",
+        upload_id=upload_id,
+        user_id=user_id,
+        analysis_id=analysis_id,
+        max_attempts=JOB_MAX_ATTEMPTS,
+        run_after=datetime.utcnow(),
+        created_at=datetime.utcnow(),
+    )
+    db.add(job)
+    return job
+
+
+def enqueue_many(db: Session, upload_ids: Sequence[int], user_id: int, kind: str = "analysis") -> List[int]:
+    """Queue one job per upload with a single bulk INSERT; the caller commits.
+
+    Returns:
+        list: Job ids, in the order of ``upload_ids``
+    """
+    if not upload_ids:
+        return []
+    now = datetime.utcnow()
+    rows = [
+        {
+            "kind": kind,
+            "status": "queued",
+            "upload_id": upload_id,
+            "user_id": user_id,
+            "attempts": 0,
+            "max_attempts": JOB_MAX_ATTEMPTS,
+            "run_after": now,
+            "created_at": now,
+        }
+        for upload_id in upload_ids
+    ]
+    statement = insert(Job).returning(Job.id, sort_by_parameter_order=True)
+    return list(db.scalars(statement, rows))
+
+
+def _lease_expired(now: datetime):
+    return and_(Job.status == "running", Job.locked_at < now - timedelta(seconds=JOB_LEASE_SECONDS))
+
+
+def _claimable(now: datetime):
+    return or_(
+        and_(Job.status == "queued", Job.run_after <= now),
+        # The worker holding it died; hand it to someone else while attempts remain
+        and_(_lease_expired(now), Job.attempts < Job.max_attempts),
+    )
+
+
+def claim(db: Session, worker_id: str, kinds: Sequence[str]) -> Optional[Job]:
+    """Take the oldest runnable job, or return None if there is none.
+
+    On Postgres the candidate row is locked with ``FOR UPDATE SKIP LOCKED``
+    so concurrent workers each get a different job without waiting on one
+    another. SQLite has no row locks; there the conditional UPDATE below
+    is what stops two workers taking the same job.
+
+    Args:
+        db: Database session (committed by this call)
+        worker_id: Name recorded on the job while it is held
+        kinds: Job kinds this worker can run
+
+    Returns:
+        Job: The claimed job, already marked running, or None
+    """
+    now = datetime.utcnow()
+    # Jobs that took their worker down on every attempt (OOM, a crash in
+    # the runtime) would otherwise be reclaimed forever. Checked with a
+    # read first so an idle poll does not take a write lock
+    exhausted = and_(_lease_expired(now), Job.attempts >= Job.max_attempts)
+    if db.query(Job.id).filter(exhausted).limit(1).scalar() is not None:
+        db.query(Job).filter(exhausted).update(
+            {
+                Job.status: "failed",
+                Job.error: "Worker died while running the job",
+                Job.locked_by: None,
+                Job.finished_at: now,
+            },
+            synchronize_session=False,
+        )
+    candidate = (
+        db.query(Job.id)
+        .filter(Job.kind.in_(kinds), _claimable(now))
+        .order_by(Job.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar()
+    )
+    if candidate is None:
+        db.commit()
+        return None
+
+    claimed = (
+        db.query(Job)
+        .filter(Job.id == candidate, _claimable(now))
+        .update(
+            {
+                Job.status: "running",
+                Job.attempts: Job.attempts + 1,
+                Job.locked_by: worker_id,
+                Job.locked_at: now,
+            },
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    if not claimed:
+        return None
+    return db.get(Job, candidate)
+
+
+def renew_lease(db: Session, job_id: int, worker_id: str) -> bool:
+    """Move a running job's lease forward; False if this worker no longer holds it."""
+    return _update_held(db, job_id, worker_id, {Job.locked_at: datetime.utcnow()})
+
+
+def _update_held(db: Session, job_id: int, worker_id: str, values: dict) -> bool:
+    """Apply ``values`` only while ``worker_id`` still holds the job's lease."""
+    held = (
+        db.query(Job)
+        .filter(Job.id == job_id, Job.status == "running", Job.locked_by == worker_id)
+        .update(values, synchronize_session=False)
+    )
+    db.commit()
+    return bool(held)
+
+
+def complete(db: Session, job: Job, worker_id: str, analysis_id: Optional[int] = None) -> bool:
+    """Mark a held job completed; False if its lease was lost and another worker has it."""
+    values = {
+        Job.status: "completed",
+        Job.error: None,
+        Job.locked_by: None,
+        Job.finished_at: datetime.utcnow(),
+    }
+    if analysis_id is not None:
+        values[Job.analysis_id] = analysis_id
+    return _update_held(db, job.id, worker_id, values)
+
+
+def fail(db: Session, job: Job, worker_id: str, error: str) -> bool:
+    """Record a failed attempt, requeueing with backoff while attempts remain.
+
+    Returns:
+        bool: False if the lease was lost meanwhile; the job is left to
+            the worker that holds it now
+    """
+    values = {Job.error: error, Job.locked_by: None}
+    if job.attempts < job.max_attempts:
+        delay = JOB_RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1)
+        values.update({Job.status: "queued", Job.run_after: datetime.utcnow() + timedelta(seconds=delay)})
+    else:
+        values.update({Job.status: "failed", Job.finished_at: datetime.utcnow()})
+    return _update_held(db, job.id, worker_id, values)
+
+
+def to_response(job: Job) -> dict:
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "upload_id": job.upload_id,
+        "analysis_id": job.analysis_id,
+        "attempts": job.attempts,
+        "error": job.error,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+    }
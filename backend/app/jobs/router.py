@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_async_db
+from app.models import Analysis, Job
+from app.auth import get_current_user
+from app.principals import Principal
+from app.analysis.service import to_response as analysis_response
+from app.jobs.queue import to_response
+
+router = APIRouter()
+
+
+@router.get("/{job_id}")
+async def read_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    """Poll a queued analysis; ``analysis`` is filled in once it completes.
+
+    Clients poll this in a loop, so it stays on the event loop with the
+    async session rather than taking a threadpool thread per request.
+    """
+    job = await db.get(Job, job_id)
+    if job is None or job.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    response = to_response(job)
+    response["analysis"] = None
+    if job.analysis_id is not None:
+        response["analysis"] = analysis_response(await db.get(Analysis, job.analysis_id))
+    return response
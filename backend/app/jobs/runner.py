@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import os
+import socket
+from typing import List, Optional
+
+from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
+
+from app.database import SessionLocal
+from app.models import Analysis, Job, Upload
+from app.analysis.batching import MicroBatcher
+from app.analysis.explain import explanations
+from app.analysis.service import run_analysis
+from app.jobs import queue
+from app.uploads.previews import build_previews
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------
+# Runner configuration
+# ---------------------------------------
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "4"))  # Jobs in flight per process
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))  # Seconds between empty polls
+
+
+class JobRunner:
+    """Claims queued jobs from the database and runs them.
+
+    ``analysis`` jobs classify an upload; ``explain`` jobs render SHAP
+    plots for a finished analysis; ``preview`` jobs build an upload's
+    thumbnail and tile pyramid. Without a batcher (no model loaded) only
+    ``preview`` jobs are claimed. ``concurrency`` coroutines each loop
+    over claim → run → record. Claims go through ``queue.claim`` so any
+    number of runners, in any number of processes, can share one ``jobs``
+    table. Analyses from all slots feed the same micro-batcher, so
+    concurrent jobs share forward passes.
+
+    Attributes:
+        batcher (MicroBatcher): Running batcher in front of the classifier, or None
+        kinds (tuple): Job kinds this runner claims
+        concurrency (int): Jobs run at once
+        poll_interval (float): Sleep after finding the queue empty
+    """
+
+    def __init__(
+        self,
+        batcher: Optional[MicroBatcher],
+        concurrency: int = JOB_CONCURRENCY,
+        poll_interval: float = JOB_POLL_INTERVAL,
+    ):
+        self.batcher = batcher
+        self.kinds = ("analysis", "explain", "preview") if batcher is not None else ("preview",)
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._loop(f"{self.worker_id}/{slot}"))
+            for slot in range(self.concurrency)
+        ]
+        logger.info(f"Job runner started with {self.concurrency} slots for {', '.join(self.kinds)} jobs")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self) -> None:
+        """Wake idle slots now instead of at their next poll."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _idle(self) -> None:
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def _loop(self, worker_id: str) -> None:
+        while True:
+            db = SessionLocal()
+            try:
+                job = await run_in_threadpool(queue.claim, db, worker_id, self.kinds)
+                if job is None:
+                    await self._idle()
+                    continue
+                await self._run(db, job, worker_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Database trouble; back off rather than spin
+                logger.exception("Job runner loop failed")
+                await asyncio.sleep(self.poll_interval)
+            finally:
+                db.close()
+
+    async def _heartbeat(self, job_id: int, worker_id: str) -> None:
+        """Renew the job's lease until cancelled, so long SHAP runs are not reclaimed."""
+        while True:
+            await asyncio.sleep(queue.JOB_HEARTBEAT_SECONDS)
+            try:
+                held = await run_in_threadpool(_renew_lease, job_id, worker_id)
+            except Exception:
+                logger.exception(f"Could not renew the lease on job {job_id}")
+                continue
+            if not held:
+                logger.warning(f"Job {job_id} was reclaimed while it ran")
+                return
+
+    async def _run(self, db, job: Job, worker_id: str) -> None:
+        handlers = {"analysis": self._analyse, "explain": self._explain, "preview": self._preview}
+        job_id = job.id
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, worker_id))
+        try:
+            try:
+                if job.kind not in handlers:
+                    raise ValueError(f"Unknown job kind: {job.kind}")
+                upload = await run_in_threadpool(db.get, Upload, job.upload_id)
+                if upload is None:
+                    raise ValueError(f"Upload {job.upload_id} no longer exists")
+                analysis_id = await handlers[job.kind](db, job, upload)
+            finally:
+                heartbeat.cancel()
+        except asyncio.CancelledError:
+            # Shutting down: leave the job for the lease to expire rather
+            # than count an attempt against it
+            raise
+        except Exception as e:
+            # Log first: the rollback expires ``job``, and reading it then would query here
+            logger.warning(f"Job {job_id} attempt {job.attempts} failed: {str(e)}")
+            await run_in_threadpool(db.rollback)
+            recorded = await run_in_threadpool(queue.fail, db, job, worker_id, str(e))
+        else:
+            recorded = await run_in_threadpool(queue.complete, db, job, worker_id, analysis_id)
+        if not recorded:
+            # Our lease lapsed and another worker holds the job; its result wins
+            logger.warning(f"Job {job_id} was reclaimed by another worker; dropped this attempt's result")
+
+    async def _analyse(self, db, job: Job, upload: Upload) -> int:
+        analysis = await run_analysis(db, upload, self.batcher)
+        return analysis.id
+
+    async def _explain(self, db, job: Job, upload: Upload) -> int:
+        analysis = await run_in_threadpool(db.get, Analysis, job.analysis_id)
+        if analysis is None:
+            raise ValueError(f"Analysis {job.analysis_id} no longer exists")
+        await explanations.shap(
+            analysis.model_version, upload.content_hash, upload.file_path, analysis.cells or []
+        )
+        return analysis.id
+
+    async def _preview(self, db, job: Job, upload: Upload) -> None:
+        await run_in_threadpool(build_previews, upload.file_path, upload.content_hash)
+
+
+def _renew_lease(job_id: int, worker_id: str) -> bool:
+    # Own session: the job's session may be busy in another thread
+    db = SessionLocal()
+    try:
+        return queue.renew_lease(db, job_id, worker_id)
+    finally:
+        db.close()
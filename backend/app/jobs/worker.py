@@ -0,0 +1,59 @@
+"""Standalone job worker.
+
+Usage (from backend/):
+
+    python -m app.jobs.worker [--concurrency N]
+
+Loads the classifier the same way the API does (``INFERENCE_BACKEND``,
+``INFERENCE_WORKERS``, ...) and runs queued jobs until interrupted. Start
+as many as needed, on any host that can reach the database; they share
+the ``jobs`` table without a broker. Set ``RUN_JOB_WORKER=0`` on the API
+to leave all analysis to these processes.
+"""
+import argparse
+import asyncio
+import logging
+import signal
+
+from app.analysis.batching import batcher
+from app.analysis.lifecycle import start_inference, stop_inference
+from app.init_db import create_schema
+from app.jobs.runner import JOB_CONCURRENCY, JOB_POLL_INTERVAL, JobRunner
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+
+async def serve(concurrency: int, poll_interval: float) -> None:
+    model_ready = start_inference()
+    if not model_ready:
+        logger.warning("Classifier not loaded; running preview jobs only")
+
+    runner = JobRunner(batcher if model_ready else None, concurrency, poll_interval)
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopping.set)
+
+    runner.start()
+    logger.info(f"Worker {runner.worker_id} waiting for jobs")
+    try:
+        await stopping.wait()
+    finally:
+        logger.info("Shutting down")
+        await runner.stop()
+        await stop_inference()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run queued analysis jobs")
+    parser.add_argument("--concurrency", type=int, default=JOB_CONCURRENCY, help="Jobs run at once")
+    parser.add_argument("--poll-interval", type=float, default=JOB_POLL_INTERVAL, help="Seconds between empty polls")
+    args = parser.parse_args()
+
+    create_schema()
+    asyncio.run(serve(args.concurrency, args.poll_interval))
+
+
+if __name__ == "__main__":
+    main()
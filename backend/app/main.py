@@ -1,21 +1,36 @@
 import os
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends, HTTPException
 from pydantic import BaseModel, EmailStr
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from app.uploads.router import router as uploads_router
-from app.models import Base, User
-from app.database import engine, SessionLocal
-
-import bcrypt  # type: ignore
-from .auth import router as auth_router
+from app.uploads.router import history_router, router as uploads_router
+from app.analysis.router import router as analysis_router
+from app.analysis.batching import batcher
+from app.analysis.lifecycle import stop_inference, warm_inference
+from app.jobs.router import router as jobs_router
+from app.jobs.runner import JobRunner
+from app.uploads.previews import PREVIEW_FOLDER, PREVIEW_URL_PREFIX, PreviewFiles
+from app.models import User
+from app.database import async_engine, get_async_db
+from app.health import MODEL_FAILED, MODEL_READY, MODEL_UNAVAILABLE, MODEL_WARMING, router as health_router
+from app.init_db import create_schema
+from app.metrics import MetricsMiddleware, router as metrics_router
+from app.ratelimit import RateLimit
+from app.passwords import password_hasher
+
+from .auth import router as auth_router, user_or_ip
 from . import crud
 
-# ---------------------------------------
-# Database Configuration
-# ---------------------------------------
-Base.metadata.create_all(bind=engine)
+logger = logging.getLogger(__name__)
+
+RUN_JOB_WORKER = os.getenv("RUN_JOB_WORKER", "1") == "1"  # Run a JobRunner inside the API
+UPLOAD_RATE_LIMIT = os.getenv("UPLOAD_RATE_LIMIT", "120/60")  # Upload requests per user: "<requests>/<seconds>"
+# Create missing tables on startup; set to 0 when `python -m app.init_db` runs at deploy
+CREATE_SCHEMA = os.getenv("CREATE_SCHEMA", "1") == "1"
 
 # ---------------------------------------
 # Pydantic schemas
@@ -40,16 +55,55 @@ class UserOut(BaseModel):
 # ---------------------------------------
 # FastAPI app
 # ---------------------------------------
-app = FastAPI()
-
-
-def get_db():
-    """Dependency to get DB session"""
-    db = SessionLocal()
+async def warm_up(app: FastAPI, schema_ready: asyncio.Event) -> None:
+    """Load and warm the classifier, then start the job runner.
+
+    Runs as a task after startup, so the process answers /healthz and
+    serves auth and uploads while the model loads; /readyz reports
+    when it is done. The runner waits for ``schema_ready``, since the
+    model can finish loading before ``create_schema`` does.
+    """
     try:
-        yield db
-    finally:
-        db.close()
+        model_ready = await warm_inference()
+        app.state.model_status = MODEL_READY if model_ready else MODEL_UNAVAILABLE
+    except Exception:
+        logger.exception("Classifier warmup failed")
+        model_ready = False
+        app.state.model_status = MODEL_FAILED
+
+    # Without weights keep serving auth/uploads; /analysis answers 503
+    # and this process only builds previews
+    if RUN_JOB_WORKER:
+        # Process queued jobs here too, unless dedicated
+        # `python -m app.jobs.worker` processes do it
+        await schema_ready.wait()
+        runner = JobRunner(batcher if model_ready else None)
+        runner.start()
+        app.state.job_runner = runner
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start serving at once and warm the classifier in the background."""
+    app.state.model_status = MODEL_WARMING
+    app.state.job_runner = None
+    schema_ready = asyncio.Event()
+    warmup = asyncio.create_task(warm_up(app, schema_ready), name="warmup")
+    if CREATE_SCHEMA:
+        # Overlaps the model load, which starts in the threadpool first
+        await run_in_threadpool(create_schema)
+    schema_ready.set()
+    yield
+    warmup.cancel()
+    await asyncio.gather(warmup, return_exceptions=True)
+    if app.state.job_runner is not None:
+        await app.state.job_runner.stop()
+    await stop_inference()
+    await async_engine.dispose()
+    password_hasher.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 # ---------------------------------------
@@ -63,22 +117,37 @@ app.add_middleware(
     allow_headers=["*"],
     expose_headers=["Content-Range", "X-Total-Count"],
 )
+# Outermost, so the timings include CORS and every other middleware
+app.add_middleware(MetricsMiddleware)
 
+app.include_router(health_router)
+app.include_router(metrics_router)
 app.include_router(auth_router)
-app.include_router(uploads_router, prefix="/upload", tags=["Upload"])
+app.include_router(
+    uploads_router,
+    prefix="/upload",
+    tags=["Upload"],
+    dependencies=[Depends(RateLimit("upload", UPLOAD_RATE_LIMIT, key=user_or_ip))],
+)
+app.include_router(history_router, prefix="/uploads", tags=["Upload"])
+app.include_router(analysis_router, prefix="/analysis", tags=["Analysis"])
+app.include_router(jobs_router, prefix="/jobs", tags=["Jobs"])
+# Thumbnails and Deep Zoom tiles, with ETag/304 and Range support
+app.mount(PREVIEW_URL_PREFIX, PreviewFiles(directory=PREVIEW_FOLDER), name="previews")
 
 
 # ---------------------------------------
 # User Registration Endpoint
 # ---------------------------------------
 @app.post("/users/", response_model=UserOut)
-def create_user(user: UserCreate, db: Session = Depends(get_db)):
-    if crud.get_user_by_email(db, user.email) or crud.get_user_by_username(
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    if await crud.get_user_by_email(db, user.email) or await crud.get_user_by_username(
         db, user.username
     ):
         raise HTTPException(status_code=400, detail="User already registered")
 
-    hashed = bcrypt.hashpw(user.password.encode(), bcrypt.gensalt()).decode()
+    # bcrypt is deliberately slow; hash on the bounded pool (503 when saturated)
+    hashed = await password_hasher.hash(user.password)
     new_user = User(
         username=user.username,
         email=user.email,
@@ -86,6 +155,6 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
         hashed_password=hashed,
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     return new_user
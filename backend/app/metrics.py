@@ -0,0 +1,292 @@
+import time
+from bisect import bisect_left
+from threading import get_ident
+from typing import Callable, Dict, List, Sequence, Tuple, Union
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+# ---------------------------------------
+# Bucket layouts
+# ---------------------------------------
+# Seconds; from a cache hit to a slow analysis
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Crops per forward pass
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Sharded:
+    """Values kept per thread and summed when scraped.
+
+    Each thread only ever writes its own shard, so recording is a dict
+    lookup and an in-place add, with no lock and no lost updates between
+    the event loop and threadpool threads. A thread id reused after its
+    thread exits just continues the old shard.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._shards: Dict[int, Dict[Labels, list]] = {}
+
+    def _series(self, labels: Labels) -> list:
+        shard = self._shards.get(get_ident())
+        if shard is None:
+            shard = self._shards.setdefault(get_ident(), {})
+        series = shard.get(labels)
+        if series is None:
+            series = shard[labels] = self._new_series()
+        return series
+
+    def _new_series(self) -> list:
+        raise NotImplementedError
+
+    def _merged(self) -> Dict[Labels, list]:
+        merged: Dict[Labels, list] = {}
+        for shard in list(self._shards.values()):
+            for labels, series in list(shard.items()):
+                total = merged.get(labels)
+                if total is None:
+                    merged[labels] = list(series)
+                else:
+                    for i, value in enumerate(series):
+                        total[i] += value
+        return merged
+
+
+class Counter(_Sharded):
+    """Monotonic total, e.g. bytes received."""
+
+    def _new_series(self) -> list:
+        return [0]
+
+    def inc(self, amount: float = 1, labels: Labels = ()) -> None:
+        self._series(labels)[0] += amount
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, (value,) in sorted(self._merged().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Sharded):
+    """Distribution of observed values over fixed buckets.
+
+    Attributes:
+        buckets (tuple): Upper bounds, ascending; ``+Inf`` is implied
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def _new_series(self) -> list:
+        # One count per bucket (not cumulative), +Inf, then the sum
+        return [0] * (len(self.buckets) + 1) + [0.0]
+
+    def observe(self, value: float, labels: Labels = ()) -> None:
+        series = self._series(labels)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def time(self, labels: Labels = ()) -> "_Timer":
+        """Context manager observing the seconds its block took."""
+        return _Timer(self, labels)
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self._merged().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram: Histogram, labels: Labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, self.labels)
+
+
+Sample = Union[float, Dict[Labels, float]]
+
+
+class Gauge:
+    """Value read from its owner when scraped, so it costs nothing in between.
+
+    ``callback`` returns a number, or a dict of label values → number.
+    ``kind`` is ``"counter"`` for totals the owner already keeps (cache
+    hits, rejections).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], Sample],
+        labelnames: Sequence[str] = (),
+        kind: str = "gauge",
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labelnames = tuple(labelnames)
+        self.kind = kind
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        sample = self.callback()
+        samples = sample.items() if isinstance(sample, dict) else [((), sample)]
+        for labels, value in sorted(samples):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    """Every metric of this process, rendered in the Prometheus text format.
+
+    Metrics are per process: with several uvicorn workers, each one
+    counts its own requests, so scrape each worker (one per container)
+    rather than a port they share.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Union[Counter, Histogram, Gauge]] = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], Sample],
+        labelnames: Sequence[str] = (),
+        kind: str = "gauge",
+    ) -> Gauge:
+        return self._register(Gauge(name, documentation, callback, labelnames, kind))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for name in sorted(self._metrics):
+            lines.extend(self._metrics[name].collect())
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry; modules register their metrics at import
+registry = Registry()
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds",
+    "Time from request start to the end of the response body, by route template",
+    ("method", "route", "status"),
+)
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request into ``http_request_duration``.
+
+    Requests are labelled with the matched route's template
+    (``/jobs/{job_id}``, not the id), so the number of series stays
+    bounded. Mounted apps (``/previews``) are labelled with their mount
+    path and anything unrouted with ``unmatched``.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500  # If the app raises before responding
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router records what matched in the shared scope
+            route = scope.get("route")
+            if route is not None:
+                template = route.path
+            elif scope.get("root_path", "") != scope.get("app_root_path", ""):
+                template = scope["root_path"][len(scope.get("app_root_path", "")):] or "unmatched"
+            else:
+                template = "unmatched"
+            http_request_duration.observe(
+                time.perf_counter() - started, (scope["method"], template, str(status))
+            )
+
+
+router = APIRouter(tags=["Health"])
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Every registered metric, for a Prometheus scrape."""
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import BigInteger, Column, Date, Integer, String, Text, DateTime, ForeignKey, Float, JSON, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from app.database import Base  # Importing Base from the shared database module
 from datetime import datetime
@@ -6,12 +6,15 @@ from datetime import datetime
 
 class Upload(Base):
     __tablename__ = "uploads"  # Table name in the database
+    # History pages: a user's uploads, newest first, by (upload_time, id) cursor
+    __table_args__ = (Index("ix_uploads_user_time_id", "user_id", "upload_time", "id"),)
 
     id = Column(
         Integer, primary_key=True, index=True
     )  # Primary key: Unique ID for each upload
-    filename = Column(String, index=True)  # Name of the file
-    file_path = Column(String)  # Path where the file is saved on the server
+    filename = Column(String, index=True)  # Original name of the file, as uploaded
+    file_path = Column(String)  # Path of the content-addressed blob on the server
+    content_hash = Column(String(64), index=True)  # SHA-256 of the file contents
     upload_time = Column(
         DateTime, default=datetime.utcnow
     )  # Timestamp of when the file was uploaded
@@ -24,6 +27,29 @@ class Upload(Base):
         "User", back_populates="uploads"
     )  # Establish a relationship with the User model
 
+    # Analyses that have been run against this upload
+    analyses = relationship("Analysis", back_populates="upload")
+
+
+class Blob(Base):
+    """A stored file, shared by every upload with the same contents."""
+
+    __tablename__ = "blobs"
+
+    content_hash = Column(String(64), primary_key=True)  # SHA-256, also the file name
+    size = Column(BigInteger)  # Bytes on disk
+    ref_count = Column(Integer, nullable=False, default=1)  # Uploads pointing at it
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class UploadCount(Base):
+    """Number of uploads per user, kept current so listings need no COUNT(*)."""
+
+    __tablename__ = "upload_counts"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    upload_count = Column(Integer, nullable=False, default=0)
+
 
 class User(Base):
     __tablename__ = "users"
@@ -38,3 +64,82 @@ class User(Base):
     uploads = relationship(
         "Upload", back_populates="user"
     )  # This connects the User and Upload models
+
+
+class Analysis(Base):
+    __tablename__ = "analyses"
+
+    id = Column(Integer, primary_key=True, index=True)
+    upload_id = Column(Integer, ForeignKey("uploads.id"), index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    status = Column(String, default="completed")  # completed | failed
+    model_version = Column(String)  # Short hash of the weights that produced it
+    total_cells = Column(Integer, default=0)  # White cells detected on the smear
+    abnormal_cells = Column(Integer, default=0)  # Cells no normal class fits confidently
+    class_counts = Column(JSON)  # {cell_type: count}
+    cells = Column(JSON)  # [{box, class, confidence}] per detected cell
+    predicted_class = Column(String)  # Dominant cell type
+    confidence = Column(Float)  # Mean probability of the dominant type
+    probabilities = Column(JSON)  # {cell_type: mean probability}
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    upload = relationship("Upload", back_populates="analyses")
+
+
+class AnalysisResult(Base):
+    """Persistent result cache: one row per (image content, model version)."""
+
+    __tablename__ = "analysis_results"
+    __table_args__ = (UniqueConstraint("content_hash", "model_version"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String(64), nullable=False)  # SHA-256 of the image
+    model_version = Column(String, nullable=False)
+    result = Column(JSON)  # Output of pipeline.summarise
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class AnalysisDailyStats(Base):
+    """Per-user, per-day totals of completed analyses, kept current as they finish."""
+
+    __tablename__ = "analysis_daily_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)  # UTC date the analyses finished
+    analyses = Column(Integer, nullable=False, default=0)
+    total_cells = Column(BigInteger, nullable=False, default=0)
+    abnormal_cells = Column(BigInteger, nullable=False, default=0)
+
+
+class AnalysisDailyClassCount(Base):
+    """Cells of each type per user and day; the class mix of ``AnalysisDailyStats``."""
+
+    __tablename__ = "analysis_daily_class_counts"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    cell_type = Column(String, primary_key=True)
+    cells = Column(BigInteger, nullable=False, default=0)
+
+
+class Job(Base):
+    """Background work item, claimed by workers with SELECT ... SKIP LOCKED."""
+
+    __tablename__ = "jobs"
+    # Claim query: next runnable job in id order, plus expired leases
+    __table_args__ = (Index("ix_jobs_status_run_after", "status", "run_after"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False, default="analysis")
+    status = Column(String, nullable=False, default="queued")  # queued | running | completed | failed
+    upload_id = Column(Integer, ForeignKey("uploads.id"), index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    analysis_id = Column(Integer, ForeignKey("analyses.id"))  # Set once completed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_after = Column(DateTime, default=datetime.utcnow)  # Not claimable before this
+    locked_by = Column(String)  # Worker holding the job
+    locked_at = Column(DateTime)  # Lease start; expired leases are reclaimed
+    error = Column(Text)  # Last failure
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime)
@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+import bcrypt  # type: ignore
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+
+from app.metrics import registry
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------
+# Password hashing configuration
+# ---------------------------------------
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))  # Cost factor; ~250 ms per hash at 12
+# Leave cores for the event loop and upload I/O however many logins arrive
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+# Calls waiting beyond the busy workers; ~1 s of queued work per worker at cost 12
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", str(4 * PASSWORD_HASH_WORKERS)))
+BCRYPT_MAX_BYTES = 72  # bcrypt ignores the rest; newer releases refuse it instead
+
+T = TypeVar("T")
+
+
+class HasherBusy(HTTPException):
+    """Every worker is busy and the queue is full; answered as 503."""
+
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-ins in progress. Please try again shortly.",
+            headers={"Retry-After": "1"},
+        )
+
+
+def _encode(password: str) -> bytes:
+    return password.encode()[:BCRYPT_MAX_BYTES]
+
+
+def hash_cost(hashed: str) -> Optional[int]:
+    """Cost factor of a ``$2b$12$...`` hash, or None if it is not bcrypt."""
+    parts = hashed.split("$")
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+class PasswordHasher:
+    """bcrypt on a dedicated, bounded thread pool.
+
+    bcrypt releases the GIL, so hashing runs in parallel with the event
+    loop, but only on ``workers`` threads: a burst of logins cannot take
+    every core or the shared threadpool that uploads use. At most
+    ``max_queue`` more calls wait for a worker; beyond that ``HasherBusy``
+    (a 503) is raised at once instead of letting the backlog, and every
+    client's latency, grow without bound.
+
+    Attributes:
+        rounds (int): Cost factor of new hashes
+        workers (int): Hashing threads
+        max_queue (int): Calls allowed to wait for a worker
+    """
+
+    def __init__(
+        self,
+        rounds: int = BCRYPT_ROUNDS,
+        workers: int = PASSWORD_HASH_WORKERS,
+        max_queue: int = PASSWORD_HASH_QUEUE,
+    ):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._pending = 0
+        self._lock = threading.Lock()
+        # Hash of a random password, checked against when the user does not
+        # exist; made on first use so importing the app stays cheap
+        self._dummy: Optional[str] = None
+
+        # Counters
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+
+    async def _submit(self, fn: Callable[..., T], *args) -> T:
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise HasherBusy()
+            self._pending += 1
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+            raise
+        # Counted down when the thread finishes, not when the caller stops
+        # waiting: a cancelled login leaves its bcrypt call running
+        future.add_done_callback(self._finished)
+        return await asyncio.wrap_future(future)
+
+    def _finished(self, future: Future) -> None:
+        with self._lock:
+            self._pending -= 1
+            if not future.cancelled():
+                self.completed += 1
+
+    async def hash(self, password: str) -> str:
+        salt = bcrypt.gensalt(self.rounds)
+        hashed = await self._submit(bcrypt.hashpw, _encode(password), salt)
+        return hashed.decode()
+
+    async def verify(self, password: str, hashed: Optional[str]) -> bool:
+        """Check a password; an unknown user (``hashed`` None) costs the same time."""
+        if hashed is None and self._dummy is None:
+            self._dummy = await self.hash(os.urandom(16).hex())
+        try:
+            matches = await self._submit(bcrypt.checkpw, _encode(password), (hashed or self._dummy).encode())
+            return matches and hashed is not None
+        except ValueError:
+            # Not a bcrypt hash
+            logger.error("Password verification error: stored hash is not bcrypt")
+            return False
+
+    def needs_rehash(self, hashed: str) -> bool:
+        """True if ``hashed`` was made with a different cost than configured."""
+        return hash_cost(hashed) != self.rounds
+
+    async def upgrade(self, password: str, hashed: str) -> Optional[str]:
+        """New hash of a just-verified password if its cost is outdated.
+
+        Called after a successful login, the only time the plain password
+        is known, so raising ``BCRYPT_ROUNDS`` migrates users as they sign
+        in. A busy hasher skips the upgrade rather than fail the login.
+
+        Args:
+            password: Plain text password that matched ``hashed``
+            hashed: Stored hash
+
+        Returns:
+            str: Hash at the configured cost, or None if none is needed now
+        """
+        if not self.needs_rehash(hashed):
+            return None
+        try:
+            new_hash = await self.hash(password)
+        except HasherBusy:
+            return None
+        self.rehashed += 1
+        return new_hash
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "pending": self._pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "rehashed": self.rehashed,
+            "rounds": self.rounds,
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Process-wide hasher used by login and registration
+password_hasher = PasswordHasher()
+
+registry.gauge("password_hash_pending", "bcrypt calls running or queued", lambda: password_hasher._pending)
+registry.gauge(
+    "password_hash_rejected_total",
+    "bcrypt calls refused with 503 because the pool was saturated",
+    lambda: password_hasher.rejected,
+    kind="counter",
+)
@@ -0,0 +1,154 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy import event
+
+from app.metrics import registry
+from app.models import User
+
+load_dotenv()
+
+# ---------------------------------------
+# Principal cache configuration
+# ---------------------------------------
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))  # Verified tokens kept per process
+# Other API processes cannot invalidate this one's entries, so a changed or
+# deleted user is honoured everywhere within this many seconds
+AUTH_CACHE_MAX_AGE = float(os.getenv("AUTH_CACHE_MAX_AGE", "300"))
+
+
+class Principal:
+    """The authenticated user, as much of it as request handlers need.
+
+    Attributes:
+        id (int): User id
+        username (str): Login name
+        email (str): Email address
+    """
+
+    __slots__ = ("id", "username", "email")
+
+    def __init__(self, id: int, username: Optional[str], email: Optional[str]):
+        self.id = id
+        self.username = username
+        self.email = email
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(user.id, user.username, user.email)
+
+    def __repr__(self) -> str:
+        return f"Principal(id={self.id}, username={self.username!r})"
+
+
+def token_digest(token: str) -> bytes:
+    """Cache key for a token; raw bearer tokens are never kept in memory."""
+    return hashlib.sha256(token.encode()).digest()
+
+
+class PrincipalCache:
+    """Bounded LRU of verified token digests → ``Principal``.
+
+    An entry is trusted until the token's ``exp`` (at most
+    ``max_age`` seconds), so a hit skips both the JWT signature check and
+    the user lookup. Entries for a user are dropped when that user row is
+    updated or deleted through the ORM (see the listeners below).
+
+    Attributes:
+        max_entries (int): Capacity of the LRU
+        max_age (float): Longest an entry is trusted, in seconds
+    """
+
+    def __init__(self, max_entries: int = AUTH_CACHE_SIZE, max_age: float = AUTH_CACHE_MAX_AGE):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._lru: "OrderedDict[bytes, Tuple[Principal, float]]" = OrderedDict()
+        self._by_user: Dict[int, Set[bytes]] = {}
+        # Invalidation can come from threadpool code (sync sessions)
+        self._lock = threading.Lock()
+
+        # Hit/miss counters
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, digest: bytes) -> Optional[Principal]:
+        with self._lock:
+            entry = self._lru.get(digest)
+            if entry is None:
+                self.misses += 1
+                return None
+            principal, expires = entry
+            if time.time() >= expires:
+                self._forget(digest)
+                self.misses += 1
+                return None
+            self._lru.move_to_end(digest)
+            self.hits += 1
+            return principal
+
+    def put(self, digest: bytes, principal: Principal, exp: Optional[float]) -> None:
+        """Remember a verified token until ``exp`` (a Unix time), capped at ``max_age``."""
+        expires = time.time() + self.max_age
+        if exp is not None:
+            expires = min(expires, float(exp))
+        with self._lock:
+            self._lru[digest] = (principal, expires)
+            self._lru.move_to_end(digest)
+            self._by_user.setdefault(principal.id, set()).add(digest)
+            while len(self._lru) > self.max_entries:
+                oldest, _ = next(iter(self._lru.items()))
+                self._forget(oldest)
+
+    def _forget(self, digest: bytes) -> None:
+        principal, _ = self._lru.pop(digest)
+        digests = self._by_user.get(principal.id)
+        if digests is not None:
+            digests.discard(digest)
+            if not digests:
+                del self._by_user[principal.id]
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Drop every cached token of a user, e.g. after it changed."""
+        with self._lock:
+            for digest in list(self._by_user.get(user_id, ())):
+                self._forget(digest)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._lru.clear()
+            self._by_user.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._lru),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+# Process-wide cache used by auth.get_current_user
+principal_cache = PrincipalCache()
+
+registry.gauge(
+    "auth_cache_lookups_total",
+    "Bearer token lookups in the principal cache by outcome",
+    lambda: {("hit",): principal_cache.hits, ("miss",): principal_cache.misses},
+    ("result",),
+    kind="counter",
+)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, target: User) -> None:
+    # Fires on flush; bulk query.update()/delete() bypass it and must
+    # call principal_cache.invalidate_user themselves
+    principal_cache.invalidate_user(target.id)
@@ -0,0 +1,260 @@
+import inspect
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, NamedTuple, Optional, Tuple, Union
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, Request, Response, status
+
+from app.metrics import registry
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------
+# Rate limit configuration
+# ---------------------------------------
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")  # memory | redis
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))  # Hard cap of the memory backend
+RATE_LIMIT_PREFIX = "ratelimit"  # Namespace of the keys in a shared store
+
+
+class Decision(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float  # Seconds until a request would be allowed; 0 when allowed
+
+
+def parse_rate(rate: str) -> Tuple[int, float]:
+    """``"5/60"`` → (5 requests, 60 second window)."""
+    try:
+        count, seconds = rate.split("/")
+        limit, window = int(count), float(seconds)
+    except ValueError:
+        raise ValueError(f"Invalid rate {rate!r}, expected '<requests>/<seconds>'")
+    if limit < 1 or window <= 0:
+        raise ValueError(f"Invalid rate {rate!r}, both parts must be positive")
+    return limit, window
+
+
+def _decide(limit: int, window: float, now: float, current: int, previous: int, counted: bool) -> Decision:
+    """Sliding-window-counter verdict from the two fixed-window counts.
+
+    The rate over the last ``window`` seconds is estimated as the current
+    window's count plus the previous window's count weighted by how much
+    of it still overlaps. ``current`` already includes this request when
+    ``counted``.
+    """
+    elapsed = (now % window) / window
+    estimate = previous * (1 - elapsed) + current
+    if counted:
+        return Decision(True, limit, max(0, int(limit - estimate)), 0.0)
+
+    if current + 1 > limit:
+        # Blocked until this window ends, whatever the previous one held
+        retry_after = window - now % window
+    else:
+        # Wait for the previous window's weight to decay enough
+        needed = 1 - (limit - current - 1) / previous
+        retry_after = max(0.0, (needed - elapsed) * window)
+    return Decision(False, limit, 0, retry_after)
+
+
+class MemoryBackend:
+    """Sliding-window counters for one process, in bounded memory.
+
+    Each key holds two integers and a window number, updated in O(1).
+    Keys are kept in least-recently-used order. Keys idle for two windows
+    are evicted as new traffic arrives. ``max_keys`` is a hard cap: past
+    it the least recently used key is evicted even if it is not idle,
+    which forgets that client's count (fails open).
+
+    Attributes:
+        max_keys (int): Most keys held at once
+        clock (callable): Time source, in seconds
+    """
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS, clock: Callable[[], float] = time.time):
+        self.max_keys = max_keys
+        self.clock = clock
+        # key → [window number, current count, previous count, last seen, window length]
+        self._counters: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._counters)
+
+    def _evict(self, now: float) -> None:
+        while self._counters:
+            _, (_, _, _, last_seen, window) = next(iter(self._counters.items()))
+            if now - last_seen < 2 * window and len(self._counters) <= self.max_keys:
+                break
+            self._counters.popitem(last=False)
+            self.evicted += 1
+
+    async def hit(self, key: str, limit: int, window: float) -> Decision:
+        now = self.clock()
+        number = int(now // window)
+        with self._lock:
+            entry = self._counters.get(key)
+            if entry is None:
+                entry = self._counters[key] = [number, 0, 0, now, window]
+            elif entry[0] != number:
+                # Roll over; a gap of more than one window leaves nothing behind
+                entry[2] = entry[1] if entry[0] == number - 1 else 0
+                entry[0], entry[1] = number, 0
+            entry[3] = now
+            self._counters.move_to_end(key)
+
+            _, current, previous, _, _ = entry
+            counted = previous * (1 - (now % window) / window) + current + 1 <= limit
+            if counted:
+                entry[1] += 1
+            self._evict(now)
+        return _decide(limit, window, now, current + counted, previous, counted)
+
+
+class FakeBackend(MemoryBackend):
+    """``MemoryBackend`` on a manual clock, for deterministic tests.
+
+    Share one instance between several limiters to stand in for a store
+    shared by several workers.
+    """
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS, start: float = 0.0):
+        self.now = start
+        super().__init__(max_keys, clock=lambda: self.now)
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+# Check and count in one round trip, so concurrent workers cannot both
+# take the last slot. KEYS: current window, previous window.
+# ARGV: limit, elapsed fraction of the window, key lifetime in ms.
+_REDIS_HIT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+if previous * (1 - tonumber(ARGV[2])) + current + 1 > tonumber(ARGV[1]) then
+    return {0, current, previous}
+end
+current = redis.call('INCR', KEYS[1])
+redis.call('PEXPIRE', KEYS[1], ARGV[3])
+return {1, current, previous}
+"""
+
+
+class RedisBackend:
+    """Sliding-window counters in Redis, shared by every worker and host.
+
+    Each key and window is one Redis integer that expires two windows
+    after it was last written, so Redis memory is bounded by the active
+    keys. Needs the ``redis`` package.
+
+    Attributes:
+        client: ``redis.asyncio`` client
+    """
+
+    def __init__(self, client=None, url: str = REDIS_URL, clock: Callable[[], float] = time.time):
+        if client is None:
+            # Imported here so that the memory backend does not need redis installed
+            import redis.asyncio as redis
+
+            client = redis.from_url(url)
+        self.client = client
+        self.clock = clock
+        self._script = client.register_script(_REDIS_HIT)
+
+    async def hit(self, key: str, limit: int, window: float) -> Decision:
+        now = self.clock()
+        number = int(now // window)
+        keys = [f"{RATE_LIMIT_PREFIX}:{key}:{number}", f"{RATE_LIMIT_PREFIX}:{key}:{number - 1}"]
+        counted, current, previous = await self._script(
+            keys=keys, args=[limit, (now % window) / window, int(2 * window * 1000)]
+        )
+        return _decide(limit, window, now, int(current), int(previous), bool(counted))
+
+
+def build_backend(name: str = RATE_LIMIT_BACKEND):
+    if name == "memory":
+        return MemoryBackend()
+    if name == "redis":
+        return RedisBackend()
+    raise ValueError(f"Unknown rate limit backend {name!r}, expected 'memory' or 'redis'")
+
+
+# Process-wide backend used by every RateLimit dependency
+backend = build_backend()
+
+rate_limited = registry.counter("rate_limit_rejected_total", "Requests refused with 429", ("scope",))
+
+
+def client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
+class RateLimit:
+    """Dependency enforcing ``rate`` requests per window for one scope.
+
+    Use it on a route, ``dependencies=[Depends(RateLimit("login", "5/60"))]``,
+    or on a whole router with ``include_router(..., dependencies=[...])``.
+    Allowed responses carry ``X-RateLimit-Limit`` and
+    ``X-RateLimit-Remaining``. Refused requests get ``429`` with
+    ``Retry-After``.
+
+    Attributes:
+        scope (str): Name separating this limit's counters from others
+        limit (int): Requests allowed per window
+        window (float): Window length in seconds
+        key (callable): Maps a request to the identity being limited; may
+            be a coroutine function, e.g. ``auth.user_or_ip``
+    """
+
+    def __init__(
+        self,
+        scope: str,
+        rate: str,
+        key: Callable[[Request], Union[str, Awaitable[str]]] = client_ip,
+        store=None,
+    ):
+        self.scope = scope
+        self.limit, self.window = parse_rate(rate)
+        self.key = key
+        self._store = store
+
+    @property
+    def store(self):
+        return self._store if self._store is not None else backend
+
+    async def __call__(self, request: Request, response: Response) -> None:
+        identity = self.key(request)
+        if inspect.isawaitable(identity):
+            identity = await identity
+        try:
+            decision = await self.store.hit(f"{self.scope}:{identity}", self.limit, self.window)
+        except Exception as e:
+            # A limiter outage must not take the API down with it
+            logger.warning(f"Rate limit check for {self.scope} failed open: {str(e)}")
+            return
+
+        if not decision.allowed:
+            rate_limited.inc(1, (self.scope,))
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests. Please try again later.",
+                headers={
+                    "Retry-After": str(math.ceil(decision.retry_after)),
+                    "X-RateLimit-Limit": str(decision.limit),
+                    "X-RateLimit-Remaining": "0",
+                },
+            )
+        response.headers["X-RateLimit-Limit"] = str(decision.limit)
+        response.headers["X-RateLimit-Remaining"] = str(decision.remaining)
@@ -0,0 +1,210 @@
+"""Incremental ZIP extraction for archives that arrive as a byte stream.
+
+``zipfile`` needs a seekable file because it starts from the central
+directory at the end of the archive. An upload is read front to back, so
+this reader walks the local file headers instead and inflates each member
+as its bytes arrive. Only the current member's unread input is buffered.
+"""
+import struct
+import zlib
+from typing import Callable, Optional
+
+LOCAL_HEADER = b"PK\x03\x04"
+CENTRAL_HEADER = b"PK\x01\x02"
+END_OF_CENTRAL_DIRECTORY = b"PK\x05\x06"
+DATA_DESCRIPTOR = b"PK\x07\x08"
+ZIP_SIGNATURE = LOCAL_HEADER
+
+_LOCAL_HEADER = struct.Struct("<4sHHHHHIIIHH")
+_ZIP64_EXTRA_ID = 0x0001
+_FLAG_ENCRYPTED = 0x0001
+_FLAG_DATA_DESCRIPTOR = 0x0008
+_FLAG_UTF8 = 0x0800
+_STORED = 0
+_DEFLATED = 8
+INFLATE_CHUNK = 1024 * 1024  # Cap on output per decompress call (zip bombs)
+
+
+class ZipStreamError(ValueError):
+    """The stream is not a ZIP archive this reader can extract."""
+
+
+class ZipStreamReader:
+    """Extract ZIP members from a stream fed in arbitrary chunks.
+
+    For each member ``open_member(name)`` is called; it returns an object
+    with ``write(bytes)`` and ``close()`` to receive the uncompressed
+    contents, or None to skip the member. Stored and deflated members are
+    supported, including ones whose sizes follow in a data descriptor
+    (the usual output of streaming zip writers). CRCs are verified.
+
+    Attributes:
+        members (int): Local headers read so far
+    """
+
+    def __init__(self, open_member: Callable[[str], Optional[object]]):
+        self.open_member = open_member
+        self.members = 0
+        self._buffer = bytearray()
+        self._state = self._read_header
+        self._done = False
+
+        # Current member
+        self._target = None
+        self._flags = 0
+        self._crc = 0
+        self._expected_crc = 0
+        self._remaining = 0
+        self._size = 0
+        self._zip64 = False
+        self._inflater = None
+
+    def feed(self, data: bytes) -> None:
+        if self._done:
+            return
+        self._buffer += data
+        # Each state returns False when it needs more input
+        while not self._done and self._state():
+            pass
+
+    def finish(self) -> None:
+        """Check the archive ended cleanly; call after the last ``feed``."""
+        if not self._done:
+            raise ZipStreamError("ZIP archive is truncated")
+
+    def _consume(self, count: int) -> bytes:
+        data = bytes(self._buffer[:count])
+        del self._buffer[:count]
+        return data
+
+    def _read_header(self) -> bool:
+        if len(self._buffer) < 4:
+            return False
+        signature = bytes(self._buffer[:4])
+        if signature in (CENTRAL_HEADER, END_OF_CENTRAL_DIRECTORY):
+            # Past the last member; the central directory adds nothing we need
+            self._done = True
+            self._buffer.clear()
+            return False
+        if signature != LOCAL_HEADER:
+            raise ZipStreamError("Not a ZIP archive or corrupt member header")
+        if len(self._buffer) < _LOCAL_HEADER.size:
+            return False
+
+        (_, _, flags, method, _, _, crc, compressed, _, name_length, extra_length) = (
+            _LOCAL_HEADER.unpack_from(self._buffer)
+        )
+        header_size = _LOCAL_HEADER.size + name_length + extra_length
+        if len(self._buffer) < header_size:
+            return False
+        header = self._consume(header_size)
+        raw_name = header[_LOCAL_HEADER.size : _LOCAL_HEADER.size + name_length]
+        extra = header[_LOCAL_HEADER.size + name_length :]
+        name = raw_name.decode("utf-8" if flags & _FLAG_UTF8 else "cp437", "replace")
+
+        if flags & _FLAG_ENCRYPTED:
+            raise ZipStreamError(f"Encrypted member not supported: {name}")
+        if method not in (_STORED, _DEFLATED):
+            raise ZipStreamError(f"Unsupported compression method {method}: {name}")
+
+        self._zip64 = False
+        offset = 0
+        while offset + 4 <= len(extra):
+            field_id, size = struct.unpack_from("<HH", extra, offset)
+            if field_id == _ZIP64_EXTRA_ID:
+                self._zip64 = True
+                if compressed == 0xFFFFFFFF and size >= 16:
+                    # Field holds uncompressed then compressed size
+                    compressed = struct.unpack_from("<Q", extra, offset + 12)[0]
+            offset += 4 + size
+
+        self.members += 1
+        self._flags = flags
+        self._expected_crc = crc
+        self._crc = 0
+        self._remaining = compressed
+        self._size = 0
+        self._inflater = zlib.decompressobj(-zlib.MAX_WBITS) if method == _DEFLATED else None
+        self._target = None if name.endswith("/") else self.open_member(name)
+        if method == _STORED and flags & _FLAG_DATA_DESCRIPTOR and not compressed:
+            self._state = self._scan_stored
+        else:
+            self._state = self._read_data
+        return True
+
+    def _emit(self, data: bytes) -> None:
+        if not data:
+            return
+        self._crc = zlib.crc32(data, self._crc)
+        self._size += len(data)
+        if self._target is not None:
+            self._target.write(data)
+
+    def _read_data(self) -> bool:
+        if self._inflater is None:
+            take = min(self._remaining, len(self._buffer))
+            self._emit(self._consume(take))
+            self._remaining -= take
+            if self._remaining:
+                return False
+        else:
+            pending = self._consume(len(self._buffer))
+            while pending and not self._inflater.eof:
+                self._emit(self._inflater.decompress(pending, INFLATE_CHUNK))
+                pending = self._inflater.unconsumed_tail
+            if not self._inflater.eof:
+                return False
+            # Whatever follows the deflate stream belongs to the next record
+            self._buffer[:0] = self._inflater.unused_data
+
+        self._state = self._read_descriptor if self._flags & _FLAG_DATA_DESCRIPTOR else self._end_member
+        return True
+
+    def _scan_stored(self) -> bool:
+        """Stored member whose size only follows it, in a signed data descriptor.
+
+        Nothing else marks where the data ends, so look for a descriptor
+        signature whose CRC and size match everything emitted before it.
+        """
+        size_bytes = 8 if self._zip64 else 4
+        length = 4 + 4 + 2 * size_bytes
+        start = 0
+        while True:
+            found = self._buffer.find(DATA_DESCRIPTOR, start)
+            if found < 0:
+                # Keep a possible partial signature for the next chunk
+                self._emit(self._consume(max(0, len(self._buffer) - 3)))
+                return False
+            if len(self._buffer) < found + length:
+                self._emit(self._consume(found))
+                return False
+            crc = zlib.crc32(self._buffer[:found], self._crc)
+            size = struct.unpack_from("<Q" if self._zip64 else "<I", self._buffer, found + 8)[0]
+            if crc == struct.unpack_from("<I", self._buffer, found + 4)[0] and size == self._size + found:
+                self._emit(self._consume(found))
+                self._state = self._read_descriptor
+                return True
+            start = found + 1
+
+    def _read_descriptor(self) -> bool:
+        size_bytes = 8 if self._zip64 else 4
+        length = 4 + 2 * size_bytes
+        if len(self._buffer) < 4:
+            return False
+        if bytes(self._buffer[:4]) == DATA_DESCRIPTOR:
+            length += 4
+        if len(self._buffer) < length:
+            return False
+        descriptor = self._consume(length)
+        self._expected_crc = struct.unpack_from("<I", descriptor, length - 4 - 2 * size_bytes)[0]
+        self._state = self._end_member
+        return True
+
+    def _end_member(self) -> bool:
+        target, self._target = self._target, None
+        if self._crc != self._expected_crc:
+            raise ZipStreamError("ZIP member failed its CRC check")
+        if target is not None:
+            target.close()
+        self._state = self._read_header
+        return True
@@ -0,0 +1,149 @@
+import base64
+import json
+import os
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.orm import Session
+
+from app.models import Analysis, Upload, UploadCount
+from app.uploads.previews import preview_urls
+
+load_dotenv()
+
+# ---------------------------------------
+# History configuration
+# ---------------------------------------
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "50"))  # Default uploads per page
+HISTORY_MAX_PAGE_SIZE = int(os.getenv("HISTORY_MAX_PAGE_SIZE", "200"))
+
+
+def encode_cursor(upload: Upload) -> str:
+    """Opaque cursor pointing just past ``upload`` in newest-first order."""
+    position = {"t": upload.upload_time.isoformat(), "i": upload.id}
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of ``encode_cursor``; raises ValueError on anything malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(position["t"]), int(position["i"])
+    except (TypeError, KeyError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def increment_upload_count(db: Session, user_id: int, count: int = 1) -> None:
+    """Add ``count`` new uploads to a user's counter; the caller commits.
+
+    Call after the ``Upload`` rows are flushed. A user without a counter
+    row (one who last uploaded before counters existed) gets one seeded
+    from ``COUNT(*)`` in the same statement, which then already includes
+    the new rows. On a conflict with a concurrent first upload the row
+    that won is incremented instead, so both transactions are counted.
+    """
+    seed = select(func.count()).select_from(Upload).where(Upload.user_id == user_id).scalar_subquery()
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as upsert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as upsert
+    else:
+        updated = (
+            db.query(UploadCount)
+            .filter(UploadCount.user_id == user_id)
+            .update({UploadCount.upload_count: UploadCount.upload_count + count}, synchronize_session=False)
+        )
+        if not updated:
+            db.add(UploadCount(user_id=user_id, upload_count=db.scalar(select(seed))))
+            db.flush()
+        return
+
+    statement = upsert(UploadCount).values(user_id=user_id, upload_count=seed)
+    statement = statement.on_conflict_do_update(
+        index_elements=[UploadCount.user_id],
+        set_={"upload_count": UploadCount.upload_count + count},
+    )
+    db.execute(statement)
+
+
+def upload_count(db: Session, user_id: int) -> int:
+    """A user's number of uploads, read from the counter row.
+
+    Falls back to ``COUNT(*)`` only for users who have not uploaded since
+    counters were introduced.
+    """
+    count = db.scalar(select(UploadCount.upload_count).where(UploadCount.user_id == user_id))
+    if count is None:
+        count = db.scalar(select(func.count()).select_from(Upload).where(Upload.user_id == user_id))
+    return count
+
+
+def list_uploads(
+    db: Session, user_id: int, limit: int = HISTORY_PAGE_SIZE, cursor: Optional[str] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """One page of a user's uploads, newest first, by keyset pagination.
+
+    The page is the first ``limit`` rows after the cursor's
+    ``(upload_time, id)`` in ``ix_uploads_user_time_id`` order, so its cost
+    does not grow with how deep into the history it is, unlike ``OFFSET``.
+    The latest analysis of each upload is fetched with one extra query.
+
+    Args:
+        db: Database session
+        user_id: Owner of the uploads
+        limit: Page size
+        cursor: ``next_cursor`` of the previous page, or None for the first
+
+    Returns:
+        tuple: The page's items and the cursor of the next page (None on
+            the last page)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    query = db.query(Upload).filter(Upload.user_id == user_id)
+    if cursor:
+        query = query.filter(tuple_(Upload.upload_time, Upload.id) < decode_cursor(cursor))
+    # One extra row tells whether another page follows
+    uploads = query.order_by(Upload.upload_time.desc(), Upload.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_cursor(uploads[limit - 1]) if len(uploads) > limit else None
+    uploads = uploads[:limit]
+
+    latest = {}
+    if uploads:
+        # Only the newest analysis per upload, and only the columns shown:
+        # the full rows carry every detected cell's box and class
+        newest = (
+            select(func.max(Analysis.id))
+            .where(Analysis.upload_id.in_([u.id for u in uploads]))
+            .group_by(Analysis.upload_id)
+        )
+        analyses = db.execute(
+            select(Analysis.upload_id, Analysis.id, Analysis.total_cells, Analysis.abnormal_cells)
+            .where(Analysis.id.in_(newest))
+        )
+        latest = {analysis.upload_id: analysis for analysis in analyses}
+
+    items = []
+    for upload in uploads:
+        analysis = latest.get(upload.id)
+        urls = preview_urls(upload.content_hash)
+        items.append(
+            {
+                "id": upload.id,
+                "filename": upload.filename,
+                "file_path": upload.file_path,
+                "upload_time": upload.upload_time,
+                "analysis_id": analysis.id if analysis else None,
+                "total_cells": analysis.total_cells if analysis else None,
+                "abnormal_cells": analysis.abnormal_cells if analysis else None,
+                "preview_url": urls["thumbnail_url"],
+                "dzi_url": urls["dzi_url"],
+            }
+        )
+    return items, next_cursor
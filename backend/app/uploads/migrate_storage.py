@@ -0,0 +1,150 @@
+"""Move uploads from the old flat folder into the content-addressed store.
+
+Usage (from backend/):
+
+    python -m app.uploads.migrate_storage [--dry-run] [--delete-orphans]
+
+Every regular file directly under ``UPLOAD_FOLDER`` is hashed and moved to
+``<UPLOAD_FOLDER>/ab/cd/<sha256>``. ``Upload`` rows that pointed at it get
+the new ``file_path`` and ``content_hash``, and the blob's reference count
+is set to the number of such rows. Files with identical contents collapse
+into one blob. Files no row refers to are left where they are, or deleted
+with ``--delete-orphans``.
+
+Each file is committed on its own, and already migrated blobs live in
+subdirectories that are never scanned, so the tool can simply be rerun
+after an interruption. Run it while the API is stopped.
+
+Each new blob also gets a ``preview`` job, committed with it, so the
+thumbnail and tile URLs of migrated uploads resolve once a worker has
+run it.
+"""
+import argparse
+import hashlib
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime
+
+from app.database import SessionLocal
+from app.init_db import create_schema
+from app.jobs.queue import enqueue
+from app.models import Blob, Upload
+from app.uploads.storage import UPLOAD_FOLDER, BlobStore
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def migrate(root: str = UPLOAD_FOLDER, dry_run: bool = False, delete_orphans: bool = False) -> dict:
+    """Migrate every flat file under ``root`` into the blob store.
+
+    Args:
+        root: The upload folder (also the blob store root)
+        dry_run: Only report what would happen
+        delete_orphans: Delete files no upload refers to instead of
+            leaving them in place
+
+    Returns:
+        dict: Counts of files moved, deduplicated and orphaned, rows updated
+            and preview jobs queued
+    """
+    store = BlobStore(root)
+    # The databases this runs against predate blobs and uploads.content_hash
+    create_schema()
+
+    db = SessionLocal()
+    try:
+        # Old rows stored the absolute path; index them by real path so
+        # relative or differently spelled roots still match
+        rows_by_path = defaultdict(list)
+        for upload in db.query(Upload).all():
+            if upload.file_path:
+                rows_by_path[os.path.realpath(upload.file_path)].append(upload)
+
+        stats = {"files": 0, "moved": 0, "deduplicated": 0, "orphans": 0, "rows_updated": 0, "previews": 0}
+        for entry in sorted(os.scandir(root), key=lambda e: e.name):
+            if not entry.is_file(follow_symlinks=False) or entry.name.startswith("."):
+                continue
+            stats["files"] += 1
+
+            rows = rows_by_path.get(os.path.realpath(entry.path), [])
+            if not rows:
+                stats["orphans"] += 1
+                logger.warning(f"No upload refers to {entry.name}")
+                if not delete_orphans:
+                    continue
+                if not dry_run:
+                    os.remove(entry.path)
+                continue
+
+            content_hash = file_sha256(entry.path)
+            location = store.path_for(content_hash)
+            blob = db.get(Blob, content_hash)
+            exists = os.path.exists(location)
+            logger.info(
+                f"{entry.name} -> {os.path.relpath(location, root)}{' (duplicate)' if exists else ''}"
+            )
+            if dry_run:
+                continue
+
+            # Link, commit, then unlink: a run interrupted at any point leaves
+            # every row pointing at a file that exists
+            if exists:
+                stats["deduplicated"] += 1
+            else:
+                os.makedirs(os.path.dirname(location), exist_ok=True)
+                os.link(entry.path, location)
+                stats["moved"] += 1
+
+            if blob is None:
+                blob = Blob(
+                    content_hash=content_hash,
+                    size=os.path.getsize(location),
+                    ref_count=0,
+                    created_at=datetime.utcnow(),
+                )
+                db.add(blob)
+                # Previews are per blob, like in the upload path
+                enqueue(db, rows[0].id, rows[0].user_id, kind="preview")
+                stats["previews"] += 1
+            blob.ref_count += len(rows)
+            for upload in rows:
+                upload.file_path = location
+                upload.content_hash = content_hash
+            stats["rows_updated"] += len(rows)
+            db.commit()
+
+            os.remove(entry.path)
+        return stats
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate flat uploads into the sharded blob store")
+    parser.add_argument("--root", default=UPLOAD_FOLDER, help="Upload folder to migrate")
+    parser.add_argument("--dry-run", action="store_true", help="Only print what would be done")
+    parser.add_argument("--delete-orphans", action="store_true", help="Delete files no upload refers to")
+    args = parser.parse_args()
+
+    stats = migrate(args.root, dry_run=args.dry_run, delete_orphans=args.delete_orphans)
+    logger.info(
+        f"{stats['files']} files: {stats['moved']} moved, {stats['deduplicated']} deduplicated, "
+        f"{stats['orphans']} orphaned; {stats['rows_updated']} upload rows updated, "
+        f"{stats['previews']} preview jobs queued"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+import math
+import os
+import shutil
+import threading
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+from dotenv import load_dotenv
+from fastapi.staticfiles import StaticFiles
+
+from app.uploads.storage import UPLOAD_FOLDER
+from app.uploads.utils import SIGNATURE_BYTES, sniff_image_type
+
+load_dotenv()
+
+# ---------------------------------------
+# Preview configuration
+# ---------------------------------------
+PREVIEW_FOLDER = os.getenv("PREVIEW_FOLDER", os.path.join(UPLOAD_FOLDER, ".previews"))
+THUMBNAIL_SIZE = int(os.getenv("THUMBNAIL_SIZE", "256"))  # Longest side, pixels
+TILE_SIZE = int(os.getenv("TILE_SIZE", "254"))  # 254 + 2 * overlap = 256 pixel tiles
+TILE_OVERLAP = 1
+TILE_QUALITY = int(os.getenv("TILE_QUALITY", "85"))  # JPEG quality of tiles and thumbnail
+PREVIEW_URL_PREFIX = "/previews"
+
+# libjpeg can decode straight to 1/2, 1/4 or 1/8 scale by dropping DCT
+# coefficients, which is several times faster than decoding and resizing
+_REDUCED_FLAGS = {
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+def preview_dir(content_hash: str, root: str = PREVIEW_FOLDER) -> str:
+    return os.path.join(root, content_hash[:2], content_hash)
+
+
+def preview_urls(content_hash: Optional[str]) -> Dict[str, Optional[str]]:
+    """Where the thumbnail and Deep Zoom descriptor of an upload are served.
+
+    The URLs are fixed by the content hash; they answer 404 until the
+    preview job for the image has run.
+    """
+    if not content_hash:
+        return {"thumbnail_url": None, "dzi_url": None}
+    base = f"{PREVIEW_URL_PREFIX}/{content_hash[:2]}/{content_hash}"
+    return {"thumbnail_url": f"{base}/thumb.jpg", "dzi_url": f"{base}/pyramid.dzi"}
+
+
+def _decode(path: str, factor: int = 1) -> np.ndarray:
+    flag = _REDUCED_FLAGS.get(factor, cv2.IMREAD_COLOR)
+    image = cv2.imread(path, flag)
+    if image is None:
+        raise ValueError(f"Could not decode image: {path}")
+    return image
+
+
+def _write_jpeg(path: str, image: np.ndarray) -> None:
+    ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, TILE_QUALITY])
+    if not ok:
+        raise ValueError(f"Could not encode {path}")
+    with open(path, "wb") as f:
+        f.write(encoded.tobytes())
+
+
+def _write_tiles(level_dir: str, image: np.ndarray) -> int:
+    os.makedirs(level_dir)
+    height, width = image.shape[:2]
+    count = 0
+    for row in range(math.ceil(height / TILE_SIZE)):
+        top = max(0, row * TILE_SIZE - TILE_OVERLAP)
+        bottom = min(height, (row + 1) * TILE_SIZE + TILE_OVERLAP)
+        for col in range(math.ceil(width / TILE_SIZE)):
+            left = max(0, col * TILE_SIZE - TILE_OVERLAP)
+            right = min(width, (col + 1) * TILE_SIZE + TILE_OVERLAP)
+            _write_jpeg(os.path.join(level_dir, f"{col}_{row}.jpg"), image[top:bottom, left:right])
+            count += 1
+    return count
+
+
+def _dzi(width: int, height: int) -> str:
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" '
+        f'Format="jpg" Overlap="{TILE_OVERLAP}" TileSize="{TILE_SIZE}">\n'
+        f'  <Size Width="{width}" Height="{height}"/>\n'
+        "</Image>\n"
+    )
+
+
+def _publish_file(path: str, write) -> None:
+    partial = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    write(partial)
+    os.replace(partial, path)
+
+
+def build_thumbnail(path: str, destination: str, is_jpeg: bool) -> None:
+    """Write ``thumb.jpg`` from the cheapest decode that still covers it.
+
+    For a JPEG that is a libjpeg reduced-resolution decode at the largest
+    of 1/8, 1/4 or 1/2 that keeps the longest side above
+    ``THUMBNAIL_SIZE``, so a 4K smear is never decoded at full size here.
+    """
+    image = None
+    for factor in ((8, 4, 2) if is_jpeg else ()):
+        candidate = _decode(path, factor)
+        if max(candidate.shape[:2]) >= THUMBNAIL_SIZE:
+            image = candidate
+            break
+    if image is None:
+        image = _decode(path)
+
+    height, width = image.shape[:2]
+    ratio = min(1.0, THUMBNAIL_SIZE / max(width, height))
+    size = (max(1, round(width * ratio)), max(1, round(height * ratio)))
+    thumbnail = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+    _publish_file(destination, lambda target: _write_jpeg(target, thumbnail))
+
+
+def build_pyramid(path: str, directory: str) -> Dict[str, int]:
+    """Write ``pyramid_files/<level>/<col>_<row>.jpg`` and ``pyramid.dzi``.
+
+    Level 0 is 1x1 and the top level is full size. The image is decoded
+    once; each lower level is an area-average halving of the one above,
+    so only one level is held in memory at a time.
+    """
+    image = _decode(path)
+    height, width = image.shape[:2]
+    top_level = math.ceil(math.log2(max(width, height, 1)))
+
+    staging = os.path.join(directory, f"pyramid_files.tmp-{os.getpid()}-{threading.get_ident()}")
+    shutil.rmtree(staging, ignore_errors=True)
+    try:
+        tiles = 0
+        for level in range(top_level, -1, -1):
+            scale = 2 ** (top_level - level)
+            size = (max(1, math.ceil(width / scale)), max(1, math.ceil(height / scale)))
+            if image.shape[1::-1] != size:
+                image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+            tiles += _write_tiles(os.path.join(staging, str(level)), image)
+
+        try:
+            os.rename(staging, os.path.join(directory, "pyramid_files"))
+        except OSError:
+            # Another worker published the same image first
+            shutil.rmtree(staging, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    # Written last: its presence marks a complete pyramid
+    def write_dzi(target: str) -> None:
+        with open(target, "w") as f:
+            f.write(_dzi(width, height))
+
+    _publish_file(os.path.join(directory, "pyramid.dzi"), write_dzi)
+    return {"width": width, "height": height, "levels": top_level + 1, "tiles": tiles}
+
+
+def build_previews(path: str, content_hash: str, root: str = PREVIEW_FOLDER) -> Dict[str, int]:
+    """Build the thumbnail, then the Deep Zoom pyramid, of a stored image.
+
+    The thumbnail is published first, so history views can show it
+    before the pyramid is finished. Parts that already exist are skipped,
+    which makes a retried or duplicate job cheap.
+
+    Args:
+        path: The stored blob
+        content_hash: Its SHA-256, which keys the output directory
+        root: Preview root directory
+
+    Returns:
+        dict: Image size, pyramid levels and tiles written (empty if the
+            pyramid already existed)
+    """
+    directory = preview_dir(content_hash, root)
+    os.makedirs(directory, exist_ok=True)
+    with open(path, "rb") as f:
+        is_jpeg = sniff_image_type(f.read(SIGNATURE_BYTES)) == "jpeg"
+
+    thumbnail = os.path.join(directory, "thumb.jpg")
+    if not os.path.exists(thumbnail):
+        build_thumbnail(path, thumbnail, is_jpeg)
+    if os.path.exists(os.path.join(directory, "pyramid.dzi")):
+        return {}
+    return build_pyramid(path, directory)
+
+
+class PreviewFiles(StaticFiles):
+    """StaticFiles (ETag, If-None-Match, Range) with long-lived caching.
+
+    Preview paths are keyed by content hash, so a URL never changes what
+    it serves and browsers may keep tiles indefinitely.
+    """
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
+
+os.makedirs(PREVIEW_FOLDER, exist_ok=True)
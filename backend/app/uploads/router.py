@@ -1,73 +1,145 @@
-import os
-import shutil
 from datetime import datetime
+from typing import List, Optional, Tuple
 
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
-from jose import JWTError, jwt
-from fastapi.security import OAuth2PasswordBearer
-from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
 
+from app.auth import get_current_user
 from app.database import get_db
-from app.models import Upload, User
-
-load_dotenv()
+from app.models import Job, Upload
+from app.principals import Principal
+from app.jobs.queue import enqueue, enqueue_many, to_response as job_response
+from app.uploads.history import (
+    HISTORY_MAX_PAGE_SIZE,
+    HISTORY_PAGE_SIZE,
+    increment_upload_count,
+    list_uploads,
+    upload_count,
+)
+from app.uploads.previews import preview_urls
+from app.uploads.service import IngestedFile, ingest_batch, ingest_upload
+from app.uploads.storage import INCOMING_FOLDER, blob_store
 
 router = APIRouter()
+# Mounted at /uploads: the collection, as opposed to POST /upload
+history_router = APIRouter()
+
 
-# Constants
-UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), "files")
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+def _record_upload(db: Session, ingested: IngestedFile, user_id: int) -> Tuple[Upload, Job]:
+    """Blocking part of an upload: store the blob, record it and queue its analysis."""
+    created = blob_store.acquire(
+        db, ingested.content_hash, ingested.size, ingested.temp_path
+    )
+    ingested.committed = True  # The store has moved or deleted the temp file
+
+    upload_record = Upload(
+        filename=ingested.filename,
+        file_path=blob_store.path_for(ingested.content_hash),
+        content_hash=ingested.content_hash,
+        user_id=user_id,
+        upload_time=datetime.utcnow(),
+    )
+    db.add(upload_record)
+    try:
+        db.flush()  # Assigns the id the job refers to
+        increment_upload_count(db, user_id)
+        job = enqueue(db, upload_record.id, user_id)
+        if created:
+            # Previews are per blob; a re-upload reuses the existing ones
+            enqueue(db, upload_record.id, user_id, kind="preview")
+        db.commit()
+    except Exception:
+        db.rollback()
+        if created:
+            blob_store.discard_new(db, ingested.content_hash)
+        raise
+    db.refresh(upload_record)
+    db.refresh(job)
+    return upload_record, job
 
-SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = "HS256"
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
+def _record_batch(db: Session, files: List[IngestedFile], user_id: int) -> List[dict]:
+    """Store a batch of blobs and record them with one bulk insert per table."""
+    created = blob_store.acquire_many(
+        db, [(f.content_hash, f.size, f.temp_path) for f in files]
+    )
+    for ingested in files:
+        ingested.committed = True  # The store has moved or deleted the temp files
 
-# 🔒 Decode token and get current user
-def get_current_user(
-    token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
-) -> User:
+    now = datetime.utcnow()
+    rows = [
+        {
+            "filename": f.filename,
+            "file_path": blob_store.path_for(f.content_hash),
+            "content_hash": f.content_hash,
+            "user_id": user_id,
+            "upload_time": now,
+        }
+        for f in files
+    ]
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise HTTPException(status_code=401, detail="Invalid authentication token")
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid token or expired token")
+        statement = insert(Upload).returning(Upload.id, sort_by_parameter_order=True)
+        upload_ids = list(db.scalars(statement, rows))
+        increment_upload_count(db, user_id, len(upload_ids))
+        job_ids = enqueue_many(db, upload_ids, user_id)
+        first_of_blob = {}
+        for upload_id, f in zip(upload_ids, files):
+            if f.content_hash in created:
+                first_of_blob.setdefault(f.content_hash, upload_id)
+        enqueue_many(db, list(first_of_blob.values()), user_id, kind="preview")
+        db.commit()
+    except Exception:
+        db.rollback()
+        for content_hash in created:
+            blob_store.discard_new(db, content_hash)
+        raise
+
+    return [
+        {"upload_id": upload_id, "job_id": job_id, "filename": f.filename, **preview_urls(f.content_hash)}
+        for upload_id, job_id, f in zip(upload_ids, job_ids, files)
+    ]
 
-    user = db.query(User).filter(User.email == email).first()
-    if user is None:
-        raise HTTPException(status_code=404, detail="User not found")
-    return user
+
+# The body is parsed by ingest_upload, so describe the form for the docs here
+UPLOAD_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                    "required": ["file"],
+                }
+            }
+        },
+    }
+}
 
 
 # Accept both /upload and /upload/ without redirecting
-@router.post("", include_in_schema=True)
+@router.post("", include_in_schema=True, openapi_extra=UPLOAD_REQUEST_BODY)
 @router.post("/", include_in_schema=False)
 async def upload_file(
-    file: UploadFile = File(...),
+    request: Request,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
-    filename = file.filename
-    file_location = os.path.join(UPLOAD_FOLDER, filename)
+    # Stream the body to a temp file, hashing and size-checking as it arrives
+    ingested = await ingest_upload(request, INCOMING_FOLDER)
 
     try:
-        # Save file
-        with open(file_location, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-
-        # Record in database
-        upload_record = Upload(
-            filename=filename,
-            file_path=file_location,
-            user_id=current_user.id,
-            upload_time=datetime.utcnow(),
+        # Store the blob by content hash and record it off the event loop
+        upload_record, job = await run_in_threadpool(
+            _record_upload, db, ingested, current_user.id
         )
-        db.add(upload_record)
-        db.commit()
-        db.refresh(upload_record)
+
+        # Analysis runs in a job worker; poll GET /jobs/{id} for the result
+        runner = getattr(request.app.state, "job_runner", None)
+        if runner is not None:
+            runner.notify()
 
         return {
             "status": "success",
@@ -78,8 +150,92 @@ async def upload_file(
                 "path": upload_record.file_path,
                 "user_id": upload_record.user_id,
                 "upload_time": upload_record.upload_time,
+                **preview_urls(upload_record.content_hash),
             },
+            "job": job_response(job),
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
+        ingested.discard()
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+
+
+BATCH_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {
+                        "files": {
+                            "type": "array",
+                            "items": {"type": "string", "format": "binary"},
+                            "description": "Images and/or ZIP archives of images",
+                        }
+                    },
+                    "required": ["files"],
+                }
+            }
+        },
+    }
+}
+
+
+@router.post("/batch", openapi_extra=BATCH_REQUEST_BODY)
+async def upload_batch(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    """Upload many smears in one request, as separate files or ZIP archives.
+
+    Authenticates once, streams every image (extracting archives on the
+    fly), records all uploads and their analysis jobs in one transaction
+    and returns the job ids to poll.
+    """
+    files, skipped = await ingest_batch(request, INCOMING_FOLDER)
+
+    try:
+        uploads = await run_in_threadpool(_record_batch, db, files, current_user.id) if files else []
+    except Exception as e:
+        for ingested in files:
+            ingested.discard()
+        raise HTTPException(status_code=500, detail=f"Batch upload failed: {str(e)}")
+
+    runner = getattr(request.app.state, "job_runner", None)
+    if runner is not None and uploads:
+        runner.notify()
+
+    return {
+        "status": "success",
+        "message": f"{len(uploads)} files saved and queued for analysis",
+        "count": len(uploads),
+        "uploads": uploads,
+        "skipped": skipped,
+    }
+
+
+@history_router.get("")
+def read_uploads(
+    response: Response,
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=HISTORY_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    """The current user's uploads, newest first, a page at a time.
+
+    Pass the returned ``next_cursor`` back as ``cursor`` for the following
+    page; it is null on the last one. ``X-Total-Count`` carries the
+    user's total number of uploads.
+    """
+    try:
+        items, next_cursor = list_uploads(db, current_user.id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    response.headers["X-Total-Count"] = str(upload_count(db, current_user.id))
+    return {"items": items, "next_cursor": next_cursor}
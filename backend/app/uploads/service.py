@@ -1 +1,546 @@
-# Add shared business logic here (optional)
\ No newline at end of file
+# Shared business logic for uploads
+import hashlib
+import os
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+
+try:
+    from python_multipart.exceptions import ParseError
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ModuleNotFoundError:  # python-multipart < 0.0.13
+    from multipart.exceptions import ParseError
+    from multipart.multipart import MultipartParser, parse_options_header
+
+from app.metrics import registry
+from app.uploads.archive import ZIP_SIGNATURE, ZipStreamError, ZipStreamReader
+from app.uploads.utils import SIGNATURE_BYTES, sniff_image_type
+
+load_dotenv()
+
+# ---------------------------------------
+# Ingestion limits
+# ---------------------------------------
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(200 * 1024 * 1024)))
+WRITE_CHUNK_SIZE = 1024 * 1024  # Bytes buffered before each disk write
+MULTIPART_OVERHEAD = 64 * 1024  # Allowance for boundaries and part headers
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "1000"))  # Images per batch request
+BATCH_MAX_BYTES = int(os.getenv("BATCH_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))  # Extracted total
+
+# Counted as chunks arrive, so rate() shows ingest throughput during long uploads
+upload_bytes = registry.counter("upload_bytes_total", "Request body bytes received by the upload routes", ("route",))
+
+
+class IngestedFile:
+    """A fully received, validated upload waiting in a temporary file.
+
+    Attributes:
+        filename (str): Client-supplied file name (base name only)
+        content_type (str): Client-supplied MIME type
+        image_type (str): Format detected from the file signature
+        size (int): Bytes received
+        content_hash (str): Hex SHA-256 of the contents
+        temp_path (str): Where the bytes currently live
+    """
+
+    def __init__(self, filename, content_type, image_type, size, content_hash, temp_path):
+        self.filename = filename
+        self.content_type = content_type
+        self.image_type = image_type
+        self.size = size
+        self.content_hash = content_hash
+        self.temp_path = temp_path
+        self.committed = False
+
+    def discard(self) -> None:
+        """Delete the temporary file if it was never handed to the blob store."""
+        if self.committed:
+            return
+        try:
+            os.remove(self.temp_path)
+        except FileNotFoundError:
+            pass
+
+
+class _FilePartSink:
+    """Multipart parser callbacks that keep only the wanted file field."""
+
+    def __init__(self, boundary: bytes, field: str, max_bytes: int):
+        self.field = field
+        self.max_bytes = max_bytes
+        self.parser = MultipartParser(
+            boundary,
+            callbacks={
+                "on_part_begin": self._on_part_begin,
+                "on_header_field": self._on_header_field,
+                "on_header_value": self._on_header_value,
+                "on_header_end": self._on_header_end,
+                "on_headers_finished": self._on_headers_finished,
+                "on_part_data": self._on_part_data,
+                "on_part_end": self._on_part_end,
+            },
+        )
+        self.filename: Optional[str] = None
+        self.content_type = "application/octet-stream"
+        self.image_type: Optional[str] = None
+        self.size = 0
+        self.pending = bytearray()  # Received but not yet written
+        self.done = False
+        self.error: Optional[HTTPException] = None
+
+        self._in_field = False
+        self._headers = {}
+        self._header_field = bytearray()
+        self._header_value = bytearray()
+        self._head = bytearray()
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[bytes(self._header_field).lower()] = bytes(self._header_value)
+        self._header_field.clear()
+        self._header_value.clear()
+
+    def _on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("latin-1")
+        self._in_field = not self.done and name == self.field and b"filename" in options
+        if self._in_field:
+            raw = options[b"filename"].decode("utf-8", "replace")
+            self.filename = os.path.basename(raw.replace("\\", "/")) or "upload"
+            if b"content-type" in self._headers:
+                self.content_type = self._headers[b"content-type"].decode("latin-1")
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if not self._in_field or self.error is not None:
+            return
+        self.size += end - start
+        if self.size > self.max_bytes:
+            self.error = HTTPException(
+                status_code=413, detail=f"File exceeds {self.max_bytes} bytes"
+            )
+            return
+        if self.image_type is None and len(self._head) < SIGNATURE_BYTES:
+            self._head += data[start : start + SIGNATURE_BYTES - len(self._head)]
+            if len(self._head) >= SIGNATURE_BYTES:
+                self._check_signature()
+        self.pending += data[start:end]
+
+    def _on_part_end(self) -> None:
+        if self._in_field:
+            self._in_field = False
+            self.done = True
+            if self.image_type is None and self.error is None:
+                self._check_signature()
+
+    def _check_signature(self) -> None:
+        self.image_type = sniff_image_type(bytes(self._head))
+        if self.image_type is None:
+            self.error = HTTPException(
+                status_code=415, detail="File is not a supported image (JPEG, PNG, TIFF, BMP)"
+            )
+
+
+def _feed(parser: MultipartParser, chunk: bytes) -> None:
+    """``parser.write``, reporting a malformed body as a 400 rather than a 500."""
+    try:
+        parser.write(chunk)
+    except ParseError as e:
+        raise HTTPException(status_code=400, detail=f"Malformed multipart body: {str(e)}")
+
+
+def _write(out, digest, data: bytes) -> None:
+    digest.update(data)
+    out.write(data)
+
+
+async def ingest_upload(
+    request: Request,
+    temp_dir: str,
+    field: str = "file",
+    max_bytes: int = MAX_UPLOAD_BYTES,
+) -> IngestedFile:
+    """Stream one file field of a multipart request body to a temporary file.
+
+    The body is consumed chunk by chunk as it arrives. Each chunk is
+    checked against the byte limit and (for the first bytes) the image
+    signature on the event loop, then hashed and written in the threadpool,
+    so a large upload never holds the loop or the whole file in memory.
+    A request that declares or reaches more than ``max_bytes`` is rejected
+    without reading the rest of it.
+
+    Args:
+        request: The incoming multipart/form-data request
+        temp_dir: Directory for the partial file; must be on the same
+            filesystem as the blob store so moving it there is atomic
+        field: Form field that carries the file
+        max_bytes: Largest accepted file size
+
+    Returns:
+        IngestedFile: The received file, still in ``temp_dir``
+
+    Raises:
+        HTTPException: 400 for a malformed body or missing field, 413 when
+            too large, 415 when the bytes are not a supported image
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in options:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data body")
+
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > max_bytes + MULTIPART_OVERHEAD:
+        raise HTTPException(status_code=413, detail=f"File exceeds {max_bytes} bytes")
+
+    sink = _FilePartSink(options[b"boundary"], field, max_bytes)
+    digest = hashlib.sha256()
+    fd, temp_path = tempfile.mkstemp(dir=temp_dir, suffix=".part")
+    out = os.fdopen(fd, "wb")
+    try:
+        async for chunk in request.stream():
+            upload_bytes.inc(len(chunk), ("file",))
+            _feed(sink.parser, chunk)
+            if sink.error is not None:
+                raise sink.error
+            if len(sink.pending) >= WRITE_CHUNK_SIZE:
+                data = bytes(sink.pending)
+                sink.pending.clear()
+                await run_in_threadpool(_write, out, digest, data)
+        sink.parser.finalize()
+        if sink.error is not None:
+            raise sink.error
+        if not sink.done:
+            raise HTTPException(status_code=400, detail=f"Missing file field '{field}'")
+
+        await run_in_threadpool(_write, out, digest, bytes(sink.pending))
+        await run_in_threadpool(out.close)
+    except BaseException:
+        out.close()
+        os.remove(temp_path)
+        raise
+
+    return IngestedFile(
+        filename=sink.filename,
+        content_type=sink.content_type,
+        image_type=sink.image_type,
+        size=sink.size,
+        content_hash=digest.hexdigest(),
+        temp_path=temp_path,
+    )
+
+
+class _Rejected(Exception):
+    """One file in a batch is unusable; the rest of the batch goes on."""
+
+
+class _TempImageWriter:
+    """Receives one image of a batch into a temporary file, hashing as it goes."""
+
+    def __init__(self, filename: str, content_type: str, temp_dir: str, max_bytes: int):
+        self.filename = os.path.basename(filename.replace("\\", "/")) or "upload"
+        self.content_type = content_type
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.image_type: Optional[str] = None
+        self.digest = hashlib.sha256()
+        self._head = bytearray()
+        fd, self.temp_path = tempfile.mkstemp(dir=temp_dir, suffix=".part")
+        self._out = os.fdopen(fd, "wb")
+
+    def write(self, data: bytes) -> None:
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise _Rejected(f"File exceeds {self.max_bytes} bytes")
+        if self.image_type is None:
+            self._head += data[: SIGNATURE_BYTES - len(self._head)]
+            if len(self._head) >= SIGNATURE_BYTES:
+                self._sniff()
+        self.digest.update(data)
+        self._out.write(data)
+
+    def _sniff(self) -> None:
+        self.image_type = sniff_image_type(bytes(self._head))
+        if self.image_type is None:
+            raise _Rejected("Not a supported image (JPEG, PNG, TIFF, BMP)")
+
+    def close(self) -> IngestedFile:
+        self._out.close()
+        if self.image_type is None:
+            self._sniff()
+        return IngestedFile(
+            filename=self.filename,
+            content_type=self.content_type,
+            image_type=self.image_type,
+            size=self.size,
+            content_hash=self.digest.hexdigest(),
+            temp_path=self.temp_path,
+        )
+
+    def abort(self) -> None:
+        self._out.close()
+        try:
+            os.remove(self.temp_path)
+        except FileNotFoundError:
+            pass
+
+
+class _BatchPartSink:
+    """Multipart parser callbacks that queue file parts as events.
+
+    The parser runs on the event loop; the queued ``(kind, ...)`` events
+    are applied by ``_BatchWriter`` in the threadpool.
+    """
+
+    def __init__(self, boundary: bytes, fields: Tuple[str, ...]):
+        self.fields = fields
+        self.parser = MultipartParser(
+            boundary,
+            callbacks={
+                "on_part_begin": self._on_part_begin,
+                "on_header_field": self._on_header_field,
+                "on_header_value": self._on_header_value,
+                "on_header_end": self._on_header_end,
+                "on_headers_finished": self._on_headers_finished,
+                "on_part_data": self._on_part_data,
+                "on_part_end": self._on_part_end,
+            },
+        )
+        self.events: List[tuple] = []
+        self.pending_bytes = 0
+
+        self._in_field = False
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_field = bytearray()
+        self._header_value = bytearray()
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[bytes(self._header_field).lower()] = bytes(self._header_value)
+        self._header_field.clear()
+        self._header_value.clear()
+
+    def _on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("latin-1")
+        self._in_field = name in self.fields and b"filename" in options
+        if self._in_field:
+            filename = options[b"filename"].decode("utf-8", "replace")
+            content_type = self._headers.get(b"content-type", b"application/octet-stream").decode("latin-1")
+            self.events.append(("begin", filename, content_type))
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._in_field:
+            self.events.append(("data", data[start:end]))
+            self.pending_bytes += end - start
+
+    def _on_part_end(self) -> None:
+        if self._in_field:
+            self._in_field = False
+            self.events.append(("end",))
+
+    def take(self) -> List[tuple]:
+        events, self.events = self.events, []
+        self.pending_bytes = 0
+        return events
+
+
+class _BatchWriter:
+    """Applies multipart events: images go to temp files, ZIPs are extracted.
+
+    A part is treated as a ZIP archive when its first bytes are a ZIP local
+    header, whatever its name says; each image inside becomes its own
+    file. Unusable files are skipped and reported, not fatal.
+    """
+
+    def __init__(self, temp_dir: str, max_files: int, max_file_bytes: int, max_total_bytes: int):
+        self.temp_dir = temp_dir
+        self.max_files = max_files
+        self.max_file_bytes = max_file_bytes
+        self.max_total_bytes = max_total_bytes
+        self.files: List[IngestedFile] = []
+        self.skipped: List[Dict[str, str]] = []
+        self.total_bytes = 0
+
+        self._part: Optional[Tuple[str, str]] = None  # (filename, content_type)
+        self._head = bytearray()  # First bytes of the part, until its kind is known
+        self._image: Optional[_TempImageWriter] = None
+        self._archive: Optional[ZipStreamReader] = None
+        self._archive_name = ""
+        self._skipping = False
+
+    def apply(self, events: List[tuple]) -> None:
+        for event in events:
+            if event[0] == "begin":
+                self._part = (event[1], event[2])
+                self._head.clear()
+            elif event[0] == "data":
+                self._on_data(event[1])
+            else:
+                self._on_end()
+
+    def cleanup(self) -> None:
+        """Delete every temp file written so far (the batch failed)."""
+        if self._image is not None:
+            self._image.abort()
+            self._image = None
+        for ingested in self.files:
+            ingested.discard()
+
+    def _on_data(self, data: bytes) -> None:
+        if self._part is not None:
+            # Wait for enough bytes to tell an archive from an image
+            self._head += data
+            if len(self._head) < max(len(ZIP_SIGNATURE), SIGNATURE_BYTES):
+                return
+            data = bytes(self._head)
+            self._start_part()
+        if self._archive is not None:
+            try:
+                self._archive.feed(data)
+            except ZipStreamError as e:
+                raise HTTPException(status_code=400, detail=f"{self._archive_name}: {str(e)}")
+        else:
+            self._write_image(data)
+
+    def _on_end(self) -> None:
+        if self._part is not None:
+            # Short part; nothing was routed yet
+            head = bytes(self._head)
+            self._start_part()
+            if head:
+                self._on_data(head)
+        if self._archive is not None:
+            try:
+                self._archive.finish()
+            except ZipStreamError as e:
+                raise HTTPException(status_code=400, detail=f"{self._archive_name}: {str(e)}")
+            self._archive = None
+        else:
+            self._close_image()
+
+    def _start_part(self) -> None:
+        filename, content_type = self._part
+        self._part = None
+        if self._head.startswith(ZIP_SIGNATURE):
+            self._archive_name = filename
+            self._archive = ZipStreamReader(self._open_member)
+        else:
+            self._open_image(filename, content_type)
+
+    def _open_member(self, name: str) -> Optional["_BatchWriter"]:
+        base = os.path.basename(name)
+        if name.startswith("__MACOSX/") or base.startswith("."):
+            return None  # Finder metadata
+        self._open_image(name, "application/octet-stream")
+        return self
+
+    # ZipStreamReader member target protocol
+    def write(self, data: bytes) -> None:
+        self._write_image(data)
+
+    def close(self) -> None:
+        self._close_image()
+
+    def _open_image(self, filename: str, content_type: str) -> None:
+        if len(self.files) >= self.max_files:
+            raise HTTPException(status_code=413, detail=f"Batch exceeds {self.max_files} files")
+        self._image = _TempImageWriter(filename, content_type, self.temp_dir, self.max_file_bytes)
+        self._skipping = False
+
+    def _write_image(self, data: bytes) -> None:
+        if self._skipping or self._image is None:
+            return
+        self.total_bytes += len(data)
+        if self.total_bytes > self.max_total_bytes:
+            raise HTTPException(status_code=413, detail=f"Batch exceeds {self.max_total_bytes} bytes")
+        try:
+            self._image.write(data)
+        except _Rejected as e:
+            self._skip(str(e))
+
+    def _close_image(self) -> None:
+        if self._skipping or self._image is None:
+            self._image = None
+            return
+        try:
+            self.files.append(self._image.close())
+        except _Rejected as e:
+            self._skip(str(e))
+        self._image = None
+
+    def _skip(self, reason: str) -> None:
+        self.skipped.append({"filename": self._image.filename, "reason": reason})
+        self.total_bytes -= self._image.size
+        self._image.abort()
+        self._skipping = True
+
+
+async def ingest_batch(
+    request: Request,
+    temp_dir: str,
+    fields: Tuple[str, ...] = ("files", "file"),
+    max_files: int = BATCH_MAX_FILES,
+    max_file_bytes: int = MAX_UPLOAD_BYTES,
+    max_total_bytes: int = BATCH_MAX_BYTES,
+) -> Tuple[List[IngestedFile], List[Dict[str, str]]]:
+    """Stream every file part of a multipart request to temporary files.
+
+    Parts may be images or ZIP archives of images. Archives are extracted
+    member by member as their bytes arrive, so neither the request nor an
+    archive is ever held whole in memory or on disk. Parsing runs on the
+    event loop; writes, hashing and inflation run in the threadpool once
+    ``WRITE_CHUNK_SIZE`` bytes are queued.
+
+    Args:
+        request: The incoming multipart/form-data request
+        temp_dir: Directory for the partial files (same filesystem as the blob store)
+        fields: Form fields that carry files
+        max_files: Most images accepted, counting archive members
+        max_file_bytes: Largest accepted single image
+        max_total_bytes: Largest accepted total of image bytes after extraction
+
+    Returns:
+        tuple: (received files, ``{"filename", "reason"}`` for each skipped file)
+
+    Raises:
+        HTTPException: 400 for a malformed body or archive, 413 when the
+            batch is over its file or byte limit
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in options:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data body")
+
+    sink = _BatchPartSink(options[b"boundary"], fields)
+    writer = _BatchWriter(temp_dir, max_files, max_file_bytes, max_total_bytes)
+    try:
+        async for chunk in request.stream():
+            upload_bytes.inc(len(chunk), ("batch",))
+            _feed(sink.parser, chunk)
+            if sink.pending_bytes >= WRITE_CHUNK_SIZE:
+                await run_in_threadpool(writer.apply, sink.take())
+        sink.parser.finalize()
+        await run_in_threadpool(writer.apply, sink.take())
+    except BaseException:
+        writer.cleanup()
+        raise
+
+    if not writer.files and not writer.skipped:
+        raise HTTPException(status_code=400, detail=f"No files in field '{fields[0]}'")
+    return writer.files, writer.skipped
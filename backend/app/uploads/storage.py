@@ -0,0 +1,189 @@
+import os
+from collections import Counter
+from datetime import datetime
+from typing import Iterable, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import Blob
+
+load_dotenv()
+
+# ---------------------------------------
+# Storage configuration
+# ---------------------------------------
+UPLOAD_FOLDER = os.getenv(
+    "UPLOAD_FOLDER", os.path.join(os.path.dirname(__file__), "files")
+)
+INCOMING_FOLDER = os.path.join(UPLOAD_FOLDER, ".incoming")  # Partial uploads
+SHARD_DEPTH = 2  # Directory levels, two hex characters each
+
+
+class BlobStore:
+    """Content-addressed file store with reference-counted blobs.
+
+    A blob lives at ``<root>/ab/cd/abcdef…`` where ``abcdef…`` is the
+    SHA-256 of its contents, so every directory holds at most 256 entries
+    no matter how many images are stored, and two uploads with the same
+    bytes share one file. The ``blobs`` table counts how many uploads
+    reference each blob; the file is deleted when that count drops to
+    zero. Original file names are kept on the ``Upload`` rows only.
+
+    Attributes:
+        root (str): Directory the shards are created under
+    """
+
+    def __init__(self, root: str = UPLOAD_FOLDER):
+        self.root = root
+
+    def path_for(self, content_hash: str) -> str:
+        """Location of the blob with this hash (whether or not it exists)."""
+        shards = [content_hash[2 * i : 2 * i + 2] for i in range(SHARD_DEPTH)]
+        return os.path.join(self.root, *shards, content_hash)
+
+    def _increment(self, db: Session, content_hash: str, count: int = 1) -> bool:
+        updated = (
+            db.query(Blob)
+            .filter(Blob.content_hash == content_hash)
+            .update({Blob.ref_count: Blob.ref_count + count}, synchronize_session=False)
+        )
+        return updated > 0
+
+    def acquire(self, db: Session, content_hash: str, size: int, source: str) -> bool:
+        """Add a reference to a blob, moving ``source`` into place if it is new.
+
+        When the blob already exists ``source`` is deleted instead. The
+        reference is added in the session's transaction; the caller commits
+        it together with the row that holds the reference, and must call
+        this before adding that row (a lost insert race rolls the session
+        back).
+
+        Args:
+            db: Database session
+            content_hash: Hex SHA-256 of the file at ``source``
+            size: File size in bytes
+            source: File to store, on the same filesystem as ``root``
+
+        Returns:
+            bool: True if this call created the blob file
+        """
+        if self._increment(db, content_hash):
+            os.remove(source)
+            return False
+
+        # Identical bytes, so a concurrent writer replacing this file is harmless
+        location = self.path_for(content_hash)
+        os.makedirs(os.path.dirname(location), exist_ok=True)
+        os.replace(source, location)
+
+        db.add(Blob(content_hash=content_hash, size=size, ref_count=1, created_at=datetime.utcnow()))
+        try:
+            db.flush()
+        except IntegrityError:
+            # Another request registered the same blob first
+            db.rollback()
+            self._increment(db, content_hash)
+            return False
+        return True
+
+    def acquire_many(self, db: Session, files: Iterable[Tuple[str, int, str]]) -> Set[str]:
+        """``acquire`` for a whole batch in two statements instead of one per file.
+
+        Blobs already stored are found with one query; references for every
+        blob in the batch are then added with a single upsert (``INSERT ...
+        ON CONFLICT DO UPDATE``), which also settles races with concurrent
+        uploads of the same bytes. The caller commits.
+
+        Args:
+            db: Database session
+            files: ``(content_hash, size, source)`` for each file
+
+        Returns:
+            set: Hashes whose blob file this call moved into place
+        """
+        files = list(files)
+        references = Counter(content_hash for content_hash, _, _ in files)
+        existing = {
+            content_hash
+            for (content_hash,) in db.query(Blob.content_hash).filter(
+                Blob.content_hash.in_(list(references))
+            )
+        }
+
+        created = set()
+        rows = {}
+        for content_hash, size, source in files:
+            if content_hash in existing or content_hash in created:
+                os.remove(source)
+            else:
+                location = self.path_for(content_hash)
+                os.makedirs(os.path.dirname(location), exist_ok=True)
+                os.replace(source, location)
+                created.add(content_hash)
+            rows[content_hash] = {
+                "content_hash": content_hash,
+                "size": size,
+                "ref_count": references[content_hash],
+                "created_at": datetime.utcnow(),
+            }
+
+        dialect = db.get_bind().dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        else:
+            for row in rows.values():
+                if not self._increment(db, row["content_hash"], row["ref_count"]):
+                    db.add(Blob(**row))
+            db.flush()
+            return created
+
+        statement = upsert(Blob)
+        statement = statement.on_conflict_do_update(
+            index_elements=[Blob.content_hash],
+            set_={"ref_count": Blob.ref_count + statement.excluded.ref_count},
+        )
+        db.execute(statement, list(rows.values()))
+        return created
+
+    def release(self, db: Session, content_hash: str) -> None:
+        """Drop one reference, deleting the blob once nothing refers to it.
+
+        Commits the session.
+        """
+        blob: Optional[Blob] = (
+            db.query(Blob).filter(Blob.content_hash == content_hash).with_for_update().first()
+        )
+        if blob is None:
+            return
+        blob.ref_count -= 1
+        if blob.ref_count > 0:
+            db.commit()
+            return
+
+        db.delete(blob)
+        db.commit()
+        try:
+            os.remove(self.path_for(content_hash))
+        except FileNotFoundError:
+            pass
+
+    def discard_new(self, db: Session, content_hash: str) -> None:
+        """Remove a blob file whose creating transaction was rolled back.
+
+        Left alone if another request has since registered the same blob.
+        """
+        if db.query(Blob.content_hash).filter(Blob.content_hash == content_hash).first():
+            return
+        try:
+            os.remove(self.path_for(content_hash))
+        except FileNotFoundError:
+            pass
+
+
+# Process-wide store rooted at UPLOAD_FOLDER
+blob_store = BlobStore()
+os.makedirs(INCOMING_FOLDER, exist_ok=True)
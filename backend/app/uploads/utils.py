@@ -1 +1,27 @@
-# Add helper functions like validation here (optional)
\ No newline at end of file
+# Helper functions for validating uploads
+from typing import Optional
+
+# Leading bytes of the image formats smears are exported in
+IMAGE_SIGNATURES = {
+    b"\xff\xd8\xff": "jpeg",
+    b"\x89PNG\r\n\x1a\n": "png",
+    b"II*\x00": "tiff",
+    b"MM\x00*": "tiff",
+    b"BM": "bmp",
+}
+SIGNATURE_BYTES = max(len(signature) for signature in IMAGE_SIGNATURES)
+
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """Identify an image format from the first bytes of a file.
+
+    Args:
+        head: At least ``SIGNATURE_BYTES`` leading bytes (fewer if the file is shorter)
+
+    Returns:
+        str: Format name, or None if the bytes are not a supported image
+    """
+    for signature, kind in IMAGE_SIGNATURES.items():
+        if head.startswith(signature):
+            return kind
+    return None
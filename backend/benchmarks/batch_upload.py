@@ -0,0 +1,111 @@
+"""Throughput of POST /upload/batch against looping over POST /upload.
+
+Sends the same N images three ways against a running API: one /upload
+request per image (sequentially, on a keep-alive connection, like the
+frontend's uploadImage loop), one /upload/batch request carrying every
+image as a separate part, and one /upload/batch request carrying a ZIP
+archive of them. Reports images per second for each as JSON.
+
+Usage:
+    uvicorn app.main:app --port 8000
+    python benchmarks/batch_upload.py --token <access token> --images 500
+"""
+import argparse
+import io
+import json
+import os
+import time
+import zipfile
+
+import httpx
+
+JPEG_HEADER = b"\xff\xd8\xff\xe0"  # Passes the signature check; never decoded
+
+
+def make_images(count: int, size: int) -> list:
+    # Distinct contents so deduplication does not flatter the batch path
+    return [(f"smear-{i:04d}.jpg", JPEG_HEADER + os.urandom(size - len(JPEG_HEADER))) for i in range(count)]
+
+
+def make_zip(images: list) -> bytes:
+    buffer = io.BytesIO()
+    # JPEGs do not compress; store them like lab export tools do
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+        for name, data in images:
+            archive.writestr(f"run/{name}", data)
+    return buffer.getvalue()
+
+
+def timed(label: str, count: int, send) -> dict:
+    started = time.perf_counter()
+    statuses = send()
+    elapsed = time.perf_counter() - started
+    return {
+        "mode": label,
+        "images": count,
+        "requests": len(statuses),
+        "statuses": {str(s): statuses.count(s) for s in set(statuses)},
+        "seconds": round(elapsed, 3),
+        "images_per_second": round(count / elapsed, 1),
+    }
+
+
+def run(args) -> dict:
+    images = make_images(args.images, args.size_kb * 1024)
+    archive = make_zip(images)
+    headers = {"Authorization": f"Bearer {args.token}"}
+
+    with httpx.Client(base_url=args.url, headers=headers, timeout=None) as client:
+        loop = timed(
+            "loop /upload",
+            len(images),
+            lambda: [
+                client.post("/upload", files={"file": (name, data, "image/jpeg")}).status_code
+                for name, data in images
+            ],
+        )
+        multi = timed(
+            "/upload/batch files",
+            len(images),
+            lambda: [
+                client.post(
+                    "/upload/batch",
+                    files=[("files", (name, data, "image/jpeg")) for name, data in images],
+                ).status_code
+            ],
+        )
+        zipped = timed(
+            "/upload/batch zip",
+            len(images),
+            lambda: [
+                client.post(
+                    "/upload/batch", files={"files": ("run.zip", archive, "application/zip")}
+                ).status_code
+            ],
+        )
+
+    results = [loop, multi, zipped]
+    for result in results:
+        result["speedup_vs_loop"] = round(loop["seconds"] / result["seconds"], 1)
+    return {"label": args.label, "image_kb": args.size_kb, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--token", required=True, help="Bearer token for /upload")
+    parser.add_argument("--images", type=int, default=500)
+    parser.add_argument("--size-kb", type=int, default=64)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--output", default=None, help="Also write the JSON here")
+    args = parser.parse_args()
+
+    report = run(args)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
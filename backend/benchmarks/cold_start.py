@@ -0,0 +1,98 @@
+"""Cold-start time of one API replica, from process start to serving.
+
+Starts ``uvicorn app.main:app`` ``--repeats`` times and polls it every
+few milliseconds. Each start reports how long until the liveness path
+first answered (the process is taking connections) and until the
+readiness path first answered 200 (the model is warm and the database
+reachable). Also reports how long ``import app.main`` takes by itself.
+Prints medians and every run as JSON.
+
+Usage (from backend/, with the database and model the API would use):
+    python benchmarks/cold_start.py --label after
+
+Code without /healthz and /readyz can be measured with
+``--live-path /docs --ready-path /docs``.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+
+def probe(url: str) -> int:
+    """HTTP status of ``url``, or 0 if nothing answered."""
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return 0
+
+
+def import_seconds(module: str) -> float:
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True)
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def start_once(args) -> dict:
+    base = f"http://127.0.0.1:{args.port}"
+    command = [sys.executable, "-m", "uvicorn", args.app, "--port", str(args.port), "--log-level", "warning"]
+    started = time.perf_counter()
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    live = ready = None
+    try:
+        while time.perf_counter() - started < args.timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"Server exited with {process.returncode} while starting")
+            if live is None and probe(base + args.live_path):
+                live = time.perf_counter() - started
+            if live is not None and probe(base + args.ready_path) == 200:
+                ready = time.perf_counter() - started
+                break
+            time.sleep(args.interval)
+    finally:
+        process.terminate()
+        process.wait()
+    return {"live_s": round(live, 3) if live else None, "ready_s": round(ready, 3) if ready else None}
+
+
+def median(runs: list, key: str):
+    values = [run[key] for run in runs if run[key] is not None]
+    return round(statistics.median(values), 3) if values else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--app", default="app.main:app")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--live-path", default="/healthz")
+    parser.add_argument("--ready-path", default="/readyz")
+    parser.add_argument("--interval", type=float, default=0.01, help="Seconds between polls")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Give up on a start after this long")
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--output", default=None, help="Also write the JSON here")
+    args = parser.parse_args()
+
+    runs = [start_once(args) for _ in range(args.repeats)]
+    report = {
+        "label": args.label,
+        "import_s": round(import_seconds(args.app.split(":")[0]), 3),
+        "live_s": median(runs, "live_s"),
+        "ready_s": median(runs, "ready_s"),
+        "runs": runs,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
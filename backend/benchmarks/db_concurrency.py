@@ -0,0 +1,136 @@
+"""Authenticated request throughput of one API worker as concurrency grows.
+
+Uploads one tiny image to get a job, then has C concurrent clients poll
+``GET /jobs/{id}`` (token check, user lookup, job and analysis reads)
+for a fixed time, for each C in ``--concurrency``. Reports requests per
+second and latency percentiles as JSON.
+
+Usage:
+    uvicorn app.main:app --port 8000 --workers 1
+    python benchmarks/db_concurrency.py --token <access token> --label after
+
+Run it once against the old code and once against the new to compare.
+"""
+import argparse
+import asyncio
+import json
+import time
+from urllib.parse import urlsplit
+
+import httpx
+import numpy as np
+
+JPEG_HEADER = b"\xff\xd8\xff\xe0"  # Passes the signature check; never decoded
+
+
+class Connection:
+    """Minimal keep-alive HTTP/1.1 GET client.
+
+    Much cheaper per request than httpx, so on a small machine the load
+    generator does not become the bottleneck it is meant to measure.
+    """
+
+    def __init__(self, url: str, path: str, token: str):
+        parsed = urlsplit(url)
+        self.host, self.port = parsed.hostname, parsed.port or 80
+        self.request = (
+            f"GET {path} HTTP/1.1\r\nHost: {parsed.netloc}\r\n"
+            f"Authorization: Bearer {token}\r\n\r\n"
+        ).encode()
+        self.reader = self.writer = None
+
+    async def get(self) -> int:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write(self.request)
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        status = int(head.split(b" ", 2)[1])
+        length = 0
+        for line in head.split(b"\r\n"):
+            if line.lower().startswith(b"content-length:"):
+                length = int(line.split(b":", 1)[1])
+        await self.reader.readexactly(length)
+        return status
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+async def client_loop(connection: Connection, timeout: float, deadline: float, latencies: list, errors: list):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            status = await asyncio.wait_for(connection.get(), timeout)
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+            errors.append(type(e).__name__)
+            connection.close()
+            continue
+        if status != 200:
+            errors.append(status)
+            continue
+        latencies.append((time.perf_counter() - started) * 1000)
+
+
+async def measure(args, path: str, concurrency: int) -> dict:
+    connections = [Connection(args.url, path, args.token) for _ in range(concurrency)]
+    # Open the connections first so the window measures requests, not handshakes
+    await asyncio.gather(*[c.get() for c in connections], return_exceptions=True)
+
+    latencies, errors = [], []
+    started = time.perf_counter()
+    deadline = started + args.seconds
+    await asyncio.gather(
+        *[client_loop(c, args.timeout, deadline, latencies, errors) for c in connections]
+    )
+    elapsed = time.perf_counter() - started
+    for connection in connections:
+        connection.close()
+
+    result = {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": {str(e): errors.count(e) for e in set(errors)},
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+    }
+    if latencies:
+        for q in (50, 95, 99):
+            result[f"p{q}_ms"] = round(float(np.percentile(latencies, q)), 1)
+    return result
+
+
+async def run(args) -> dict:
+    headers = {"Authorization": f"Bearer {args.token}"}
+    async with httpx.AsyncClient(base_url=args.url, headers=headers, timeout=60) as client:
+        response = await client.post("/upload", files={"file": ("probe.jpg", JPEG_HEADER + b"\0" * 64, "image/jpeg")})
+        response.raise_for_status()
+        job_id = response.json()["job"]["job_id"]
+
+    path = f"/jobs/{job_id}"
+    results = []
+    for concurrency in args.concurrency:
+        results.append(await measure(args, path, concurrency))
+    return {"label": args.label, "endpoint": "GET /jobs/{id}", "seconds": args.seconds, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--token", required=True, help="Bearer token for the API")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50, 100, 200])
+    parser.add_argument("--seconds", type=float, default=10.0, help="Measurement window per level")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout; slower counts as an error")
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--output", default=None, help="Also write the JSON here")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
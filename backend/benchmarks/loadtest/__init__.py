@@ -0,0 +1,19 @@
+"""Load tests and regression checks for the whole API.
+
+Starts the app with uvicorn on a throwaway SQLite database (or the local
+Postgres from the PG* variables) and a stub or real model. Each scenario
+runs at several concurrency levels, and throughput and p50/p95/p99
+latency are written as JSON. ``compare`` checks a run against a stored
+baseline and exits non-zero when a scenario got slower than a threshold.
+
+Scenarios: register, login, upload_small, upload_large, batch_upload,
+analysis and history (see ``scenarios.py``).
+
+Usage (from backend/):
+
+    python -m benchmarks.loadtest run --output baseline.json
+    python -m benchmarks.loadtest run --baseline baseline.json --output run.json
+    python -m benchmarks.loadtest compare baseline.json run.json --threshold 0.35
+
+Runs are only comparable on the same machine, database and model.
+"""
@@ -0,0 +1,138 @@
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+
+from . import __doc__ as PACKAGE_DOC
+from .compare import DEFAULT_METRICS, compare, format_rows
+from .runner import run_suite
+from .scenarios import SCENARIOS
+from .server import BACKEND_DIR, LocalServer
+
+
+def git_commit() -> str:
+    try:
+        output = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True
+        )
+        return output.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def check(baseline: dict, report: dict, threshold: float, metrics) -> int:
+    rows, regressions = compare(baseline, report, threshold, metrics)
+    print(format_rows(rows))
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {threshold:.0%}", file=sys.stderr)
+        return 1
+    print(f"\nNo regressions beyond {threshold:.0%}")
+    return 0
+
+
+def run(args) -> int:
+    options = {
+        "batch_files": args.batch_files,
+        "analysis_images": args.analysis_images,
+        "timeout": args.timeout,
+        "repeats": args.repeats,
+    }
+    config = {
+        "database": args.database,
+        "model": args.model,
+        "workers": args.workers,
+        "bcrypt_rounds": args.bcrypt_rounds,
+        "stub_ms_per_crop": args.stub_ms_per_crop,
+        "seconds": args.seconds,
+        "concurrency": args.concurrency,
+        **options,
+    }
+
+    if args.url:
+        config.update({"url": args.url, "database": None, "model": None, "workers": None, "bcrypt_rounds": None})
+        results = asyncio.run(run_suite(args.url, args.scenarios, args.concurrency, args.seconds, options))
+    else:
+        server = LocalServer(
+            database=args.database,
+            model=args.model,
+            port=args.port,
+            workers=args.workers,
+            bcrypt_rounds=args.bcrypt_rounds,
+            stub_ms_per_crop=args.stub_ms_per_crop,
+        )
+        with server:
+            results = asyncio.run(run_suite(server.url, args.scenarios, args.concurrency, args.seconds, options))
+
+    report = {
+        "label": args.label,
+        "commit": git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "config": config,
+        "scenarios": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.baseline:
+        return check(load(args.baseline), report, args.threshold, args.metrics)
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.loadtest",
+        description=PACKAGE_DOC.splitlines()[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=PACKAGE_DOC.split("\n\n", 1)[1],
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_compare_options(command):
+        command.add_argument("--threshold", type=float, default=0.35, help="Allowed relative change (0.35 = 35%%)")
+        command.add_argument("--metrics", nargs="+", default=list(DEFAULT_METRICS))
+
+    run_parser = commands.add_parser("run", help="Run the scenarios and write a report")
+    run_parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    run_parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    run_parser.add_argument("--seconds", type=float, default=10.0, help="Per scenario and level")
+    run_parser.add_argument("--repeats", type=int, default=1, help="Runs per level; the median one is reported")
+    run_parser.add_argument("--database", choices=["sqlite", "postgres"], default="sqlite")
+    run_parser.add_argument("--model", choices=["stub", "real"], default="stub",
+                            help="real uses MODEL_PATH and INFERENCE_BACKEND from the environment")
+    run_parser.add_argument("--stub-ms-per-crop", type=float, default=2.0)
+    run_parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    run_parser.add_argument("--bcrypt-rounds", type=int, default=12)
+    run_parser.add_argument("--port", type=int, default=8799)
+    run_parser.add_argument("--url", default=None,
+                            help="Test this running server instead (its rate limits must allow the load)")
+    run_parser.add_argument("--batch-files", type=int, default=10)
+    run_parser.add_argument("--analysis-images", type=int, default=20)
+    run_parser.add_argument("--timeout", type=float, default=60.0, help="Per request, in seconds")
+    run_parser.add_argument("--label", default="run")
+    run_parser.add_argument("--output", default=None, help="Write the report here instead of stdout")
+    run_parser.add_argument("--baseline", default=None, help="Compare against this report afterwards")
+    add_compare_options(run_parser)
+
+    compare_parser = commands.add_parser("compare", help="Compare a report against a baseline")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    add_compare_options(compare_parser)
+
+    args = parser.parse_args()
+    if args.command == "compare":
+        return check(load(args.baseline), load(args.current), args.threshold, args.metrics)
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""Regression check of one load-test report against a stored baseline."""
+from typing import List, Sequence, Tuple
+
+# Metrics where a higher value is worse; anything else is a rate where lower is worse
+LATENCY_METRICS = ("p50_ms", "p95_ms", "p99_ms")
+DEFAULT_METRICS = ("throughput_rps", "p95_ms", "error_rate")
+ERROR_RATE_TOLERANCE = 0.01  # Absolute floor; a relative threshold means nothing near zero
+
+
+def _regressed(metric: str, before: float, after: float, threshold: float) -> bool:
+    if before is None or after is None:
+        return False
+    if metric == "error_rate":
+        return after > before + max(ERROR_RATE_TOLERANCE, before * threshold)
+    if metric in LATENCY_METRICS:
+        return after > before * (1 + threshold)
+    return after < before * (1 - threshold)
+
+
+def compare(
+    baseline: dict,
+    current: dict,
+    threshold: float = 0.35,
+    metrics: Sequence[str] = DEFAULT_METRICS,
+) -> Tuple[List[dict], List[dict]]:
+    """Every scenario and concurrency level present in both reports, metric by metric.
+
+    Latencies regress when they grow by more than ``threshold`` (a
+    fraction), throughput when it drops by more than ``threshold`` and
+    the error rate when it rises by more than ``threshold`` of itself or
+    one percentage point, whichever is more.
+
+    Args:
+        baseline (dict): Report from ``run`` to compare against
+        current (dict): Report of the run being checked
+        threshold (float): Allowed relative change, e.g. 0.35 for 35%
+        metrics (Sequence[str]): Report fields to check
+
+    Returns:
+        Tuple[List[dict], List[dict]]: Every comparison, and the regressed ones
+    """
+    rows = []
+    for name, levels in current["scenarios"].items():
+        before_levels = {level["concurrency"]: level for level in baseline["scenarios"].get(name, [])}
+        for level in levels:
+            before = before_levels.get(level["concurrency"])
+            if before is None:
+                continue
+            for metric in metrics:
+                old, new = before.get(metric), level.get(metric)
+                change = (new - old) / old if old and new is not None else None
+                rows.append({
+                    "scenario": name,
+                    "concurrency": level["concurrency"],
+                    "metric": metric,
+                    "baseline": old,
+                    "current": new,
+                    "change": round(change, 4) if change is not None else None,
+                    "regressed": _regressed(metric, old, new, threshold),
+                })
+    return rows, [row for row in rows if row["regressed"]]
+
+
+def format_rows(rows: List[dict]) -> str:
+    lines = [f"{'scenario':>13} {'conc':>5} {'metric':>15} {'baseline':>10} {'current':>10} {'change':>8}"]
+    for row in rows:
+        change = f"{row['change']:+.1%}" if row["change"] is not None else "-"
+        flag = "  REGRESSED" if row["regressed"] else ""
+        lines.append(
+            f"{row['scenario']:>13} {row['concurrency']:>5} {row['metric']:>15} "
+            f"{str(row['baseline']):>10} {str(row['current']):>10} {change:>8}{flag}"
+        )
+    return "\n".join(lines)
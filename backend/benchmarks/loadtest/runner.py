@@ -0,0 +1,95 @@
+"""Closed-loop runs of each scenario at each concurrency level."""
+import asyncio
+import time
+from collections import Counter
+from typing import List
+
+import httpx
+import numpy as np
+
+from .scenarios import SCENARIOS, Scenario, seed_context
+
+
+def summarize(latencies: List[float], statuses: Counter, elapsed: float) -> dict:
+    """Throughput and latency percentiles of one level.
+
+    Only 2xx responses count towards throughput and the percentiles;
+    everything else is listed under ``statuses`` and ``error_rate``.
+    """
+    total = sum(statuses.values())
+    report = {
+        "requests": total,
+        "ok": len(latencies),
+        "error_rate": round(1 - len(latencies) / total, 4) if total else 0.0,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "statuses": {str(status): count for status, count in sorted(statuses.items(), key=str)},
+    }
+    for q in (50, 95, 99):
+        report[f"p{q}_ms"] = round(float(np.percentile(latencies, q)), 1) if latencies else None
+    return report
+
+
+async def run_level(scenario: Scenario, base_url: str, concurrency: int, seconds: float, timeout: float) -> dict:
+    """``concurrency`` clients sending ``scenario`` requests back to back for ``seconds``."""
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        await scenario.setup(client)
+        latencies: List[float] = []
+        statuses: Counter = Counter()
+
+        async def client_loop(deadline: float):
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    response = await scenario.request(client)
+                except httpx.HTTPError as e:
+                    statuses[type(e).__name__] += 1
+                    continue
+                statuses[response.status_code] += 1
+                if 200 <= response.status_code < 300:
+                    latencies.append((time.perf_counter() - started) * 1000)
+                elif "retry-after" in response.headers:
+                    # Back off like a real client instead of spinning on 503s
+                    wait = float(response.headers["retry-after"])
+                    await asyncio.sleep(max(0.0, min(wait, deadline - time.perf_counter())))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(started + seconds) for _ in range(concurrency)))
+        # Requests in flight at the deadline still finish and count
+        elapsed = time.perf_counter() - started
+
+    return {"concurrency": concurrency, **summarize(latencies, statuses, elapsed), **scenario.summary()}
+
+
+async def run_suite(base_url: str, names: List[str], levels: List[int], seconds: float, options: dict) -> dict:
+    """Every scenario in ``names`` at every level in ``levels``, in order.
+
+    Each level runs ``options["repeats"]`` times and reports the run with
+    the median throughput, which keeps one noisy run out of the report.
+
+    Returns:
+        dict: Scenario name → list of per-level reports
+    """
+    async with httpx.AsyncClient(base_url=base_url, timeout=options["timeout"]) as client:
+        context = await seed_context(client)
+
+    results = {}
+    for name in names:
+        scenario = SCENARIOS[name](context, options)
+        results[name] = []
+        for concurrency in levels:
+            runs = [
+                await run_level(scenario, base_url, concurrency, seconds, options["timeout"])
+                for _ in range(options["repeats"])
+            ]
+            # The median run by throughput, not a blend of percentiles from different runs
+            level = sorted(runs, key=lambda run: run["throughput_rps"])[len(runs) // 2]
+            level["repeats"] = len(runs)
+            results[name].append(level)
+            print(
+                f"{name:>13} x{concurrency:<4} {level['throughput_rps']:>8.1f} req/s  "
+                f"p50 {level['p50_ms']} ms  p95 {level['p95_ms']} ms  p99 {level['p99_ms']} ms  "
+                f"errors {level['error_rate']:.1%}",
+                flush=True,
+            )
+    return results
@@ -0,0 +1,224 @@
+"""What each load-test client does, one request at a time.
+
+Every scenario sends the same kind of request over and over from
+``concurrency`` clients. Anything that is not the request being measured
+(seeding uploads to analyse, generating images) happens in ``setup``,
+before the clock starts.
+"""
+import itertools
+import uuid
+from typing import Dict, List, Type
+
+import cv2
+import httpx
+import numpy as np
+
+PASSWORD = "loadtest-password"
+
+
+def synthetic_smear(width: int, height: int, seed: int, quality: int = 90, noise: int = 0) -> bytes:
+    """A JPEG that looks roughly like a stained smear: pink field, purple nuclei.
+
+    ``noise`` adds per-pixel grain, which makes the JPEG much larger for
+    the same dimensions (a stand-in for full-resolution camera images).
+    """
+    rng = np.random.default_rng(seed)
+    image = np.empty((height, width, 3), np.uint8)
+    image[:] = (200, 180, 235)  # BGR
+    for _ in range(max(1, width * height // 20000)):
+        centre = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        radius = int(rng.integers(8, 24))
+        cv2.circle(image, centre, radius, (150, 60, 110), -1)
+    if noise:
+        grain = rng.integers(-noise, noise + 1, image.shape, dtype=np.int16)
+        image = np.clip(image.astype(np.int16) + grain, 0, 255).astype(np.uint8)
+    ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise RuntimeError("Could not encode the synthetic smear")
+    return encoded.tobytes()
+
+
+def unique(jpeg: bytes) -> bytes:
+    """``jpeg`` with a random trailer after its end marker.
+
+    Decoders ignore it, but the content hash changes, so every upload
+    takes the full store-a-new-blob path instead of deduplicating.
+    """
+    return jpeg + uuid.uuid4().bytes
+
+
+class Context:
+    """A registered user and token shared by every scenario of a run."""
+
+    def __init__(self, email: str, token: str):
+        self.email = email
+        self.token = token
+
+    @property
+    def headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.token}"}
+
+
+async def register(client: httpx.AsyncClient, tag: str) -> dict:
+    user = {
+        "username": f"loadtest-{tag}",
+        "email": f"loadtest-{tag}@example.com",
+        "full_name": "Load Test",
+        "password": PASSWORD,
+    }
+    response = await client.post("/users/", json=user)
+    response.raise_for_status()
+    return user
+
+
+async def login(client: httpx.AsyncClient, email: str) -> str:
+    response = await client.post("/auth/login", data={"username": email, "password": PASSWORD})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def seed_context(client: httpx.AsyncClient) -> Context:
+    user = await register(client, uuid.uuid4().hex[:12])
+    return Context(user["email"], await login(client, user["email"]))
+
+
+class Scenario:
+    """One kind of request. Subclasses set ``name`` and implement ``request``."""
+
+    name = ""
+
+    def __init__(self, context: Context, options: dict):
+        self.context = context
+        self.options = options
+
+    async def setup(self, client: httpx.AsyncClient) -> None:
+        """Untimed preparation before each concurrency level."""
+
+    async def request(self, client: httpx.AsyncClient) -> httpx.Response:
+        raise NotImplementedError
+
+    def summary(self) -> dict:
+        """Extra facts to report next to the timings."""
+        return {}
+
+
+class Register(Scenario):
+    """New accounts, each with a fresh email (bcrypt hash plus insert)."""
+
+    name = "register"
+
+    async def request(self, client):
+        user = {
+            "username": f"loadtest-{uuid.uuid4().hex[:16]}",
+            "full_name": "Load Test",
+            "password": PASSWORD,
+        }
+        user["email"] = f"{user['username']}@example.com"
+        return await client.post("/users/", json=user)
+
+
+class Login(Scenario):
+    """Password logins as the seeded user (bcrypt verify plus token)."""
+
+    name = "login"
+
+    async def request(self, client):
+        return await client.post("/auth/login", data={"username": self.context.email, "password": PASSWORD})
+
+
+class UploadSmall(Scenario):
+    """A single ~40 KB smear, new content every time."""
+
+    name = "upload_small"
+    size = (1024, 768)
+    noise = 0
+
+    async def setup(self, client):
+        self.payload = synthetic_smear(*self.size, seed=1, noise=self.noise)
+
+    async def request(self, client):
+        files = {"file": ("smear.jpg", unique(self.payload), "image/jpeg")}
+        return await client.post("/upload", files=files, headers=self.context.headers)
+
+    def summary(self):
+        return {"payload_bytes": len(self.payload)}
+
+
+class UploadLarge(UploadSmall):
+    """A single grainy 4K smear of about 6 MB."""
+
+    name = "upload_large"
+    size = (3840, 2880)
+    noise = 40
+
+
+class BatchUpload(Scenario):
+    """``batch_files`` small smears in one /upload/batch request."""
+
+    name = "batch_upload"
+
+    async def setup(self, client):
+        self.payload = synthetic_smear(1024, 768, seed=2)
+
+    async def request(self, client):
+        files = [
+            ("files", (f"smear-{i}.jpg", unique(self.payload), "image/jpeg"))
+            for i in range(self.options["batch_files"])
+        ]
+        return await client.post("/upload/batch", files=files, headers=self.context.headers)
+
+    def summary(self):
+        return {"files_per_request": self.options["batch_files"]}
+
+
+class Analysis(Scenario):
+    """POST /analysis over ``analysis_images`` distinct uploaded smears.
+
+    The images are uploaded in ``setup``. Once every image has been
+    analysed, requests are cache hits; ``summary`` reports how many
+    requests could have been.
+    """
+
+    name = "analysis"
+
+    def __init__(self, context, options):
+        super().__init__(context, options)
+        self.upload_ids: List[int] = []
+        self.sent = 0
+
+    async def setup(self, client):
+        # New images per level, so every level starts with a cold cache
+        self.upload_ids = []
+        for _ in range(self.options["analysis_images"]):
+            seed = int(uuid.uuid4().int % 2**32)
+            files = {"file": ("smear.jpg", synthetic_smear(1024, 768, seed=seed), "image/jpeg")}
+            response = await client.post("/upload", files=files, headers=self.context.headers)
+            response.raise_for_status()
+            self.upload_ids.append(response.json()["upload_id"])
+        self._cycle = itertools.cycle(self.upload_ids)
+        self.sent = 0
+
+    async def request(self, client):
+        self.sent += 1
+        return await client.post("/analysis", json={"upload_id": next(self._cycle)}, headers=self.context.headers)
+
+    def summary(self):
+        return {
+            "distinct_images": len(self.upload_ids),
+            "repeat_requests": max(0, self.sent - len(self.upload_ids)),
+        }
+
+
+class History(Scenario):
+    """The first page of the seeded user's upload history."""
+
+    name = "history"
+
+    async def request(self, client):
+        return await client.get("/uploads", params={"limit": 50}, headers=self.context.headers)
+
+
+SCENARIOS: Dict[str, Type[Scenario]] = {
+    scenario.name: scenario
+    for scenario in (Register, Login, UploadSmall, UploadLarge, BatchUpload, Analysis, History)
+}
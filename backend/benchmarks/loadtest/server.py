@@ -0,0 +1,120 @@
+"""A throwaway API process configured for load tests."""
+import json
+import os
+import secrets
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+UNLIMITED = "1000000/60"  # Rate limits would cut every scenario short
+
+
+class LocalServer:
+    """``uvicorn app.main:app`` in a temporary directory, as a context manager.
+
+    Uploads, previews, the SQLite database and the stub model all live in
+    the temporary directory and are deleted afterwards. The job runner is
+    off, so background analyses and previews do not compete with the
+    requests being measured.
+
+    Attributes:
+        url (str): Base URL of the running server
+        database (str): ``sqlite`` or ``postgres`` (from the PG* variables)
+        model (str): ``stub`` or ``real`` (``MODEL_PATH``/``INFERENCE_BACKEND``)
+    """
+
+    def __init__(
+        self,
+        database: str = "sqlite",
+        model: str = "stub",
+        port: int = 8799,
+        workers: int = 1,
+        bcrypt_rounds: int = 12,
+        stub_ms_per_crop: float = 2.0,
+        startup_timeout: float = 120.0,
+    ):
+        self.database = database
+        self.model = model
+        self.port = port
+        self.workers = workers
+        self.bcrypt_rounds = bcrypt_rounds
+        self.stub_ms_per_crop = stub_ms_per_crop
+        self.startup_timeout = startup_timeout
+        self.url = f"http://127.0.0.1:{port}"
+        self.directory = None
+        self._process = None
+        self._log = None
+
+    def _environment(self) -> dict:
+        env = dict(os.environ)
+        env.update({
+            "SECRET_KEY": secrets.token_urlsafe(48),
+            "UPLOAD_FOLDER": os.path.join(self.directory, "uploads"),
+            "RUN_JOB_WORKER": "0",
+            "LOGIN_RATE_LIMIT": UNLIMITED,
+            "UPLOAD_RATE_LIMIT": UNLIMITED,
+            "BCRYPT_ROUNDS": str(self.bcrypt_rounds),
+            "CREATE_SCHEMA": "1",
+        })
+        if self.database == "sqlite":
+            env["DATABASE_URL"] = f"sqlite:///{os.path.join(self.directory, 'bench.db')}"
+        else:
+            env.pop("DATABASE_URL", None)
+
+        if self.model == "stub":
+            model_path = os.path.join(self.directory, "model.pt")
+            with open(os.path.join(self.directory, "model.stub.json"), "w") as f:
+                json.dump({"ms_per_crop": self.stub_ms_per_crop}, f)
+            env.update({"MODEL_PATH": model_path, "INFERENCE_BACKEND": "stub"})
+        return env
+
+    def _ready(self) -> bool:
+        try:
+            with urllib.request.urlopen(self.url + "/readyz", timeout=2) as response:
+                return response.status == 200
+        except (urllib.error.URLError, OSError):
+            return False
+
+    def __enter__(self) -> "LocalServer":
+        self.directory = tempfile.mkdtemp(prefix="lumascope-loadtest-")
+        self._log = open(os.path.join(self.directory, "server.log"), "w")
+        command = [
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--port", str(self.port), "--workers", str(self.workers), "--log-level", "warning",
+        ]
+        self._process = subprocess.Popen(
+            command, cwd=BACKEND_DIR, env=self._environment(), stdout=self._log, stderr=subprocess.STDOUT
+        )
+
+        deadline = time.monotonic() + self.startup_timeout
+        while not self._ready():
+            if self._process.poll() is not None or time.monotonic() > deadline:
+                self.__exit__(None, None, None)
+                raise RuntimeError("API did not become ready; see its log above")
+            time.sleep(0.1)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self._process is not None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+            self._process = None
+        if self._log is not None:
+            self._log.close()
+            failed = not exc or exc[0] is not None
+            if failed:
+                # Startup failures and crashed runs: show why before the log is deleted
+                with open(self._log.name) as f:
+                    sys.stderr.write(f.read()[-4000:])
+            self._log = None
+        if self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
@@ -0,0 +1,122 @@
+"""Upload latency of one API worker, quiet and during a burst of logins.
+
+First ``--upload-clients`` clients upload a tiny image in a loop for
+``--seconds`` with nothing else running. Then they do it again while
+``--logins`` clients sign in as fast as they can. If bcrypt competes with
+request handling, the second run's upload percentiles show it. Login
+responses are counted by status: 503 means the password hashing pool
+turned a login away.
+
+The login and upload rate limits must be raised for the run.
+
+Usage:
+    LOGIN_RATE_LIMIT=100000/60 UPLOAD_RATE_LIMIT=100000/60 \\
+        uvicorn app.main:app --port 8000 --workers 1
+    python benchmarks/login_burst.py --token <access token> \\
+        --email <email> --password <password> --label after
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+
+import httpx
+import numpy as np
+
+JPEG_HEADER = b"\xff\xd8\xff\xe0"  # Passes the signature check; never decoded
+
+
+def percentiles(latencies: list) -> dict:
+    if not latencies:
+        return {}
+    return {f"p{q}_ms": round(float(np.percentile(latencies, q)), 1) for q in (50, 95, 99)}
+
+
+async def upload_loop(client: httpx.AsyncClient, deadline: float, latencies: list, errors: Counter):
+    payload = JPEG_HEADER + b"\0" * 64
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            response = await client.post("/upload", files={"file": ("probe.jpg", payload, "image/jpeg")})
+        except httpx.HTTPError as e:
+            errors[type(e).__name__] += 1
+            continue
+        if response.status_code != 200:
+            errors[response.status_code] += 1
+            continue
+        latencies.append((time.perf_counter() - started) * 1000)
+
+
+async def login_loop(client: httpx.AsyncClient, form: dict, deadline: float, latencies: list, statuses: Counter):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            response = await client.post("/auth/login", data=form)
+        except httpx.HTTPError as e:
+            statuses[type(e).__name__] += 1
+            continue
+        statuses[response.status_code] += 1
+        if response.status_code == 200:
+            latencies.append((time.perf_counter() - started) * 1000)
+        elif response.status_code == 503:
+            # Back off as the server asks, like a well-behaved client
+            await asyncio.sleep(float(response.headers.get("Retry-After", "1")))
+
+
+async def phase(args, logins: int) -> dict:
+    limits = httpx.Limits(max_connections=max(1, logins))
+    headers = {"Authorization": f"Bearer {args.token}"}
+    form = {"username": args.email, "password": args.password}
+    upload_latencies, upload_errors = [], Counter()
+    login_latencies, login_statuses = [], Counter()
+
+    async with httpx.AsyncClient(base_url=args.url, headers=headers, timeout=args.timeout) as uploads, \
+            httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as logins_client:
+        deadline = time.perf_counter() + args.seconds
+        await asyncio.gather(
+            *[upload_loop(uploads, deadline, upload_latencies, upload_errors) for _ in range(args.upload_clients)],
+            *[login_loop(logins_client, form, deadline, login_latencies, login_statuses) for _ in range(logins)],
+        )
+
+    result = {
+        "logins": logins,
+        "uploads": len(upload_latencies),
+        "upload_errors": {str(k): v for k, v in upload_errors.items()},
+        "uploads_per_second": round(len(upload_latencies) / args.seconds, 1),
+        "upload": percentiles(upload_latencies),
+    }
+    if logins:
+        result["login_statuses"] = {str(k): v for k, v in login_statuses.items()}
+        result["login"] = percentiles(login_latencies)
+    return result
+
+
+async def run(args) -> dict:
+    results = [await phase(args, 0), await phase(args, args.logins)]
+    return {"label": args.label, "seconds": args.seconds, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--token", required=True, help="Bearer token for the uploads")
+    parser.add_argument("--email", required=True, help="Account the login burst signs in to")
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--logins", type=int, default=50, help="Concurrent login clients in the burst")
+    parser.add_argument("--upload-clients", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=15.0, help="Length of each phase")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--output", default=None, help="Also write the JSON here")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
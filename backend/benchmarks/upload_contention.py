@@ -0,0 +1,129 @@
+"""Latency of other endpoints while large uploads are in flight.
+
+Runs N concurrent large uploads against a running API and, at the same
+time, probes a cheap endpoint in a tight loop. Reports the probe's
+latency percentiles during the uploads, plus a quiet baseline, as JSON.
+
+Usage:
+    uvicorn app.main:app --port 8000
+    python benchmarks/upload_contention.py --token <access token> --label after
+
+Run it once against the old code and once against the new to compare.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import httpx
+import numpy as np
+
+CHUNK = 1024 * 1024
+JPEG_HEADER = b"\xff\xd8\xff\xe0"  # Passes the signature check; never decoded
+
+
+async def multipart_body(boundary: str, size: int, name: str):
+    yield (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{name}"\r\n'
+        "Content-Type: image/jpeg\r\n\r\n"
+    ).encode()
+    block = os.urandom(CHUNK)
+    yield JPEG_HEADER
+    sent = len(JPEG_HEADER)
+    while sent < size:
+        piece = block[: min(CHUNK, size - sent)]
+        sent += len(piece)
+        yield piece
+    yield f"\r\n--{boundary}--\r\n".encode()
+
+
+async def upload(client: httpx.AsyncClient, token: str, size: int, index: int) -> int:
+    boundary = f"bench{index:04d}{os.urandom(8).hex()}"
+    response = await client.post(
+        "/upload",
+        content=multipart_body(boundary, size, f"bench-{index}.jpg"),
+        headers={
+            "Authorization": f"Bearer {token}",
+            "Content-Type": f"multipart/form-data; boundary={boundary}",
+        },
+        timeout=None,
+    )
+    return response.status_code
+
+
+async def probe(client: httpx.AsyncClient, path: str, stop: asyncio.Event, samples: list) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get(path)
+        samples.append(time.perf_counter() - started)
+        await asyncio.sleep(0.01)
+
+
+def summarise(samples: list) -> dict:
+    ms = 1000 * np.array(samples)
+    return {
+        "requests": len(samples),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+        "max_ms": round(float(ms.max()), 2),
+    }
+
+
+async def run(args) -> dict:
+    limits = httpx.Limits(max_connections=args.uploads + 4)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits) as client:
+        quiet = []
+        stop = asyncio.Event()
+        task = asyncio.create_task(probe(client, args.probe, stop, quiet))
+        await asyncio.sleep(args.quiet_seconds)
+        stop.set()
+        await task
+
+        loaded = []
+        stop = asyncio.Event()
+        task = asyncio.create_task(probe(client, args.probe, stop, loaded))
+        started = time.perf_counter()
+        statuses = await asyncio.gather(
+            *[upload(client, args.token, args.size_mb * CHUNK, i) for i in range(args.uploads)]
+        )
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await task
+
+    return {
+        "label": args.label,
+        "uploads": args.uploads,
+        "upload_mb": args.size_mb,
+        "upload_statuses": {str(s): statuses.count(s) for s in set(statuses)},
+        "upload_seconds": round(elapsed, 2),
+        "ingest_mb_per_second": round(args.uploads * args.size_mb / elapsed, 1),
+        "probe": args.probe,
+        "probe_quiet": summarise(quiet),
+        "probe_during_uploads": summarise(loaded),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--token", required=True, help="Bearer token for /upload")
+    parser.add_argument("--uploads", type=int, default=20)
+    parser.add_argument("--size-mb", type=int, default=100)
+    parser.add_argument("--probe", default="/docs", help="Cheap endpoint to time")
+    parser.add_argument("--quiet-seconds", type=float, default=3.0)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--output", default=None, help="Also write the JSON here")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -119,6 +119,40 @@ export async function uploadImage(file: File): Promise<UploadResponse> {
   return response.json();
 }
 
+// Upload history, a page at a time
+export interface UploadHistoryItem {
+  id: number;
+  filename: string;
+  file_path: string;
+  upload_time: string;
+  analysis_id: number | null;
+  total_cells: number | null;
+  abnormal_cells: number | null;
+  preview_url: string | null;
+  dzi_url: string | null;
+}
+
+export interface UploadHistoryPage {
+  items: UploadHistoryItem[];
+  next_cursor: string | null;
+  total: number;
+}
+
+export async function listUploads(cursor?: string | null, limit = 50): Promise<UploadHistoryPage> {
+  const params = new URLSearchParams({ limit: String(limit) });
+  if (cursor) {
+    params.set('cursor', cursor);
+  }
+
+  const response = await apiFetch(`/uploads?${params}`);
+  if (!response.ok) {
+    throw new Error('Failed to fetch uploads');
+  }
+
+  const page = await response.json();
+  return { ...page, total: Number(response.headers.get('X-Total-Count') ?? page.items.length) };
+}
+
 // Example of a typed API call
 export async function getAnalysis(analysisId: string) {
   const response = await apiFetch(`/analysis/${analysisId}`);